@@ -61,7 +61,9 @@ Type=simple
 User=$CURRENT_USER
 WorkingDirectory=$REPO_DIR/src
 Environment="PATH=$REPO_DIR/venv/bin:/usr/local/bin:/usr/bin:/bin"
-ExecStart=$REPO_DIR/venv/bin/python main.py
+ExecStart=$REPO_DIR/venv/bin/gunicorn -c gunicorn.conf.py main:app
+ExecReload=/bin/kill -HUP \$MAINPID
+KillMode=mixed
 Restart=always
 RestartSec=10
 StandardOutput=journal
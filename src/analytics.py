@@ -0,0 +1,114 @@
+"""
+多符号收益/风险分析
+输入为 日期 × 符号 的收盘价矩阵 (不同符号的起始日期可以不同，缺失为 NaN)，各指标按列一次性向量化计算
+"""
+
+import numpy as np
+import pandas as pd
+
+# 年化使用的交易日数
+TRADING_DAYS = 252
+
+
+def close_matrix(df):
+    """get_daily_data_multi 的结果 (Symbol/Date/Close 列) 转为 {symbol: 收盘价 Series}"""
+    if df.empty:
+        return {}
+    closes = df.pivot(index='Date', columns='Symbol', values='Close')
+    closes.index = pd.DatetimeIndex(closes.index)
+    return {symbol: closes[symbol].dropna() for symbol in closes.columns}
+
+
+def _valid_bounds(valid):
+    """每列第一个/最后一个有效值的行号"""
+    first = valid.argmax(axis=0)
+    last = len(valid) - 1 - valid[::-1].argmax(axis=0)
+    return first, last
+
+
+def _round(values, digits=6):
+    """NaN 转为 None，其余四舍五入 (便于 JSON 输出)"""
+    values = np.round(np.asarray(values, dtype=float), digits)
+    return [None if v != v else v for v in values.tolist()]
+
+
+def drawdowns(closes):
+    """
+    回撤矩阵和每个位置对应的前高行号
+    closes 为已前向填充的收盘价 (ndarray，行为日期)
+    """
+    peak = np.fmax.accumulate(closes, axis=0)
+    rows = np.arange(len(closes))[:, None]
+    peak_row = np.maximum.accumulate(np.where(closes >= peak, rows, 0), axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return closes / peak - 1, peak_row
+
+
+def summarize(closes, window=20, series=False):
+    """
+    closes: 日期 × 符号 的收盘价 DataFrame
+    返回 {symbol: 指标}，series=True 时附带逐日累计收益、滚动波动率和回撤 (列式)
+    """
+    closes = closes.loc[:, closes.notna().any()]
+    if closes.empty:
+        return {}
+    symbols = closes.columns.tolist()
+    dates = closes.index
+    values = closes.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    first, last = _valid_bounds(valid)
+    cols = np.arange(values.shape[1])
+
+    filled = closes.ffill().to_numpy(dtype=float)
+    returns = closes.pct_change(fill_method=None)
+    rolling = (returns.rolling(window, min_periods=window).std() * np.sqrt(TRADING_DAYS)).to_numpy()
+    dd, peak_row = drawdowns(filled)
+
+    start_price = values[first, cols]
+    end_price = values[last, cols]
+    total = end_price / start_price - 1
+    years = (dates[last] - dates[first]).days.to_numpy() / 365.25
+    with np.errstate(invalid='ignore', divide='ignore'):
+        annualized = np.where(years > 0, np.power(1 + total, 1 / np.where(years > 0, years, 1)) - 1, np.nan)
+    volatility = returns.std().to_numpy() * np.sqrt(TRADING_DAYS)
+
+    trough = np.nanargmin(dd, axis=0)
+    peak = peak_row[trough, cols]
+    date_text = dates.strftime('%Y-%m-%d')
+
+    fields = {
+        'points': valid.sum(axis=0).tolist(),
+        'start_date': date_text[first].tolist(),
+        'end_date': date_text[last].tolist(),
+        'start_price': _round(start_price, 4),
+        'end_price': _round(end_price, 4),
+        'total_return': _round(total),
+        'annualized_return': _round(annualized),
+        'volatility': _round(volatility),
+        'rolling_volatility': _round(rolling[last, cols]),
+        'max_drawdown': _round(dd[trough, cols]),
+        'drawdown_peak': date_text[peak].tolist(),
+        'drawdown_trough': date_text[trough].tolist(),
+        'current_drawdown': _round(dd[last, cols]),
+    }
+    result = {symbol: {name: column[i] for name, column in fields.items()}
+              for i, symbol in enumerate(symbols)}
+
+    if series:
+        cumulative = filled / start_price - 1
+        for i, symbol in enumerate(symbols):
+            rows = slice(first[i], last[i] + 1)
+            result[symbol]['series'] = {
+                'date': date_text[rows].tolist(),
+                'cumulative_return': _round(cumulative[rows, i]),
+                'rolling_volatility': _round(rolling[rows, i]),
+                'drawdown': _round(dd[rows, i]),
+            }
+    return result
+
+
+def correlation(closes, min_periods=20):
+    """日收益率的相关系数矩阵 (两两取共同交易日)，返回 (symbols, N×N 列表)"""
+    returns = closes.pct_change(fill_method=None)
+    matrix = returns.corr(min_periods=min_periods).to_numpy()
+    return returns.columns.tolist(), [_round(row, 4) for row in matrix]
@@ -0,0 +1,535 @@
+"""
+Yahoo Finance API 服务 - 异步 (ASGI) 版本
+与 main.py 提供相同的接口，连接由事件循环承载：
+上游 yfinance 调用放入有界线程池，SQLite 读取和跨进程实时查询使用独立线程池，SSE 推送不占用线程
+用法 (在 src 目录下): uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import contextlib
+import functools
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+import config
+import main
+import metrics
+import serialize
+import tick_bus
+import upstream
+
+# yfinance 调用 (可能耗时数秒) 与本地读取分开，上游变慢时不会占满本地读取的线程
+upstream_executor = ThreadPoolExecutor(max_workers=config.ASGI_UPSTREAM_WORKERS,
+                                       thread_name_prefix='asgi-upstream')
+local_executor = ThreadPoolExecutor(max_workers=config.ASGI_LOCAL_WORKERS,
+                                    thread_name_prefix='asgi-local')
+
+
+async def run_upstream(fn, *args):
+    """在上游线程池中执行 (会访问 Yahoo 的调用)"""
+    return await asyncio.get_running_loop().run_in_executor(upstream_executor, functools.partial(fn, *args))
+
+
+async def run_local(fn, *args):
+    """在本地线程池中执行 (SQLite 读取、实时中枢调用)"""
+    return await asyncio.get_running_loop().run_in_executor(local_executor, functools.partial(fn, *args))
+
+
+async def run_realtime(fn, *args):
+    """实时数据查询：单进程时只是内存读取，直接在事件循环中执行；多进程模式下经 Unix socket 访问中枢"""
+    if main.hub is None:
+        return fn(*args)
+    return await run_local(fn, *args)
+
+
+def json_response(payload, status=200):
+    start = time.perf_counter()
+    body = serialize.dumps(payload)
+    metrics.serialize_seconds.observe(time.perf_counter() - start)
+    return Response(body, status_code=status, media_type='application/json')
+
+
+async def call_view(request, view, *args, executor=None):
+    """在 Flask 请求上下文中执行 main.py 的同步视图 (轻量接口共用同一份实现)"""
+    def run():
+        with main.app.test_request_context(request.url.path, query_string=request.url.query):
+            rv = main.app.make_response(view(*args))
+            return rv.get_data(), rv.status_code, rv.content_type
+
+    if executor is None:
+        body, status, content_type = run()
+    else:
+        body, status, content_type = await asyncio.get_running_loop().run_in_executor(executor, run)
+    return Response(body, status_code=status, media_type=content_type)
+
+
+# ============ 原有接口（保持兼容） ============
+
+async def get_data(request):
+    """返回 QQQ 的最新 WebSocket 原始消息"""
+    qqq_raw = await run_realtime(main.realtime_data.get_raw, 'QQQ')
+    if qqq_raw:
+        return json_response(qqq_raw)
+    return json_response({'error': 'QQQ 数据尚未获取，请稍后重试'})
+
+
+async def get_status(request):
+    """获取连接状态"""
+    result = await run_realtime(main.realtime_status)
+    result['supported_benchmarks'] = list(config.SUPPORTED_BENCHMARKS.keys())
+    if main.hub is not None:
+        result['worker'] = {'tick_bus': main.realtime_bus.stats(), 'upstream': main.upstream_gateway.stats()}
+    return json_response(result)
+
+
+# ============ 历史数据 ============
+
+async def get_history(request):
+    """获取历史数据 (参数同 main.get_history)"""
+    symbol = request.path_params['symbol'].upper()
+    period = request.query_params.get('period', '1mo')
+    interval = request.query_params.get('interval', '1d')
+    columnar = request.query_params.get('format') == 'columnar'
+
+    columns = main.get_cached_data(symbol, period, interval)
+    cached = columns is not None
+    stale = False
+
+    if not cached:
+        columns = await run_upstream(main.fetch_historical_columns, symbol, period, interval)
+        if columns is None:
+            columns = main.get_stale_data((symbol, period, interval))
+            if columns is None:
+                return json_response({'error': f'无法获取 {symbol} 的数据'}, 404)
+            stale = True
+        else:
+            # 缓存时间取决于本地日线是否最新 (可能读库)
+            await run_local(main.set_cached_data, symbol, period, interval, columns)
+
+    if not stale and interval == '1d':
+        # 按本地最新日线日期判断 (首次查询时读库)
+        stale = await run_local(main.history_is_stale, symbol, interval)
+
+    return json_response({
+        'symbol': symbol,
+        'period': period,
+        'interval': interval,
+        'format': 'columnar' if columnar else 'records',
+        'data': columns if columnar else serialize.columns_to_records(columns),
+        'cached': cached,
+        'stale': stale
+    })
+
+
+async def get_history_batch(request):
+    """批量获取多个符号的日线 (参数同 main.get_history_batch)"""
+    period = request.query_params.get('period', '1mo')
+    columnar = request.query_params.get('format') == 'columnar'
+    symbols = list(dict.fromkeys(
+        s.strip().upper() for s in request.query_params.get('symbols', '').split(',') if s.strip()))
+    if not symbols:
+        return json_response({'error': 'symbols 参数不能为空'}, 400)
+    if len(symbols) > config.HISTORY_MAX_SYMBOLS:
+        return json_response({'error': f'最多支持 {config.HISTORY_MAX_SYMBOLS} 个符号'}, 400)
+
+    found = {s: main.get_cached_data(s, period, '1d') for s in symbols}
+    cached = {s: found[s] is not None for s in symbols}
+    misses = [s for s in symbols if found[s] is None]
+    if misses:
+        found.update(await run_upstream(main.load_daily_batch, misses, period))
+
+    data = {}
+    errors = {}
+    for symbol in symbols:
+        columns = found[symbol]
+        if columns is None:
+            errors[symbol] = f'无法获取 {symbol} 的数据'
+        else:
+            data[symbol] = columns if columnar else serialize.columns_to_records(columns)
+
+    return json_response({
+        'period': period,
+        'interval': '1d',
+        'format': 'columnar' if columnar else 'records',
+        'data': data,
+        'cached': cached,
+        'errors': errors
+    })
+
+
+async def get_intraday(request):
+    """获取日内分钟数据 (参数同 main.get_intraday)"""
+    symbol = request.path_params['symbol'].upper()
+    interval = request.query_params.get('interval', '5m')
+    period = request.query_params.get('period', '1d')
+
+    if interval not in main.INTRADAY_INTERVAL_SECONDS:
+        return json_response(
+            {'error': f'Invalid interval. Valid options: {", ".join(main.INTRADAY_INTERVAL_SECONDS)}'}, 400)
+    if period not in main.INTRADAY_PERIOD_SESSIONS:
+        return json_response(
+            {'error': f'Invalid period for intraday. Valid options: {", ".join(main.INTRADAY_PERIOD_SESSIONS)}'}, 400)
+
+    try:
+        cache_key = ('intraday', symbol, period, interval)
+        data = main.data_cache.get(cache_key)
+        cached = data is not None
+        stale = False
+        if not cached:
+            data = await run_upstream(main.load_intraday_records, symbol, period, interval)
+            if data is None:
+                data = main.get_stale_data(cache_key)
+                if data is None:
+                    return json_response({'error': f'No intraday data found for {symbol}'}, 404)
+                stale = True
+
+        return json_response({
+            'symbol': symbol,
+            'period': period,
+            'interval': interval,
+            'data': data,
+            'cached': cached,
+            'stale': stale
+        })
+    except Exception as e:
+        logging.error(f"Error fetching intraday for {symbol}: {e}")
+        return json_response({'error': str(e)}, 500)
+
+
+async def compare_benchmarks(request):
+    """对比多个基准的收益率 (参数同 main.compare_benchmarks)"""
+    period = request.query_params.get('period', '1mo')
+    timeout = main.parse_timeout(request.query_params.get('timeout', config.COMPARE_TIMEOUT), config.COMPARE_TIMEOUT)
+    if timeout is None:
+        return json_response({'error': 'Invalid timeout'}, 400)
+    deadline = time.monotonic() + timeout
+
+    symbols = list(dict.fromkeys(
+        s.strip().upper() for s in request.query_params.get('symbols', 'QQQ,SPY').split(',') if s.strip()))
+
+    found = {s: main.get_cached_data(s, period, '1d') for s in symbols}
+    misses = [s for s in symbols if not found[s]]
+    errors = {}
+
+    if misses:
+        stale = await run_local(lambda: [s for s in misses if not main.daily_sync.is_fresh(s)])
+        if stale:
+            refresh = asyncio.ensure_future(run_upstream(main.sync_daily_batch, stale))
+            done, _ = await asyncio.wait([refresh], timeout=max(0.0, deadline - time.monotonic()))
+            if refresh not in done:
+                # 批量刷新仍在后台线程中进行，不再逐个重复拉取
+                for symbol in stale:
+                    errors[symbol] = 'timeout'
+            elif refresh.exception() is not None:
+                logging.error(f"Batch daily refresh failed for {stale}: {refresh.exception()}")
+
+        tasks = {asyncio.ensure_future(run_upstream(main.load_daily_columns, s, period)): s
+                 for s in misses if s not in errors}
+        if tasks:
+            done, _ = await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()))
+            for task, symbol in tasks.items():
+                if task not in done:
+                    errors[symbol] = 'timeout'
+                elif task.exception() is not None:
+                    errors[symbol] = str(task.exception())
+                else:
+                    found[symbol] = task.result()
+
+    result = {}
+    for symbol in symbols:
+        columns = found[symbol]
+        if columns:
+            result[symbol] = {
+                'data': serialize.columns_to_records(columns),
+                'start_price': columns['close'][0],
+                'end_price': columns['close'][-1],
+                'total_change': columns['change_percent'][-1]
+            }
+        elif symbol not in errors:
+            errors[symbol] = f'无法获取 {symbol} 的数据'
+
+    return json_response({
+        'period': period,
+        'benchmarks': result,
+        'errors': errors
+    })
+
+
+async def get_quote(request):
+    """获取当前报价：单进程时实时报价不离开事件循环"""
+    symbol = request.path_params['symbol'].upper()
+    try:
+        quote = await run_realtime(main.realtime_quote, symbol)
+        if quote is not None:
+            result = quote, 'realtime', False
+        else:
+            # 报价缓存过期时会提交后台刷新，不在事件循环中执行
+            result = await run_local(main.quote_from_cache, symbol)
+        if result is None:
+            result = await run_upstream(main.resolve_quote, symbol)
+        quote, source, cached = result
+        return json_response(dict(quote, source=source, cached=cached))
+    except upstream.UpstreamUnavailable as e:
+        response = json_response({'error': str(e), 'reason': e.reason}, 503)
+        if e.retry_after:
+            response.headers['Retry-After'] = str(math.ceil(e.retry_after))
+        return response
+    except Exception as e:
+        logging.error(f"获取 {symbol} 报价失败: {e}")
+        return json_response({'error': str(e)}, 500)
+
+
+# ============ 实时推送 ============
+
+class AsyncSubscription(tick_bus.Subscription):
+    """总线订阅的异步版本：推送线程写入后唤醒事件循环中的等待者"""
+
+    def __init__(self, bus, name, maxlen, policy, symbols, loop, limit=None):
+        super().__init__(bus, name, maxlen, policy, symbols)
+        self._loop = loop
+        self._event = asyncio.Event()
+        bus.attach(self, limit)
+
+    def offer(self, symbol, tick):
+        super().offer(symbol, tick)
+        if not self._event.is_set():
+            self._loop.call_soon_threadsafe(self._event.set)
+
+    async def drain_async(self, timeout):
+        """等待并取出缓冲中的全部 tick，超时返回空列表"""
+        if not self.pending:
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._event.clear()
+        return self.drain(timeout=0)
+
+
+async def stream_realtime(request):
+    """SSE 实时行情推送 (参数同 main.stream_realtime)"""
+    requested_symbols = [s.strip().upper()
+                         for s in request.query_params.get('symbols', '').split(',') if s.strip()]
+    if not requested_symbols:
+        return json_response({'error': '请通过 symbols 参数指定要推送的符号'}, 400)
+    if len(requested_symbols) > config.STREAM_MAX_SYMBOLS:
+        return json_response({'error': f'单个连接最多 {config.STREAM_MAX_SYMBOLS} 个符号'}, 400)
+
+    try:
+        max_rate = float(request.query_params.get('max_rate', config.STREAM_MAX_RATE))
+    except ValueError:
+        return json_response({'error': 'max_rate 必须是数字'}, 400)
+    min_interval = 1.0 / min(max(max_rate, 0.1), config.STREAM_MAX_RATE)
+
+    specs = None
+    if request.query_params.get('ind'):
+        specs, error = main.parse_indicators(request.query_params['ind'])
+        if error:
+            return json_response({'error': error}, 400)
+
+    symbols = list(dict.fromkeys(requested_symbols))
+
+    # 连接数上限在总线注册时原子检查
+    try:
+        if main.hub is not None:
+            sub = main.realtime_bus.attach(
+                tick_bus.Subscription(main.realtime_bus, 'sse', len(symbols), tick_bus.CONFLATE, symbols),
+                config.STREAM_MAX_CLIENTS)
+        else:
+            sub = AsyncSubscription(main.realtime_bus, 'sse', len(symbols), tick_bus.CONFLATE, symbols,
+                                    asyncio.get_running_loop(), limit=config.STREAM_MAX_CLIENTS)
+    except tick_bus.BusFull:
+        return json_response({'error': '推送连接数已达上限，请稍后重试'}, 429)
+
+    live = main.LiveIndicators(specs, symbols) if specs else None
+    # 连接期间引用这些符号，避免被空闲清理退订
+    await run_local(main.retain_subscriptions, symbols)
+
+    if main.hub is not None:
+        # 多进程模式下 tick 不经过本进程，定期向中枢查询有更新的符号
+        seqs = {}
+
+        async def wait_changes(timeout):
+            end = time.monotonic() + timeout
+            while True:
+                changed = await run_local(main.realtime_data.changed_since, seqs, symbols)
+                remaining = end - time.monotonic()
+                if changed or remaining <= 0:
+                    break
+                await asyncio.sleep(min(config.STREAM_POLL_INTERVAL, remaining))
+            for symbol, data in changed.items():
+                seqs[symbol] = data['seq']
+            return list(changed)
+    else:
+        async def wait_changes(timeout):
+            return [symbol for symbol, _ in await sub.drain_async(timeout)]
+
+    async def quote_events(symbol, data):
+        events = [main.sse_event('quote', data, data['seq'])]
+        if live is not None:
+            if live.due():
+                # 读取本地指标状态 (过期日线在后台刷新)
+                await run_local(live.reload)
+            event = live.event(symbol, data.get('price'))
+            if event:
+                events.append(main.sse_event('indicators', event))
+        return ''.join(events)
+
+    async def generate():
+        try:
+            yield f'retry: {config.STREAM_RETRY_MS}\n\n'
+            last_sent = {}
+            pending = set()
+            last_write = time.monotonic()
+
+            # 先推送已有的快照
+            for symbol in symbols:
+                data = await run_realtime(main.realtime_data.get, symbol)
+                if data:
+                    last_sent[symbol] = last_write
+                    yield await quote_events(symbol, data)
+
+            timeout = config.STREAM_HEARTBEAT
+
+            while True:
+                pending.update(await wait_changes(timeout))
+
+                now = time.monotonic()
+                timeout = config.STREAM_HEARTBEAT - (now - last_write)
+                for symbol in list(pending):
+                    wait = last_sent.get(symbol, 0) + min_interval - now
+                    if wait > 0:
+                        # 超过限速，合并到下一次发送
+                        timeout = min(timeout, wait)
+                        continue
+                    pending.discard(symbol)
+                    data = await run_realtime(main.realtime_data.get, symbol)
+                    if data:
+                        last_sent[symbol] = now
+                        last_write = now
+                        yield await quote_events(symbol, data)
+
+                if now - last_write >= config.STREAM_HEARTBEAT:
+                    last_write = now
+                    yield ': heartbeat\n\n'
+                timeout = max(0.01, min(timeout, config.STREAM_HEARTBEAT))
+        finally:
+            sub.close()
+            # 连接断开时生成器可能已被取消，不再等待
+            local_executor.submit(main.release_subscriptions, symbols)
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+# ============ 其他接口 (复用 main.py 的同步实现) ============
+
+async def get_api_docs(request):
+    return await call_view(request, main.get_api_docs)
+
+
+async def get_benchmarks(request):
+    return await call_view(request, main.get_benchmarks)
+
+
+async def health_check(request):
+    return await call_view(request, main.health_check)
+
+
+async def get_cache_stats(request):
+    return await call_view(request, main.get_cache_stats)
+
+
+async def get_realtime(request):
+    # 可能需要向 WebSocket 发送订阅请求
+    return await call_view(request, main.get_realtime, request.path_params['symbol'], executor=local_executor)
+
+
+async def get_realtime_batch(request):
+    return await call_view(request, main.get_realtime_batch, executor=local_executor)
+
+
+async def get_subscriptions(request):
+    return await call_view(request, main.get_subscriptions, executor=local_executor)
+
+
+async def get_ticks(request):
+    # 读取磁盘上的 tick 日志
+    return await call_view(request, main.get_ticks, request.path_params['symbol'], executor=local_executor)
+
+
+async def get_metrics(request):
+    # 多进程模式下需要向中枢查询
+    return await call_view(request, main.get_metrics, executor=local_executor)
+
+
+async def get_analytics(request):
+    # 可能需要刷新过期日线
+    return await call_view(request, main.get_analytics, executor=upstream_executor)
+
+
+async def get_indicators(request):
+    # 可能需要刷新过期日线
+    return await call_view(request, main.get_indicators, request.path_params['symbol'],
+                           executor=upstream_executor)
+
+
+async def test_api(request):
+    return await call_view(request, main.test_api, executor=upstream_executor)
+
+
+async def add_cors_headers(request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get('route')
+    metrics.http_request_seconds.labels(route.path if route is not None else 'unmatched', request.method,
+                                        str(response.status_code)).observe(time.perf_counter() - start)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+    response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+    return response
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # 单进程运行时由本进程接收实时行情；多进程模式下由中枢进程负责
+    if main.hub is None:
+        main.start_background_tasks()
+    yield
+
+
+routes = [
+    Route('/', get_api_docs),
+    Route('/api/data', get_data),
+    Route('/api/status', get_status),
+    Route('/api/benchmarks', get_benchmarks),
+    Route('/api/history/{symbol}', get_history),
+    Route('/api/history', get_history_batch),
+    Route('/api/intraday/{symbol}', get_intraday),
+    Route('/api/compare', compare_benchmarks),
+    Route('/api/analytics', get_analytics),
+    Route('/api/indicators/{symbol}', get_indicators),
+    Route('/api/quote/{symbol}', get_quote),
+    Route('/api/realtime/{symbol}', get_realtime),
+    Route('/api/realtime', get_realtime_batch),
+    Route('/api/stream', stream_realtime),
+    Route('/api/subscriptions', get_subscriptions),
+    Route('/api/ticks/{symbol}', get_ticks),
+    Route('/api/cache/stats', get_cache_stats),
+    Route('/api/health', health_check),
+    Route('/api/test', test_api),
+    Route('/metrics', get_metrics),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan,
+                middleware=[Middleware(BaseHTTPMiddleware, dispatch=add_cors_headers)])
@@ -0,0 +1,283 @@
+"""
+分钟线聚合器
+把 WebSocket tick 在内存中实时聚合为常规交易时段的 1m/5m/15m/1h K 线，收完的 K 线批量写入数据库
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import market_calendar
+
+logger = logging.getLogger(__name__)
+
+# K 线字段下标: [起始时间(UTC 秒), open, high, low, close, volume]
+START, OPEN, HIGH, LOW, CLOSE, VOLUME = range(6)
+
+
+def parse_tick(message):
+    """从 WebSocket 消息中取出 (price, ts 秒, 当日累计成交量)，价格缺失返回 None"""
+    price = message.get('price')
+    if price is None:
+        return None
+    ts = message.get('time')
+    ts = int(ts) / 1000 if ts is not None else time.time()
+    # yfinance 消息字段名保留 protobuf 原名，兼容驼峰写法
+    day_volume = message.get('day_volume', message.get('dayVolume'))
+    return float(price), ts, int(day_volume) if day_volume is not None else None
+
+
+def bars_to_frame(bars):
+    """K 线列表转为与 database.get_intraday_bars 相同格式的 DataFrame"""
+    index = pd.to_datetime([b[START] for b in bars], unit='s', utc=True)
+    index = index.tz_convert(market_calendar.MARKET_TZ).rename('Datetime')
+    return pd.DataFrame({
+        'Open': [b[OPEN] for b in bars],
+        'High': [b[HIGH] for b in bars],
+        'Low': [b[LOW] for b in bars],
+        'Close': [b[CLOSE] for b in bars],
+        'Volume': [b[VOLUME] for b in bars],
+    }, index=index)
+
+
+class _SymbolState:
+    """单个符号在当前交易日的聚合状态"""
+
+    __slots__ = ('session', 'open_ts', 'close_ts', 'live_since', 'day_volume', 'current', 'closed', 'last_closed')
+
+    def __init__(self):
+        self.session = None
+        self.open_ts = self.close_ts = None
+        self.live_since = None
+        self.day_volume = None
+        self.current = {}  # interval -> 未收完的 K 线
+        self.closed = {}   # interval -> 当日已收完的 K 线列表
+        self.last_closed = {}  # interval -> 最后一根已收完 K 线的起始时间
+
+
+class BarAggregator:
+    """tick -> OHLCV 聚合，各周期按开盘时间对齐 (与 Yahoo 分钟线一致)"""
+
+    def __init__(self, intervals, close_delay=2.0, flush_interval=1.0):
+        # intervals: {interval: 秒数}
+        self.intervals = dict(intervals)
+        # K 线结束后再等待 close_delay 秒才收线，容忍迟到的 tick
+        self.close_delay = close_delay
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._states = {}
+        self._sessions = {}  # date -> (open_ts, close_ts)，非交易日为 None
+        self._pending = []   # 待写库的 (symbol, interval, bar)
+        self._thread = None
+
+        self.ticks = 0
+        self.ignored = 0
+        self.late = 0
+        self.bars_closed = 0
+        self.bars_saved = 0
+        self.errors = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _session_bounds(self, ts):
+        """ts 所在交易日的 (日期, 开盘, 收盘)，不在常规交易时段返回 None"""
+        d = datetime.fromtimestamp(ts, market_calendar.MARKET_TZ).date()
+        if d not in self._sessions:
+            if market_calendar.is_trading_day(d):
+                self._sessions[d] = (market_calendar.session_open(d).timestamp(),
+                                     market_calendar.session_close(d).timestamp())
+            else:
+                self._sessions[d] = None
+        bounds = self._sessions[d]
+        if bounds is None or not bounds[0] <= ts < bounds[1]:
+            return None
+        return d, bounds[0], bounds[1]
+
+    def add_message(self, symbol, message):
+        """处理一条 WebSocket 消息"""
+        tick = parse_tick(message)
+        if tick is not None:
+            self.add_tick(symbol, *tick)
+
+    def add_tick(self, symbol, price, ts, day_volume=None):
+        """把一笔 tick 计入各周期的当前 K 线"""
+        with self._lock:
+            self.ticks += 1
+            state = self._states.get(symbol)
+            if state is None:
+                state = self._states[symbol] = _SymbolState()
+
+            # 成交量取当日累计成交量的增量
+            volume = 0
+            if day_volume is not None:
+                if state.day_volume is not None and day_volume >= state.day_volume:
+                    volume = day_volume - state.day_volume
+                state.day_volume = day_volume
+
+            bounds = self._session_bounds(ts)
+            if bounds is None:
+                self.ignored += 1
+                return
+            session, open_ts, close_ts = bounds
+            if state.session != session:
+                self._roll_session(symbol, state, session, open_ts, close_ts)
+            if state.live_since is None:
+                state.live_since = ts
+
+            for interval, step in self.intervals.items():
+                start = open_ts + (ts - open_ts) // step * step
+                # 开始接收 tick 之前已经开始的 K 线不完整，留给 Yahoo 补齐
+                if start < state.live_since:
+                    continue
+                # 已收线 (可能已写库) 的 K 线不再修改，否则迟到的 tick 会生成同一起始时间的单笔 K 线覆盖它
+                if start <= state.last_closed.get(interval, -1):
+                    self.late += 1
+                    continue
+                bar = state.current.get(interval)
+                if bar is not None and bar[START] != start:
+                    if start < bar[START]:
+                        self.late += 1
+                        continue
+                    self._close(symbol, state, interval)
+                    bar = None
+                if bar is None:
+                    state.current[interval] = [start, price, price, price, price, volume]
+                else:
+                    if price > bar[HIGH]:
+                        bar[HIGH] = price
+                    if price < bar[LOW]:
+                        bar[LOW] = price
+                    bar[CLOSE] = price
+                    bar[VOLUME] += volume
+
+    def _roll_session(self, symbol, state, session, open_ts, close_ts):
+        """进入新交易日：收完上一交易日的 K 线并清空当日列表"""
+        for interval in list(state.current):
+            self._close(symbol, state, interval)
+        state.session = session
+        state.open_ts, state.close_ts = open_ts, close_ts
+        state.live_since = None
+        state.closed = {}
+        state.last_closed = {}
+
+    def _close(self, symbol, state, interval):
+        bar = state.current.pop(interval)
+        state.closed.setdefault(interval, []).append(bar)
+        state.last_closed[interval] = bar[START]
+        self._pending.append((symbol, interval, tuple(bar)))
+        self.bars_closed += 1
+
+    def close_expired(self, now=None):
+        """收完结束时间已过的 K 线 (没有后续 tick 时也能按时收线)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            for symbol, state in self._states.items():
+                for interval in list(state.current):
+                    bar = state.current[interval]
+                    end = min(bar[START] + self.intervals[interval], state.close_ts)
+                    if now >= end + self.close_delay:
+                        self._close(symbol, state, interval)
+
+    def reset_coverage(self, symbols=None):
+        """行情中断 (如 WebSocket 重连) 后调用：丢弃不完整的 K 线，重新开始计算连续区间 (symbols 为 None 时全部重置)"""
+        with self._lock:
+            states = self._states.values() if symbols is None else \
+                [self._states[s] for s in symbols if s in self._states]
+            for state in states:
+                state.current = {}
+                state.live_since = None
+                state.day_volume = None
+
+    def live_from(self, symbol, interval, session):
+        """
+        指定交易日中本地聚合连续覆盖的起点 (第一根完整 K 线的起始时间)
+        未在聚合该符号时返回 None
+        """
+        with self._lock:
+            state = self._states.get(symbol)
+            if state is None or state.session != session or state.live_since is None:
+                return None
+            step = self.intervals[interval]
+            offset = state.live_since - state.open_ts
+            return state.open_ts + -(-offset // step) * step
+
+    def is_live(self, symbol):
+        with self._lock:
+            state = self._states.get(symbol)
+            return state is not None and state.live_since is not None
+
+    def bars(self, symbol, interval):
+        """当前交易日本地聚合的 K 线 (已收完的 + 正在形成的)"""
+        with self._lock:
+            state = self._states.get(symbol)
+            if state is None:
+                return []
+            bars = [tuple(b) for b in state.closed.get(interval, ())]
+            current = state.current.get(interval)
+            if current is not None:
+                bars.append(tuple(current))
+            return bars
+
+    def frame(self, symbol, interval):
+        """当前交易日本地聚合的 K 线 DataFrame"""
+        return bars_to_frame(self.bars(symbol, interval))
+
+    def persist(self, save):
+        """把已收完的 K 线批量写库，save(symbol, interval, df)"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        groups = {}
+        for symbol, interval, bar in pending:
+            groups.setdefault((symbol, interval), []).append(bar)
+        for (symbol, interval), bars in groups.items():
+            try:
+                self.bars_saved += save(symbol, interval, bars_to_frame(bars))
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Failed to save aggregated bars for {symbol} {interval}: {e}")
+
+    def start(self, subscription, save):
+        """启动后台聚合线程，从 tick 总线订阅中消费"""
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, args=(subscription, save),
+                                        name='bar-aggregator', daemon=True)
+        self._thread.start()
+
+    def _run(self, subscription, save):
+        last_flush = time.time()
+        while not subscription.closed:
+            try:
+                for symbol, message in subscription.drain(timeout=self.flush_interval):
+                    self.add_message(symbol, message)
+                now = time.time()
+                if now - last_flush >= self.flush_interval:
+                    self.close_expired(now)
+                    self.persist(save)
+                    last_flush = now
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Bar aggregation failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            live = sum(1 for s in self._states.values() if s.live_since is not None)
+            pending = len(self._pending)
+        return {
+            'running': self.running,
+            'intervals': list(self.intervals),
+            'live_symbols': live,
+            'ticks': self.ticks,
+            'ignored': self.ignored,
+            'late': self.late,
+            'bars_closed': self.bars_closed,
+            'bars_saved': self.bars_saved,
+            'pending': pending,
+            'errors': self.errors,
+        }
@@ -0,0 +1,167 @@
+"""
+有界内存缓存
+LRU + TTL，同时受条目数和字节预算约束，并统计命中/未命中/淘汰次数
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def estimate_size(value):
+    """粗略估算对象占用的字节数（同构列表只对首元素采样）"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += sys.getsizeof(k) + estimate_size(v)
+    elif isinstance(value, (list, tuple)) and value:
+        size += len(value) * estimate_size(value[0])
+    return size
+
+
+class TTLCache:
+    """线程安全的 LRU + TTL 缓存"""
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, default_ttl=60, sizeof=estimate_size,
+                 stale_ttl=0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        # 过期后继续保留的秒数 (get 视为未命中，peek 仍可读到，用于上游不可用时兜底)
+        self.stale_ttl = stale_ttl
+        self._sizeof = sizeof
+        # key -> (stored_at, expires_at, size, value)，按访问顺序排列，队首最久未用
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """读取未过期的缓存值，不存在或已过期返回 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[1] <= now:
+                if entry[1] + self.stale_ttl <= now:
+                    self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[3]
+
+    def get_stale(self, key, max_stale):
+        """
+        读取缓存值，已过期但过期不超过 max_stale 秒的也返回 (stale-while-revalidate)
+        返回 (value, 是否已过期) 或 None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expired = entry[1] <= now
+            if expired and entry[1] + min(max_stale, self.stale_ttl) <= now:
+                if entry[1] + self.stale_ttl <= now:
+                    self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if expired:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            return entry[3], expired
+
+    def peek(self, key):
+        """
+        读取缓存值 (包括已过期但仍在保留期内的)，返回 (value, 已过期秒数) 或 None
+        未过期时已过期秒数为负数；不计入命中统计
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] + self.stale_ttl <= now:
+                return None
+            return entry[3], now - entry[1]
+
+    def set(self, key, value, ttl=None):
+        """写入缓存，必要时按 LRU 淘汰旧条目"""
+        if ttl is None:
+            ttl = self.default_ttl
+        size = self._sizeof(value)
+        now = time.time()
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            # 单个值超过整个预算时不缓存，避免把其它条目全部挤掉
+            if size > self.max_bytes:
+                return False
+            self._entries[key] = (now, now + ttl, size, value)
+            self._bytes += size
+            self._evict()
+        return True
+
+    def delete(self, key):
+        """删除指定条目"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                return True
+        return False
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale_hits': self.stale_hits,
+                'hit_ratio': round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[1] > time.time()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[2]
+
+    def _evict(self):
+        """淘汰最久未使用的条目，直到满足条目数和字节预算（需持有锁）"""
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry[2]
+            self.evictions += 1
@@ -17,3 +17,219 @@ INITIAL_SYMBOLS = [
     'AAPL', 'MSFT', 'NVDA', 'TSLA', 'AMD', 'META', 'AMZN', 'GOOGL',  
     'COIN', 'HOOD', 'PLTR', 'SNOW'
 ]
+
+# ========== 历史数据缓存 ==========
+# 缓存最大条目数
+CACHE_MAX_ENTRIES = 2000
+
+# 缓存字节预算 (估算值)
+CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+# 未在下表中列出的 interval 使用的默认 TTL (秒)
+CACHE_DEFAULT_TTL = 60
+
+# 按 interval 设置 TTL (秒)：分钟线变化快，日线及以上变化慢
+CACHE_TTL_BY_INTERVAL = {
+    '1m': 30,
+    '2m': 60,
+    '5m': 120,
+    '15m': 300,
+    '30m': 300,
+    '60m': 600,
+    '90m': 600,
+    '1h': 600,
+    '1d': 300,
+    '5d': 1800,
+    '1wk': 3600,
+    '1mo': 3600,
+    '3mo': 3600,
+}
+
+# 日线已是最新时的最长缓存时间 (秒)
+CACHE_CLOSED_BAR_MAX_TTL = 6 * 3600
+
+# 过期条目继续保留的秒数，Yahoo 不可用时作为兜底数据返回 (响应带 stale: true)
+CACHE_STALE_TTL = 3600
+
+# stale-while-revalidate：过期不超过该秒数的缓存直接返回，同时在后台刷新；超过后请求同步拉取
+# (不能超过 CACHE_STALE_TTL)
+CACHE_MAX_STALENESS = 600
+
+# 按 interval 设置最大陈旧时间 (秒)，未列出的使用 CACHE_MAX_STALENESS
+CACHE_MAX_STALENESS_BY_INTERVAL = {
+    '1m': 30,
+    '2m': 60,
+    '5m': 120,
+}
+
+# 后台刷新缓存的线程数
+CACHE_REFRESH_WORKERS = 4
+
+# ========== 上游 (Yahoo) 访问控制 ==========
+# 令牌桶：平均每秒请求数和允许的突发数 (每个进程独立计算)
+UPSTREAM_RATE = 5
+UPSTREAM_BURST = 10
+
+# 同时进行的上游请求上限
+UPSTREAM_MAX_CONCURRENCY = 8
+
+# 等待令牌或并发名额的最长秒数，超过后直接失败
+UPSTREAM_MAX_WAIT = 2.0
+
+# 熔断：窗口 (秒) 内失败至少 N 次且失败率达到该比例时打开，打开后等待多少秒再放行探测请求
+UPSTREAM_FAILURE_THRESHOLD = 5
+UPSTREAM_FAILURE_RATIO = 0.5
+UPSTREAM_FAILURE_WINDOW = 30
+UPSTREAM_OPEN_SECONDS = 30
+
+# ========== 日线同步 ==========
+# 收盘后等待多少分钟再拉取当天日线 (等待 Yahoo 数据落定)
+DAILY_BAR_SETTLE_MINUTES = 20
+
+# 后台同步线程的最长轮询间隔 (秒)
+DAILY_SYNC_POLL_INTERVAL = 300
+
+# 单次批量下载的最大符号数
+DAILY_SYNC_BATCH_SIZE = 50
+
+# ========== 报价 ==========
+# /api/quote 结果的缓存时间 (秒)
+QUOTE_CACHE_TTL = 15
+
+# 报价缓存过期不超过该秒数时直接返回并在后台刷新
+QUOTE_MAX_STALENESS = 60
+
+# 名称等静态字段的缓存时间 (秒)
+QUOTE_STATIC_TTL = 6 * 3600
+
+# 盘中实时报价超过该秒数未更新时不再直接使用
+QUOTE_REALTIME_MAX_AGE = 60
+
+# ========== 多符号请求 ==========
+# /api/compare 等多符号请求共用线程池的最大并发数
+COMPARE_MAX_WORKERS = 8
+
+# 多符号请求的最长等待时间 (秒)，超时返回部分结果
+COMPARE_TIMEOUT = 20
+
+# /api/history?symbols= 单次最多符号数
+HISTORY_MAX_SYMBOLS = 100
+
+# ========== 收益/风险分析 ==========
+# /api/analytics 单次最多符号数
+ANALYTICS_MAX_SYMBOLS = 100
+
+# 滚动波动率的默认窗口 (交易日)
+ANALYTICS_DEFAULT_WINDOW = 20
+
+# 计算相关系数至少需要的共同交易日数
+ANALYTICS_MIN_PERIODS = 20
+
+# 收盘价序列和分析结果的缓存时间 (秒)；缓存 key 含日线版本号，写入新日线后旧结果不再命中
+ANALYTICS_CACHE_TTL = 6 * 3600
+
+# ========== 技术指标 ==========
+# /api/indicators 单次最多指标数
+INDICATOR_MAX_COUNT = 10
+
+# 指标结果的缓存时间 (秒)；缓存 key 含日线版本号，写入新日线后旧结果不再命中
+INDICATOR_CACHE_TTL = 6 * 3600
+
+# 推送连接中重新加载指标状态的间隔 (秒)，新日线入库后以新状态为基础预估
+INDICATOR_STREAM_RELOAD = 300
+
+# ========== SSE 实时推送 ==========
+# 每个符号每秒最多推送次数 (客户端 max_rate 参数不能超过该值)
+STREAM_MAX_RATE = 4
+
+# 心跳间隔 (秒)，无数据时也定期写出以保持连接并及时发现断开
+STREAM_HEARTBEAT = 15
+
+# 客户端断线重连等待时间 (毫秒)
+STREAM_RETRY_MS = 3000
+
+# 单个连接最多订阅的符号数
+STREAM_MAX_SYMBOLS = 100
+
+# 同时在线的推送连接上限
+STREAM_MAX_CLIENTS = 200
+
+# 多 worker 部署时，worker 向实时中枢查询报价更新的间隔 (秒)
+STREAM_POLL_INTERVAL = 0.25
+
+# ========== WebSocket 连接池 ==========
+# 单条 WebSocket 连接最多订阅的符号数，超过后新开连接分担 (各连接负载保持均衡)
+WS_MAX_SYMBOLS_PER_CONNECTION = 100
+
+# 最多同时保持的 WebSocket 连接数
+WS_MAX_CONNECTIONS = 8
+
+# 断线后首次重连立即进行，连续失败时的退避等待：初始值和上限 (秒)，实际等待在 50%~100% 间随机
+WS_BACKOFF_BASE = 0.5
+WS_BACKOFF_MAX = 30
+
+# 交易时段内连接超过该秒数没有收到任何 tick 时强制重连
+WS_STALE_TIMEOUT = 30
+
+# 每条连接消息速率的统计窗口 (秒)
+WS_RATE_WINDOW = 10
+
+# ========== 订阅生命周期 ==========
+# 超过该秒数无人访问且没有推送连接引用的符号自动退订 (INITIAL_SYMBOLS 常驻)
+SUBSCRIPTION_IDLE_TTL = 3600
+
+# 订阅符号总数上限，超出时退订最久未访问的符号
+SUBSCRIPTION_MAX_SYMBOLS = 500
+
+# 空闲检查间隔 (秒)
+SUBSCRIPTION_SWEEP_INTERVAL = 60
+
+# ========== ASGI 部署 ==========
+# 异步版本中执行 yfinance 上游调用的线程数 (上游再慢也只占用这些线程，连接本身由事件循环承载)
+ASGI_UPSTREAM_WORKERS = 32
+
+# 异步版本中执行 SQLite 读取、实时中枢调用的线程数
+ASGI_LOCAL_WORKERS = 8
+
+# ========== 分钟线存储 ==========
+# 首次拉取 (或本地数据过旧) 时回补的范围
+INTRADAY_BACKFILL_PERIOD = '5d'
+
+# 本地最新分钟线早于该秒数时改为整段回补 (yfinance 1m 数据只保留约 7 天)
+INTRADAY_TOPUP_MAX_AGE = 5 * 86400
+
+# 本地分钟线保留天数
+INTRADAY_RETENTION_DAYS = 30
+
+# ========== 本地分钟线聚合 ==========
+# 由 WebSocket tick 在本地聚合的分钟线周期
+INTRADAY_LOCAL_INTERVALS = ('1m', '5m', '15m', '1h')
+
+# K 线结束后等待迟到 tick 的秒数
+INTRADAY_BAR_CLOSE_DELAY = 2
+
+# 聚合器 tick 缓冲长度
+INTRADAY_TICK_BUFFER = 50000
+
+# 正在本地聚合的符号，分钟线响应的缓存时间 (秒)
+INTRADAY_LIVE_CACHE_TTL = 1
+
+# ========== tick 记录 ==========
+# 是否把全部 WebSocket 消息写入压缩日志 (目录由环境变量 TICK_LOG_DIR 指定，默认 ./ticks)
+TICK_RECORDER_ENABLED = False
+
+# 每个日志段覆盖的时间 (秒) 和最大字节数，超过任一值时新开一段
+TICK_SEGMENT_SECONDS = 3600
+TICK_SEGMENT_BYTES = 64 * 1024 * 1024
+
+# 攒批写盘的最长间隔 (秒)，每批压缩为一个块
+TICK_FLUSH_INTERVAL = 1.0
+
+# 记录器 tick 缓冲长度 (写盘跟不上时丢弃最旧的)
+TICK_RECORDER_BUFFER = 100000
+
+# 日志保留天数
+TICK_RETENTION_DAYS = 30
+
+# /api/ticks 单次最多返回条数
+TICK_QUERY_LIMIT = 10000
@@ -1,8 +1,17 @@
 import sqlite3
+import numpy as np
 import pandas as pd
+import queue
+import threading
+from contextlib import contextmanager
+from itertools import repeat
 from datetime import datetime
 import os
 import logging
+import functools
+import json
+import time
+import metrics
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -10,16 +19,140 @@ logger = logging.getLogger(__name__)
 
 DB_FILE = os.getenv('DB_PATH', 'market_data.db')
 
+# 分钟线交易日按美东时间划分
+MARKET_TZ = 'America/New_York'
+
+# 连接池大小 (同时借出的最大连接数)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '16'))
+
+# 连接池耗尽时最长等待秒数
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+
+# 每个连接的预编译语句缓存条数
+DB_STATEMENT_CACHE = 256
+
+# 连接参数：WAL 允许读写并发，synchronous=NORMAL 在 WAL 下仍保证一致性
+DB_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-32000',       # 约 32MB 页缓存
+    'PRAGMA mmap_size=268435456',     # 256MB 内存映射
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=30000',
+)
+
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_FILE)
+    """新建一个独立连接 (调用方负责关闭)，常规读写请使用 connection()"""
+    conn = sqlite3.connect(DB_FILE, timeout=30, check_same_thread=False,
+                           cached_statements=DB_STATEMENT_CACHE)
     conn.row_factory = sqlite3.Row
+    for pragma in DB_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
 
+class ConnectionPool:
+    """线程安全的 SQLite 连接池，连接在请求线程之间复用"""
+
+    def __init__(self, path, size, timeout=None):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self):
+        """借出一个连接，池满时最多等待 timeout 秒，超时抛出 sqlite3.OperationalError"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return get_db_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f'database connection pool exhausted ({self.size} connections)')
+
+    def release(self, conn):
+        """归还连接，未提交的事务会被回滚"""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    def close(self):
+        """关闭所有空闲连接，借出中的连接归还时关闭"""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """当前 DB_FILE 对应的连接池 (DB_FILE 改变时重建；删除重建数据库文件前需调用 close_db_connections)"""
+    global _pool
+    pool = _pool
+    if pool is not None and pool.path == DB_FILE:
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.path != DB_FILE:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DB_FILE, DB_POOL_SIZE, DB_POOL_TIMEOUT)
+        return _pool
+
+
+@contextmanager
+def connection():
+    """从连接池借用连接: with connection() as conn: ..."""
+    pool = _get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+def close_db_connections():
+    """关闭连接池中的所有连接"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = None
+
+
 def init_db():
     """初始化数据库表"""
-    conn = get_db_connection()
+    with connection() as conn:
+        _create_tables(conn)
+    logger.info("Database initialized.")
+
+
+def _create_tables(conn):
     c = conn.cursor()
 
     # 创建日线数据表
@@ -36,65 +169,158 @@ def init_db():
         )
     ''')
 
+    # 日线版本号：每次写入某符号的日线时加一，各进程据此判断派生结果 (分析指标等) 是否过期
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS daily_versions (
+            symbol TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+
+    # 技术指标的递推状态：last_date/last_close 为最后处理的日线，values 为该日的指标值 (JSON)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS indicator_state (
+            symbol TEXT,
+            indicator TEXT,
+            last_date TEXT,
+            last_close REAL,
+            state TEXT,
+            "values" TEXT,
+            PRIMARY KEY (symbol, indicator)
+        )
+    ''')
+
+    # 技术指标的逐日结果 (v1~v3 依次对应指标的输出列)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS indicator_values (
+            symbol TEXT,
+            indicator TEXT,
+            date TEXT,
+            v1 REAL,
+            v2 REAL,
+            v3 REAL,
+            PRIMARY KEY (symbol, indicator, date)
+        )
+    ''')
+
+    # 创建分钟线数据表 (ts 为 K 线起始时间的 UTC 秒，session 为美东交易日)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS intraday_bars (
+            symbol TEXT,
+            interval TEXT,
+            ts INTEGER,
+            session TEXT,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume INTEGER,
+            PRIMARY KEY (symbol, interval, ts)
+        )
+    ''')
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_intraday_session
+        ON intraday_bars (symbol, interval, session)
+    ''')
+
     conn.commit()
-    conn.close()
-    logger.info("Database initialized.")
 
 
+def _timed(func):
+    """记录查询耗时 (按函数名区分)"""
+    histogram = metrics.sqlite_seconds.labels(func.__name__)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start)
+    return wrapper
+
+
+@_timed
 def get_latest_date(symbol):
     """获取指定股票最新的数据日期"""
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('SELECT MAX(date) FROM daily_prices WHERE symbol = ?', (symbol,))
-    result = c.fetchone()[0]
-    conn.close()
-    return result
+    with connection() as conn:
+        return conn.execute('SELECT MAX(date) FROM daily_prices WHERE symbol = ?', (symbol,)).fetchone()[0]
 
 
-def save_daily_data(symbol, df):
-    """保存日线数据到数据库"""
-    if df.empty:
-        return 0
+def _daily_rows(symbol, df):
+    """把日线 DataFrame 按列一次性转换为待写入的行"""
+    index = pd.DatetimeIndex(df.index)
+    # yfinance 的日期索引可能带时区，去掉时区后保留交易所本地日期
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    dates = np.datetime_as_string(index.values.astype('datetime64[D]'), unit='D')
 
-    conn = get_db_connection()
-    c = conn.cursor()
+    return zip(
+        repeat(symbol),
+        dates.tolist(),
+        df['Open'].to_numpy(dtype=float).tolist(),
+        df['High'].to_numpy(dtype=float).tolist(),
+        df['Low'].to_numpy(dtype=float).tolist(),
+        df['Close'].to_numpy(dtype=float).tolist(),
+        df['Volume'].to_numpy(dtype=float).tolist()
+    )
 
-    count = 0
-    # 确保索引是 datetime，并重置索引以便 date 成为列
-    data_to_save = df.reset_index()
 
-    for _, row in data_to_save.iterrows():
-        # yfinance date 可能是 Date 或 DateTime 类型
-        date_str = row['Date'].strftime('%Y-%m-%d')
+@_timed
+def save_daily_data_bulk(frames):
+    """批量保存多个符号的日线数据 (单个事务)，返回 {symbol: 条数}"""
+    counts = {}
+    try:
+        with connection() as conn:
+            with conn:
+                for symbol, df in frames.items():
+                    if df is None or df.empty:
+                        counts[symbol] = 0
+                        continue
+                    conn.executemany('''
+                        INSERT OR REPLACE INTO daily_prices (symbol, date, open, high, low, close, volume)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', _daily_rows(symbol, df))
+                    counts[symbol] = len(df)
+                # 与数据在同一事务中更新版本号
+                conn.executemany('''
+                    INSERT INTO daily_versions (symbol, version) VALUES (?, 1)
+                    ON CONFLICT(symbol) DO UPDATE SET version = version + 1
+                ''', [(symbol,) for symbol, count in counts.items() if count])
+    except Exception as e:
+        logger.error(f"Error saving daily data for {list(frames)}: {e}")
+        raise
 
-        try:
-            c.execute('''
-                INSERT OR REPLACE INTO daily_prices (symbol, date, open, high, low, close, volume)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                symbol,
-                date_str,
-                row['Open'],
-                row['High'],
-                row['Low'],
-                row['Close'],
-                row['Volume']
-            ))
-            count += 1
-        except Exception as e:
-            logger.error(
-                f"Error inserting row for {symbol} on {date_str}: {e}")
+    for symbol, count in counts.items():
+        logger.info(f"Saved {count} records for {symbol}")
+    return counts
 
-    conn.commit()
-    conn.close()
-    logger.info(f"Saved {count} records for {symbol}")
-    return count
+
+@_timed
+def get_daily_versions(symbols):
+    """各符号日线的版本号 {symbol: version}，从未写入过的为 0"""
+    symbols = list(symbols)
+    if not symbols:
+        return {}
+    placeholders = ', '.join('?' * len(symbols))
+    with connection() as conn:
+        rows = conn.execute(f'SELECT symbol, version FROM daily_versions WHERE symbol IN ({placeholders})',
+                            symbols).fetchall()
+    versions = dict.fromkeys(symbols, 0)
+    versions.update((row[0], row[1]) for row in rows)
+    return versions
 
 
+def save_daily_data(symbol, df):
+    """保存日线数据到数据库"""
+    if df.empty:
+        return 0
+    return save_daily_data_bulk({symbol: df})[symbol]
+
+
+@_timed
 def get_daily_data(symbol, start_date=None, end_date=None):
     """从数据库获取日线数据，返回 DataFrame"""
-    conn = get_db_connection()
-
     query = "SELECT date as Date, open as Open, high as High, low as Low, close as Close, volume as Volume FROM daily_prices WHERE symbol = ?"
     params = [symbol]
 
@@ -109,14 +335,231 @@ def get_daily_data(symbol, start_date=None, end_date=None):
     query += " ORDER BY date ASC"
 
     try:
-        df = pd.read_sql_query(query, conn, params=params)
+        with connection() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
         if not df.empty:
             df['Date'] = pd.to_datetime(df['Date'])
             df.set_index('Date', inplace=True)
     except Exception as e:
         logger.error(f"Error querying data for {symbol}: {e}")
         df = pd.DataFrame()
-    finally:
-        conn.close()
 
     return df
+
+
+@_timed
+def get_daily_data_multi(symbols, start_date=None, end_date=None):
+    """一次查询多个符号的日线，返回按 (Symbol, Date) 排序的 DataFrame (Symbol/Date 为普通列)"""
+    symbols = list(symbols)
+    if not symbols:
+        return pd.DataFrame()
+
+    placeholders = ', '.join('?' * len(symbols))
+    query = ("SELECT symbol as Symbol, date as Date, open as Open, high as High, low as Low, "
+             f"close as Close, volume as Volume FROM daily_prices WHERE symbol IN ({placeholders})")
+    params = list(symbols)
+
+    if start_date:
+        query += " AND date >= ?"
+        params.append(start_date)
+
+    if end_date:
+        query += " AND date <= ?"
+        params.append(end_date)
+
+    # 主键 (symbol, date) 覆盖过滤和排序
+    query += " ORDER BY symbol, date"
+
+    try:
+        with connection() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        if not df.empty:
+            df['Date'] = pd.to_datetime(df['Date'])
+    except Exception as e:
+        logger.error(f"Error querying data for {symbols}: {e}")
+        df = pd.DataFrame()
+
+    return df
+
+
+@_timed
+def get_daily_closes(symbol, start_date=None):
+    """读取日线收盘价，返回 (日期列表, 收盘价 ndarray)"""
+    query = 'SELECT date, close FROM daily_prices WHERE symbol = ? AND close IS NOT NULL'
+    params = [symbol]
+    if start_date:
+        query += ' AND date >= ?'
+        params.append(start_date)
+    with connection() as conn:
+        rows = conn.execute(query + ' ORDER BY date', params).fetchall()
+    return [row[0] for row in rows], np.array([row[1] for row in rows], dtype=float)
+
+
+@_timed
+def get_indicator_states(symbol, indicators):
+    """读取指标状态 {indicator: {'last_date', 'last_close', 'state', 'values'}}，没有状态的指标不在结果中"""
+    indicators = list(indicators)
+    if not indicators:
+        return {}
+    placeholders = ', '.join('?' * len(indicators))
+    with connection() as conn:
+        rows = conn.execute(f'''
+            SELECT indicator, last_date, last_close, state, "values" FROM indicator_state
+            WHERE symbol = ? AND indicator IN ({placeholders})
+        ''', [symbol] + indicators).fetchall()
+    return {row[0]: {
+        'last_date': row[1],
+        'last_close': row[2],
+        'state': json.loads(row[3]),
+        'values': json.loads(row[4]),
+    } for row in rows}
+
+
+@_timed
+def list_indicators(symbols):
+    """各符号已持久化的指标 {symbol: [indicator, ...]}"""
+    symbols = list(symbols)
+    if not symbols:
+        return {}
+    placeholders = ', '.join('?' * len(symbols))
+    with connection() as conn:
+        rows = conn.execute(f'SELECT symbol, indicator FROM indicator_state WHERE symbol IN ({placeholders})',
+                            symbols).fetchall()
+    result = {}
+    for symbol, indicator in rows:
+        result.setdefault(symbol, []).append(indicator)
+    return result
+
+
+def _nullable(values):
+    """NaN 转为 None (写入 NULL)"""
+    return [None if v != v else v for v in np.asarray(values, dtype=float).tolist()]
+
+
+@_timed
+def save_indicator(symbol, indicator, dates, columns, last_close, state, replace=False):
+    """
+    保存指标结果和递推状态 (单个事务)
+    columns 为按输出列顺序排列的 {列名: 数值序列}；replace=True 时先删除该指标的全部旧结果 (全量重算)
+    """
+    outputs = [_nullable(values) for values in columns.values()]
+    outputs += [repeat(None)] * (3 - len(outputs))
+    values = {name: column[-1] for name, column in zip(columns, outputs)} if dates else {}
+    with connection() as conn:
+        with conn:
+            if replace:
+                conn.execute('DELETE FROM indicator_values WHERE symbol = ? AND indicator = ?', (symbol, indicator))
+            conn.executemany('''
+                INSERT OR REPLACE INTO indicator_values (symbol, indicator, date, v1, v2, v3)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', zip(repeat(symbol), repeat(indicator), dates, *outputs))
+            if dates:
+                conn.execute('''
+                    INSERT OR REPLACE INTO indicator_state (symbol, indicator, last_date, last_close, state, "values")
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (symbol, indicator, dates[-1], float(last_close), json.dumps(state), json.dumps(values)))
+    return values
+
+
+@_timed
+def get_indicator_values(symbol, indicator, outputs, start_date=None):
+    """读取指标的逐日结果，返回列式结构 {'date': [...], 输出列: [...]}"""
+    query = 'SELECT date, v1, v2, v3 FROM indicator_values WHERE symbol = ? AND indicator = ?'
+    params = [symbol, indicator]
+    if start_date:
+        query += ' AND date >= ?'
+        params.append(start_date)
+    with connection() as conn:
+        rows = conn.execute(query + ' ORDER BY date', params).fetchall()
+    columns = list(zip(*rows)) if rows else [()] * 4
+    result = {'date': list(columns[0])}
+    for i, name in enumerate(outputs):
+        result[name] = list(columns[i + 1])
+    return result
+
+
+@_timed
+def save_intraday_bars(symbol, interval, df):
+    """保存分钟线数据 (索引需带时区)，返回保存条数"""
+    if df is None or df.empty:
+        return 0
+
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is None:
+        index = index.tz_localize(MARKET_TZ)
+    ts = index.as_unit('s').asi8.tolist()
+    local = index.tz_convert(MARKET_TZ).tz_localize(None)
+    sessions = np.datetime_as_string(local.values.astype('datetime64[D]'), unit='D').tolist()
+
+    rows = zip(
+        repeat(symbol),
+        repeat(interval),
+        ts,
+        sessions,
+        df['Open'].to_numpy(dtype=float).tolist(),
+        df['High'].to_numpy(dtype=float).tolist(),
+        df['Low'].to_numpy(dtype=float).tolist(),
+        df['Close'].to_numpy(dtype=float).tolist(),
+        df['Volume'].to_numpy(dtype=float).tolist()
+    )
+    with connection() as conn:
+        with conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO intraday_bars (symbol, interval, ts, session, open, high, low, close, volume)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+    return len(df)
+
+
+@_timed
+def get_latest_intraday_ts(symbol, interval, before_ts=None):
+    """获取指定符号/间隔最新一根分钟线的起始时间 (UTC 秒)，before_ts 限定只看该时间之前的 K 线"""
+    query = 'SELECT MAX(ts) FROM intraday_bars WHERE symbol = ? AND interval = ?'
+    params = [symbol, interval]
+    if before_ts is not None:
+        query += ' AND ts < ?'
+        params.append(int(before_ts))
+    with connection() as conn:
+        return conn.execute(query, params).fetchone()[0]
+
+
+@_timed
+def get_intraday_bars(symbol, interval, sessions=1, start_ts=None):
+    """获取最近 sessions 个交易日的分钟线，返回索引为美东时间的 DataFrame"""
+    query = '''
+        SELECT ts, open as Open, high as High, low as Low, close as Close, volume as Volume
+        FROM intraday_bars
+        WHERE symbol = ? AND interval = ? AND session IN (
+            SELECT DISTINCT session FROM intraday_bars
+            WHERE symbol = ? AND interval = ?
+            ORDER BY session DESC LIMIT ?
+        )
+    '''
+    params = [symbol, interval, symbol, interval, sessions]
+    if start_ts is not None:
+        query += " AND ts >= ?"
+        params.append(start_ts)
+    query += " ORDER BY ts ASC"
+
+    try:
+        with connection() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        if not df.empty:
+            df.index = pd.to_datetime(df.pop('ts'), unit='s', utc=True).dt.tz_convert(MARKET_TZ)
+            df.index.name = 'Datetime'
+    except Exception as e:
+        logger.error(f"Error querying intraday data for {symbol}: {e}")
+        df = pd.DataFrame()
+
+    return df
+
+
+@_timed
+def prune_intraday_bars(symbol, interval, before_ts):
+    """删除早于 before_ts 的分钟线"""
+    with connection() as conn:
+        with conn:
+            return conn.execute(
+                'DELETE FROM intraday_bars WHERE symbol = ? AND interval = ? AND ts < ?',
+                (symbol, interval, before_ts)
+            ).rowcount
@@ -0,0 +1,43 @@
+"""
+gunicorn 生产配置
+用法 (在 src 目录下): gunicorn -c gunicorn.conf.py main:app
+平滑重载: kill -HUP <主进程 PID>，worker 逐个替换，实时中枢进程和 WebSocket 连接不受影响
+"""
+
+import os
+import tempfile
+
+import realtime_hub
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+
+# gthread: 每个 worker 多线程处理请求，SSE 长连接各占一个线程
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_WORKERS', '2'))
+threads = int(os.getenv('WEB_THREADS', '32'))
+
+# gthread 的 timeout 是 worker 心跳超时，不限制单个请求 (SSE) 的时长
+timeout = int(os.getenv('WEB_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+# 每个 worker 独立导入 main，不在主进程中预加载 (主进程只负责管理 worker 和实时中枢)
+preload_app = False
+
+accesslog = os.getenv('ACCESS_LOG', '-')
+errorlog = '-'
+
+# 实时中枢的 Unix socket 路径
+hub_socket = os.getenv('HUB_SOCKET', os.path.join(tempfile.gettempdir(), f'yahoo-hub-{os.getpid()}.sock'))
+
+
+def on_starting(server):
+    """主进程启动时拉起实时中枢，worker fork 后通过环境变量连接"""
+    realtime_hub.start(hub_socket)
+    server.log.info(f"Realtime hub started on {hub_socket}")
+
+
+def on_exit(server):
+    realtime_hub.stop()
+    if os.path.exists(hub_socket):
+        os.remove(hub_socket)
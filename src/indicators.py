@@ -0,0 +1,255 @@
+"""
+技术指标 (SMA/EMA/RSI/MACD/布林带)
+每个指标提供两种计算方式，结果一致：
+- compute: 对完整收盘价序列向量化计算，同时返回最后的状态
+- update: 从保存的状态出发逐根处理新增 K 线，耗时只与新增条数有关
+状态为可 JSON 序列化的 dict，随指标值一起持久化；preview 用实时价格预估当前 K 线收盘时的指标值
+"""
+
+import copy
+import math
+
+import numpy as np
+import pandas as pd
+
+# 单个指标的最大周期
+MAX_PERIOD = 1000
+
+
+def _ewm(values, alpha):
+    """递推 y[i] = y[i-1] + alpha * (x[i] - y[i-1])，y[0] = x[0]"""
+    return pd.Series(values, dtype=float).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
+def _seeded_ewm(values, n, alpha):
+    """前 n 个值的均值作为初值的指数平均 (前 n-1 个位置为 NaN)，返回 (序列, 状态)"""
+    values = np.asarray(values, dtype=float)
+    out = np.full(len(values), np.nan)
+    if len(values) < n:
+        return out, {'value': None, 'seed': values.tolist()}
+    out[n - 1:] = _ewm(np.r_[values[:n].mean(), values[n:]], alpha)
+    return out, {'value': float(out[-1]), 'seed': []}
+
+
+def _ewm_step(state, x, n, alpha):
+    """_seeded_ewm 的单步版本 (原地更新状态)"""
+    if state['value'] is None:
+        state['seed'].append(x)
+        if len(state['seed']) < n:
+            return math.nan
+        state['value'] = sum(state['seed']) / n
+        state['seed'] = []
+    else:
+        state['value'] += alpha * (x - state['value'])
+    return state['value']
+
+
+class Indicator:
+    """指标基类：params 为周期等整数参数，outputs 为输出列名"""
+
+    name = None
+    defaults = ()
+    outputs = ('value',)
+
+    def __init__(self, *params):
+        if len(params) > len(self.defaults):
+            raise ValueError(f'{self.name} 最多 {len(self.defaults)} 个参数')
+        # 省略的参数使用默认值
+        params = tuple(params) + self.defaults[len(params):]
+        self.params = tuple(self._check(i, p) for i, p in enumerate(params))
+
+    def _check(self, index, value):
+        """参数默认均为周期"""
+        if not float(value).is_integer() or not 1 <= value <= MAX_PERIOD:
+            raise ValueError(f'{self.name} 的周期必须是 1~{MAX_PERIOD} 的整数')
+        return int(value)
+
+    @property
+    def key(self):
+        return ':'.join([self.name] + [_format_param(p) for p in self.params])
+
+    def compute(self, closes):
+        """向量化计算全部历史，返回 ({输出列: ndarray}, 状态)"""
+        raise NotImplementedError
+
+    def update(self, state, closes):
+        """从状态出发处理新增收盘价，返回 ({输出列: list}, 新状态) (会修改传入的状态)"""
+        columns = {name: [] for name in self.outputs}
+        for x in closes:
+            for name, value in zip(self.outputs, self.step(state, float(x))):
+                columns[name].append(value)
+        return columns, state
+
+    def step(self, state, x):
+        raise NotImplementedError
+
+    def preview(self, state, price):
+        """假设当前 K 线以 price 收盘时的指标值 (不修改状态)"""
+        return dict(zip(self.outputs, self.step(copy.deepcopy(state), float(price))))
+
+
+class SMA(Indicator):
+    name = 'sma'
+    defaults = (20,)
+
+    def compute(self, closes):
+        n = self.params[0]
+        closes = np.asarray(closes, dtype=float)
+        out = pd.Series(closes).rolling(n, min_periods=n).mean().to_numpy()
+        return {'value': out}, {'window': closes[-n:].tolist()}
+
+    def step(self, state, x):
+        n = self.params[0]
+        window = state['window']
+        window.append(x)
+        if len(window) > n:
+            del window[0]
+        return (sum(window) / n if len(window) == n else math.nan,)
+
+
+class EMA(Indicator):
+    name = 'ema'
+    defaults = (20,)
+
+    def compute(self, closes):
+        n = self.params[0]
+        out, state = _seeded_ewm(closes, n, 2 / (n + 1))
+        return {'value': out}, state
+
+    def step(self, state, x):
+        n = self.params[0]
+        return (_ewm_step(state, x, n, 2 / (n + 1)),)
+
+
+class RSI(Indicator):
+    """Wilder RSI：涨跌幅的前 n 个均值作初值，之后按 1/n 平滑"""
+
+    name = 'rsi'
+    defaults = (14,)
+
+    @staticmethod
+    def _rsi(gain, loss):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(loss == 0, np.where(gain == 0, 50.0, 100.0), 100 - 100 / (1 + gain / loss))
+
+    def compute(self, closes):
+        n = self.params[0]
+        closes = np.asarray(closes, dtype=float)
+        out = np.full(len(closes), np.nan)
+        diff = np.diff(closes)
+        gain, gain_state = _seeded_ewm(np.maximum(diff, 0), n, 1 / n)
+        loss, loss_state = _seeded_ewm(np.maximum(-diff, 0), n, 1 / n)
+        out[1:] = self._rsi(gain, loss)
+        state = {'prev': float(closes[-1]) if len(closes) else None, 'gain': gain_state, 'loss': loss_state}
+        return {'value': out}, state
+
+    def step(self, state, x):
+        n = self.params[0]
+        prev, state['prev'] = state['prev'], x
+        if prev is None:
+            return (math.nan,)
+        gain = _ewm_step(state['gain'], max(x - prev, 0.0), n, 1 / n)
+        loss = _ewm_step(state['loss'], max(prev - x, 0.0), n, 1 / n)
+        if math.isnan(gain):
+            return (math.nan,)
+        return (float(self._rsi(np.float64(gain), np.float64(loss))),)
+
+
+class MACD(Indicator):
+    name = 'macd'
+    defaults = (12, 26, 9)
+    outputs = ('macd', 'signal', 'histogram')
+
+    def compute(self, closes):
+        fast, slow, signal = self.params
+        fast_line, fast_state = _seeded_ewm(closes, fast, 2 / (fast + 1))
+        slow_line, slow_state = _seeded_ewm(closes, slow, 2 / (slow + 1))
+        macd = fast_line - slow_line
+        # 信号线从 MACD 第一个有效值开始计算
+        start = min(max(fast, slow) - 1, len(macd))
+        signal_line = np.full(len(macd), np.nan)
+        signal_line[start:], signal_state = _seeded_ewm(macd[start:], signal, 2 / (signal + 1))
+        state = {'fast': fast_state, 'slow': slow_state, 'signal': signal_state}
+        return {'macd': macd, 'signal': signal_line, 'histogram': macd - signal_line}, state
+
+    def step(self, state, x):
+        fast, slow, signal = self.params
+        macd = (_ewm_step(state['fast'], x, fast, 2 / (fast + 1))
+                - _ewm_step(state['slow'], x, slow, 2 / (slow + 1)))
+        if math.isnan(macd):
+            return math.nan, math.nan, math.nan
+        signal_value = _ewm_step(state['signal'], macd, signal, 2 / (signal + 1))
+        return macd, signal_value, macd - signal_value
+
+
+class Bollinger(Indicator):
+    """布林带：n 日均线 ± k 倍总体标准差"""
+
+    name = 'bb'
+    defaults = (20, 2)
+    outputs = ('middle', 'upper', 'lower')
+
+    def _check(self, index, value):
+        if index == 1:
+            if not 0 < value <= 10:
+                raise ValueError('bb 的倍数必须在 (0, 10] 之间')
+            return float(value)
+        return super()._check(index, value)
+
+    def compute(self, closes):
+        n, k = self.params
+        closes = pd.Series(np.asarray(closes, dtype=float))
+        rolling = closes.rolling(n, min_periods=n)
+        middle = rolling.mean().to_numpy()
+        std = rolling.std(ddof=0).to_numpy()
+        return ({'middle': middle, 'upper': middle + k * std, 'lower': middle - k * std},
+                {'window': closes.to_numpy()[-n:].tolist()})
+
+    def step(self, state, x):
+        n, k = self.params
+        window = state['window']
+        window.append(x)
+        if len(window) > n:
+            del window[0]
+        if len(window) < n:
+            return math.nan, math.nan, math.nan
+        middle = sum(window) / n
+        std = math.sqrt(sum((v - middle) ** 2 for v in window) / n)
+        return middle, middle + k * std, middle - k * std
+
+
+INDICATORS = {cls.name: cls for cls in (SMA, EMA, RSI, MACD, Bollinger)}
+
+
+def _format_param(value):
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def rounded(values, digits=4):
+    """四舍五入，NaN/None 转为 None (便于 JSON 输出)"""
+    return [None if v is None or v != v else round(v, digits) for v in values]
+
+
+def parse(spec):
+    """
+    解析指标参数，如 'sma:50,ema:20,rsi:14,macd:12:26:9,bb:20:2' (省略参数时使用默认值)
+    返回去重后的指标列表，格式错误时抛出 ValueError
+    """
+    result = {}
+    for item in (spec or '').split(','):
+        item = item.strip().lower()
+        if not item:
+            continue
+        name, *raw = item.split(':')
+        cls = INDICATORS.get(name)
+        if cls is None:
+            raise ValueError(f'未知指标 {name}，可选: {", ".join(INDICATORS)}')
+        try:
+            params = [float(p) for p in raw]
+        except ValueError:
+            raise ValueError(f'指标参数必须是数字: {item}')
+        indicator = cls(*params)
+        result.setdefault(indicator.key, indicator)
+    if not result:
+        raise ValueError('ind 参数不能为空')
+    return list(result.values())
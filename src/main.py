@@ -8,14 +8,34 @@ from datetime import timedelta
 import database
 import time
 from datetime import datetime
-from queue import Queue
+import pandas as pd
 import yfinance as yf
+import yfinance.shared  # 部分版本的 yf.download 把单个符号的错误记录在 shared._ERRORS
 import threading
-from flask import Flask, jsonify, request
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 import os
 import sys
 import socket
 import logging
+import math
+import bisect
+import cache
+import serialize
+import singleflight
+import sync_scheduler
+import tick_bus
+import quote_store
+import market_calendar
+import bar_aggregator
+import realtime_hub
+import ws_pool
+import subscriptions
+import tick_recorder
+import metrics
+import upstream
+import analytics
+import indicators
 import config  # 导入配置
 
 # ========== 智能代理检测 - 必须在 import yfinance 之前 ==========
@@ -129,7 +149,9 @@ def get_api_docs():
                     {'name': 'period', 'type': 'string', 'required': False, 'default': '1mo', 'description': '时间范围', 'options': [
                         '1d', '5d', '1mo', '3mo', '6mo', '1y', '2y', '5y', 'ytd', 'max']},
                     {'name': 'interval', 'type': 'string', 'required': False, 'default': '1d',
-                        'description': '数据间隔', 'options': ['1m', '5m', '15m', '30m', '1h', '1d', '1wk', '1mo']}
+                        'description': '数据间隔', 'options': ['1m', '5m', '15m', '30m', '1h', '1d', '1wk', '1mo']},
+                    {'name': 'format', 'type': 'string', 'required': False, 'default': 'records',
+                        'description': '返回格式，columnar 为按列数组', 'options': ['records', 'columnar']}
                 ],
                 'example': '/api/history/QQQ?period=1mo&interval=1d',
                 'response_example': {
@@ -143,6 +165,31 @@ def get_api_docs():
                     ]
                 }
             },
+            {
+                'path': '/api/history',
+                'method': 'GET',
+                'description': '批量获取多个符号的日线 (一次数据库查询，过期数据合并为一次批量下载)',
+                'params': [
+                    {'name': 'symbols', 'type': 'string', 'required': True,
+                        'description': '逗号分隔的股票代码'},
+                    {'name': 'period', 'type': 'string', 'required': False,
+                        'default': '1mo', 'description': '时间范围'},
+                    {'name': 'format', 'type': 'string', 'required': False, 'default': 'records',
+                        'description': '返回格式', 'options': ['records', 'columnar']}
+                ],
+                'example': '/api/history?symbols=QQQ,SPY,DIA&period=3mo',
+                'response_example': {
+                    'period': '3mo',
+                    'interval': '1d',
+                    'format': 'records',
+                    'data': {
+                        'QQQ': [{'date': '2026-01-01', 'open': 450.0, 'high': 455.0, 'low': 448.0,
+                                 'close': 453.0, 'volume': 50000000, 'change_percent': 0.0}]
+                    },
+                    'cached': {'QQQ': False},
+                    'errors': {}
+                }
+            },
             {
                 'path': '/api/intraday/<symbol>',
                 'method': 'GET',
@@ -172,7 +219,9 @@ def get_api_docs():
                     {'name': 'symbols', 'type': 'string', 'required': False,
                         'default': 'QQQ,SPY', 'description': '逗号分隔的股票代码'},
                     {'name': 'period', 'type': 'string', 'required': False,
-                        'default': '1mo', 'description': '时间范围'}
+                        'default': '1mo', 'description': '时间范围'},
+                    {'name': 'timeout', 'type': 'float', 'required': False,
+                        'default': 20, 'description': '最长等待秒数，超时的符号返回部分结果并在 errors 中说明'}
                 ],
                 'example': '/api/compare?symbols=QQQ,SPY,DIA&period=3mo',
                 'response_example': {
@@ -180,7 +229,64 @@ def get_api_docs():
                     'benchmarks': {
                         'QQQ': {'start_price': 430.0, 'end_price': 453.0, 'total_change': 5.35, 'data': []},
                         'SPY': {'start_price': 480.0, 'end_price': 500.0, 'total_change': 4.17, 'data': []}
-                    }
+                    },
+                    'errors': {}
+                }
+            },
+            {
+                'path': '/api/analytics',
+                'method': 'GET',
+                'description': '多符号收益率、波动率、最大回撤和相关系数矩阵 (服务端计算并缓存)',
+                'params': [
+                    {'name': 'symbols', 'type': 'string', 'required': True,
+                        'description': '逗号分隔的股票代码'},
+                    {'name': 'period', 'type': 'string', 'required': False,
+                        'default': '1y', 'description': '时间范围'},
+                    {'name': 'window', 'type': 'int', 'required': False,
+                        'default': 20, 'description': '滚动波动率窗口 (交易日)'},
+                    {'name': 'series', 'type': 'bool', 'required': False,
+                        'default': False, 'description': 'true 时附带逐日累计收益、滚动波动率和回撤'}
+                ],
+                'example': '/api/analytics?symbols=QQQ,SPY&period=1y',
+                'response_example': {
+                    'period': '1y',
+                    'window': 20,
+                    'as_of': '2026-10-16',
+                    'metrics': {
+                        'QQQ': {'points': 251, 'start_date': '2025-10-16', 'end_date': '2026-10-16',
+                                'total_return': 0.18, 'annualized_return': 0.18, 'volatility': 0.21,
+                                'rolling_volatility': 0.17, 'max_drawdown': -0.12,
+                                'drawdown_peak': '2026-02-19', 'drawdown_trough': '2026-04-08',
+                                'current_drawdown': -0.01}
+                    },
+                    'correlation': {'symbols': ['QQQ', 'SPY'], 'matrix': [[1.0, 0.93], [0.93, 1.0]]},
+                    'errors': {},
+                    'cached': False
+                }
+            },
+            {
+                'path': '/api/indicators/<symbol>',
+                'method': 'GET',
+                'description': '技术指标 SMA/EMA/RSI/MACD/布林带 (基于完整日线计算，新增日线后增量更新)',
+                'params': [
+                    {'name': 'ind', 'type': 'string', 'required': True,
+                        'description': '逗号分隔的指标，如 sma:50,ema:20,rsi:14,macd:12:26:9,bb:20:2'},
+                    {'name': 'period', 'type': 'string', 'required': False,
+                        'default': '1y', 'description': '返回的时间范围'},
+                    {'name': 'format', 'type': 'string', 'required': False,
+                        'default': 'records', 'description': 'records 或 columnar'}
+                ],
+                'example': '/api/indicators/QQQ?ind=sma:50,rsi:14&period=3mo',
+                'response_example': {
+                    'symbol': 'QQQ',
+                    'period': '3mo',
+                    'as_of': '2026-10-16',
+                    'format': 'records',
+                    'indicators': {
+                        'sma:50': [{'date': '2026-10-16', 'value': 598.12}],
+                        'rsi:14': [{'date': '2026-10-16', 'value': 61.8}]
+                    },
+                    'cached': False
                 }
             },
             {
@@ -196,7 +302,27 @@ def get_api_docs():
                     'change': 3.15,
                     'change_percent': 0.70,
                     'volume': 45000000,
-                    'previous_close': 450.10
+                    'previous_close': 450.10,
+                    'source': 'realtime',
+                    'cached': False
+                }
+            },
+            {
+                'path': '/api/cache/stats',
+                'method': 'GET',
+                'description': '获取历史数据缓存的命中/未命中/淘汰统计',
+                'params': [],
+                'example': '/api/cache/stats',
+                'response_example': {
+                    'entries': 12,
+                    'max_entries': 2000,
+                    'bytes': 1048576,
+                    'max_bytes': 134217728,
+                    'hits': 340,
+                    'misses': 25,
+                    'hit_ratio': 0.9315,
+                    'evictions': 0,
+                    'expirations': 13
                 }
             },
             {
@@ -250,6 +376,22 @@ def get_api_docs():
                     'results': {'AAPL': {'status': 'ok', 'data': {'price': 150.0, 'timestamp': '...'}}}
                 }
             },
+            {
+                'path': '/api/stream',
+                'method': 'GET',
+                'description': 'SSE 实时行情推送（自动订阅，按符号限速并定期发送心跳）',
+                'params': [
+                    {'name': 'symbols', 'type': 'string',
+                        'description': '逗号分隔的符号列表', 'default': '', 'required': True},
+                    {'name': 'max_rate', 'type': 'number',
+                        'description': '每个符号每秒最多推送次数', 'default': 4, 'required': False},
+                    {'name': 'ind', 'type': 'string',
+                        'description': '可选，同 /api/indicators；每条报价后附带一条 indicators 事件 (按当前价预估当日值)',
+                        'default': '', 'required': False}
+                ],
+                'example': '/api/stream?symbols=AAPL,MSFT',
+                'response_example': 'event: quote\ndata: {"symbol": "AAPL", "price": 150.0, "timestamp": "..."}\n\n'
+            },
             {
                 'path': '/api/subscriptions',
                 'method': 'GET',
@@ -260,11 +402,63 @@ def get_api_docs():
                     'subscribed_symbols': ['AAPL', 'QQQ'],
                     'subscribed_count': 2
                 }
+            },
+            {
+                'path': '/api/ticks/<symbol>',
+                'method': 'GET',
+                'description': '回放 tick 记录器保存的原始 WebSocket 消息 (需开启 TICK_RECORDER_ENABLED)',
+                'params': [
+                    {'name': 'from', 'type': 'string',
+                        'description': '起始时间 (Unix 秒或纽约时间 YYYY-MM-DD HH:MM[:SS])', 'default': 'to 前 1 小时', 'required': False},
+                    {'name': 'to', 'type': 'string',
+                        'description': '结束时间 (格式同 from)', 'default': '当前时间', 'required': False},
+                    {'name': 'limit', 'type': 'int',
+                        'description': '最多返回条数', 'default': 10000, 'required': False}
+                ],
+                'example': '/api/ticks/QQQ?from=2026-10-16 09:30&to=2026-10-16 10:00',
+                'response_example': {
+                    'symbol': 'QQQ',
+                    'count': 1,
+                    'truncated': False,
+                    'ticks': [{'id': 'QQQ', 'price': 500.5, 'time': '1792157400000', 'day_volume': '1234'}]
+                }
             }
         ]
     })
 
 
+def json_response(payload, status=200):
+    """直接从序列化后的 bytes 构造 JSON 响应 (大响应比 jsonify 更快)"""
+    start = time.perf_counter()
+    body = serialize.dumps(payload)
+    metrics.serialize_seconds.observe(time.perf_counter() - start)
+    return Response(body, status=status, mimetype='application/json')
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.http_request_seconds.labels(route, request.method, str(response.status_code)).observe(
+            time.perf_counter() - start)
+    return response
+
+
+def upstream_error(e):
+    """上游网关拒绝且没有可用的过期数据时返回 503"""
+    response = jsonify({'error': str(e), 'reason': e.reason})
+    response.status_code = 503
+    if e.retry_after:
+        response.headers['Retry-After'] = str(math.ceil(e.retry_after))
+    return response
+
+
 @app.after_request
 def add_cors_headers(response):
     response.headers['Access-Control-Allow-Origin'] = '*'
@@ -278,49 +472,90 @@ def add_cors_headers(response):
 # 存储最新的数据和连接状态（原有功能）
 latest_data = None
 latest_data_lock = threading.Lock()
-connection_status = 'disconnected'
-status_lock = threading.Lock()
 
-# 数据队列
-data_queue = Queue()
+# 实时 tick 总线：下游消费者 (SSE、记录器、聚合器等) 通过 subscribe 接入，各自有界缓冲
+realtime_bus = tick_bus.TickBus()
+
+# 缓存数据，避免频繁请求（有界 LRU + 按 interval 的 TTL）
+data_cache = cache.TTLCache(
+    max_entries=config.CACHE_MAX_ENTRIES,
+    max_bytes=config.CACHE_MAX_BYTES,
+    default_ttl=config.CACHE_DEFAULT_TTL,
+    stale_ttl=config.CACHE_STALE_TTL
+)
+
+# 上游请求合并：相同 key 的并发请求只调用一次 Yahoo
+upstream_flight = singleflight.SingleFlight()
+
+# 上游网关：所有 yfinance REST 调用共用的限速、并发上限和熔断
+upstream_gateway = upstream.UpstreamGateway(
+    rate=config.UPSTREAM_RATE,
+    burst=config.UPSTREAM_BURST,
+    max_concurrency=config.UPSTREAM_MAX_CONCURRENCY,
+    max_wait=config.UPSTREAM_MAX_WAIT,
+    failure_threshold=config.UPSTREAM_FAILURE_THRESHOLD,
+    failure_ratio=config.UPSTREAM_FAILURE_RATIO,
+    failure_window=config.UPSTREAM_FAILURE_WINDOW,
+    open_seconds=config.UPSTREAM_OPEN_SECONDS
+)
 
-# 缓存数据，避免频繁请求
-data_cache = {}
-cache_lock = threading.Lock()
-CACHE_DURATION = 60  # 缓存60秒
+# 过期缓存的后台刷新 (stale-while-revalidate)
+refresh_executor = ThreadPoolExecutor(max_workers=config.CACHE_REFRESH_WORKERS,
+                                      thread_name_prefix='refresh')
+
+# 多符号请求共用的有界线程池，限制同时访问 Yahoo/数据库的并发数
+compare_executor = ThreadPoolExecutor(max_workers=config.COMPARE_MAX_WORKERS,
+                                      thread_name_prefix='compare')
 
 # ========== 实时数据相关全局变量 ==========
-# 存储所有订阅符号的最新实时数据 {symbol: {price, change, volume, timestamp, ...}}
-realtime_data = {}
-realtime_data_lock = threading.Lock()
+# 存储所有订阅符号的最新实时数据 (每个符号一条 __slots__ 记录，原地更新)
+realtime_data = quote_store.QuoteStore()
+
 
-# 已订阅的符号集合
-subscribed_symbols = set()
-subscribed_symbols_lock = threading.Lock()
 
-# WebSocket 实例引用，用于动态添加订阅
-ws_instance = None
-ws_instance_lock = threading.Lock()
+def get_cache_ttl(interval, symbol=None):
+    """根据数据间隔获取缓存 TTL"""
+    ttl = config.CACHE_TTL_BY_INTERVAL.get(interval, config.CACHE_DEFAULT_TTL)
+    # 日线已是最新时，下一根日线出现之前数据不会变化，可以缓存更久
+    if interval == '1d' and symbol and daily_sync.is_fresh(symbol):
+        ttl = max(ttl, min(daily_sync.seconds_until_next_bar(), config.CACHE_CLOSED_BAR_MAX_TTL))
+    return ttl
 
 
-def get_cached_data(symbol, period='1mo'):
-    """获取缓存的历史数据"""
-    cache_key = f"{symbol}_{period}"
-    now = time.time()
+def get_max_staleness(interval):
+    """过期多久以内的缓存仍可直接返回 (同时在后台刷新)"""
+    return config.CACHE_MAX_STALENESS_BY_INTERVAL.get(interval, config.CACHE_MAX_STALENESS)
 
-    with cache_lock:
-        if cache_key in data_cache:
-            cached_time, data = data_cache[cache_key]
-            if now - cached_time < CACHE_DURATION:
-                return data
-    return None
 
+def get_cached_data(symbol, period='1mo', interval='1d'):
+    """
+    获取缓存的历史数据 (stale-while-revalidate):
+    已过期但未超过最大陈旧时间的直接返回，同时在后台刷新 (同一个 key 只刷新一次)
+    """
+    entry = data_cache.get_stale((symbol, period, interval), get_max_staleness(interval))
+    if entry is None:
+        return None
+    columns, expired = entry
+    if expired:
+        upstream_flight.submit(refresh_executor, ('history', symbol, period, interval),
+                               refresh_history, symbol, period, interval)
+    return columns
 
-def set_cached_data(symbol, period, data):
+
+def set_cached_data(symbol, period, interval, data):
     """设置缓存数据"""
-    cache_key = f"{symbol}_{period}"
-    with cache_lock:
-        data_cache[cache_key] = (time.time(), data)
+    data_cache.set((symbol, period, interval), data, ttl=get_cache_ttl(interval, symbol))
+
+
+def get_stale_data(key):
+    """上游不可用时的兜底：已过期但仍在保留期内的缓存值"""
+    entry = data_cache.peek(key)
+    return entry[0] if entry is not None else None
+
+
+def history_is_stale(symbol, interval):
+    """日线是否落后于最近一个已完成的交易日 (同步失败或尚未完成时从本地库返回的旧数据)"""
+    return interval == '1d' and not daily_sync.is_fresh(symbol)
 
 
 # 初始化数据库
@@ -330,6 +565,194 @@ except Exception as e:
     logging.error(f"Failed to init database: {e}")
 
 
+def call_upstream(call, fn, *args, **kwargs):
+    """经上游网关调用 Yahoo 并记录耗时 (被网关拒绝时抛出 upstream.UpstreamUnavailable)"""
+    def _timed():
+        with metrics.timed(metrics.upstream_seconds, call, errors=metrics.upstream_errors):
+            return fn(*args, **kwargs)
+    return upstream_gateway.call(call, _timed)
+
+
+def fetch_ticker_history(symbol, period=None, interval='1d', start=None):
+    """从 Yahoo 拉取 K 线 (相同参数的并发请求只发起一次)"""
+    kwargs = {'start': start} if start is not None else {'period': period}
+    return upstream_flight.do(('ticker_history', symbol, period, interval, start), call_upstream, 'history',
+                              lambda: yf.Ticker(symbol).history(interval=interval, **kwargs))
+
+
+def fetch_ticker_info(symbol):
+    """从 Yahoo 拉取 info (相同符号的并发请求只发起一次)"""
+    return upstream_flight.do(('info', symbol), call_upstream, 'info', lambda: yf.Ticker(symbol).info)
+
+
+def fetch_fast_quote(symbol):
+    """通过 fast_info 拉取价格/昨收/成交量 (只请求价格图表，比 .info 轻量)"""
+    def _fetch():
+        fast = yf.Ticker(symbol).fast_info
+        return {
+            'price': fast.last_price,
+            'previous_close': fast.regular_market_previous_close,
+            'volume': fast.last_volume,
+        }
+    return upstream_flight.do(('fast_info', symbol), call_upstream, 'fast_info', _fetch)
+
+
+def get_quote_name(symbol):
+    """名称等静态字段变化极少，从 .info 取得后缓存数小时"""
+    key = ('quote_static', symbol)
+    name = data_cache.get(key)
+    if name is None:
+        try:
+            name = fetch_ticker_info(symbol).get('shortName', symbol)
+        except upstream.UpstreamUnavailable:
+            # 价格已取得时不因名称被限流而放弃，下次再取
+            return symbol
+        data_cache.set(key, name, ttl=config.QUOTE_STATIC_TTL)
+    return name
+
+
+def realtime_quote(symbol, max_age=config.QUOTE_REALTIME_MAX_AGE):
+    """订阅中的符号直接由 WebSocket 实时报价构造，没有足够新的数据时返回 None (max_age=None 不检查时间)"""
+    live = realtime_data.get(symbol)
+    if live is None or live['price'] is None:
+        return None
+    # 时间取自同一份快照：多进程模式下只访问一次中枢，期间被退订也不会读到 None
+    if max_age is not None and market_calendar.is_market_open():
+        if time.time() - live['updated_at'] > max_age:
+            return None
+    volume = live['volume']
+    change = live['change'] or 0
+    return {
+        'symbol': symbol,
+        'name': live['name'] or data_cache.get(('quote_static', symbol)) or symbol,
+        'price': live['price'],
+        'change': change,
+        'change_percent': live['change_percent'] or 0,
+        'volume': int(volume) if volume is not None else 0,
+        # 消息中通常不带昨收，由涨跌额反推
+        'previous_close': live['previous_close'] or live['price'] - change,
+        'stale': False,
+    }
+
+
+def cached_quote(symbol):
+    """
+    不访问网络的报价层级 (实时报价、短期报价缓存)，返回 (quote, source, cached) 或 None
+    报价缓存过期不超过 QUOTE_MAX_STALENESS 时直接返回，同时在后台刷新
+    """
+    quote = realtime_quote(symbol)
+    if quote is not None:
+        return quote, 'realtime', False
+    return quote_from_cache(symbol)
+
+
+def quote_from_cache(symbol):
+    """短期报价缓存层级，过期时提交后台刷新，返回 (quote, source, cached) 或 None"""
+    entry = data_cache.get_stale(('quote', symbol), config.QUOTE_MAX_STALENESS)
+    if entry is None:
+        return None
+    (quote, source), expired = entry
+    if expired:
+        upstream_flight.submit(refresh_executor, ('quote', symbol), fetch_quote, symbol)
+    return quote, source, True
+
+
+def stale_quote(symbol):
+    """
+    上游不可用时的兜底报价 (quote 带 stale: True)，返回 (quote, source, cached) 或 None:
+    已过期的报价缓存 -> 任意时间的实时报价 -> 本地最近两根日线
+    """
+    entry = data_cache.peek(('quote', symbol))
+    if entry is not None:
+        quote, source = entry[0]
+        return dict(quote, stale=True), source, True
+
+    quote = realtime_quote(symbol, max_age=None)
+    if quote is not None:
+        return dict(quote, stale=True), 'realtime', False
+
+    start = (datetime.now() - timedelta(days=14)).strftime('%Y-%m-%d')
+    df = database.get_daily_data(symbol, start_date=start)
+    if df.empty:
+        return None
+    close = df['Close'].to_numpy(dtype=float)
+    price = close[-1]
+    previous_close = close[-2] if len(close) > 1 else 0
+    change = price - previous_close if previous_close else 0
+    return {
+        'symbol': symbol,
+        'name': data_cache.get(('quote_static', symbol)) or symbol,
+        'price': price,
+        'change': change,
+        'change_percent': change / previous_close * 100 if previous_close else 0,
+        'volume': int(df['Volume'].iloc[-1] or 0),
+        'previous_close': previous_close,
+        'stale': True,
+    }, 'database', False
+
+
+def resolve_quote(symbol):
+    """
+    按代价从低到高解析报价，返回 (quote, source, cached):
+    实时报价 -> 短期报价缓存 -> fast_info -> 完整 .info；Yahoo 不可用时退回 stale_quote
+    """
+    result = cached_quote(symbol)
+    if result is not None:
+        return result
+
+    try:
+        return upstream_flight.do(('quote', symbol), fetch_quote, symbol)
+    except Exception as e:
+        fallback = stale_quote(symbol)
+        if fallback is None:
+            raise
+        logging.warning(f"获取 {symbol} 报价失败，返回过期数据: {e}")
+        return fallback
+
+
+def fetch_quote(symbol):
+    """从 Yahoo 拉取报价并写入短期缓存，返回 (quote, source, False)"""
+    try:
+        fast = fetch_fast_quote(symbol)
+        if not fast['price']:
+            raise ValueError('fast_info 未返回价格')
+        price = fast['price']
+        previous_close = fast['previous_close'] or 0
+        change = price - previous_close if previous_close else 0
+        quote = {
+            'symbol': symbol,
+            'name': get_quote_name(symbol),
+            'price': price,
+            'change': change,
+            'change_percent': change / previous_close * 100 if previous_close else 0,
+            'volume': fast['volume'] or 0,
+            'previous_close': previous_close,
+            'stale': False,
+        }
+        source = 'fast_info'
+    except upstream.UpstreamUnavailable:
+        # 网关拒绝时 .info 同样会被拒绝
+        raise
+    except Exception as e:
+        logging.warning(f"fast_info 获取 {symbol} 失败，改用 info: {e}")
+        info = fetch_ticker_info(symbol)
+        data_cache.set(('quote_static', symbol), info.get('shortName', symbol), ttl=config.QUOTE_STATIC_TTL)
+        quote = {
+            'symbol': symbol,
+            'name': info.get('shortName', symbol),
+            'price': info.get('regularMarketPrice', 0),
+            'change': info.get('regularMarketChange', 0),
+            'change_percent': info.get('regularMarketChangePercent', 0),
+            'volume': info.get('regularMarketVolume', 0),
+            'previous_close': info.get('regularMarketPreviousClose', 0),
+            'stale': False,
+        }
+        source = 'info'
+
+    data_cache.set(('quote', symbol), (quote, source), ttl=config.QUOTE_CACHE_TTL)
+    return quote, source, False
+
+
 def get_start_date_from_period(period):
     """根据 period 计算起始日期"""
     now = datetime.now()
@@ -359,66 +782,191 @@ def get_start_date_from_period(period):
 
 
 def fetch_historical_data(symbol, period='1mo', interval='1d'):
-    """获取历史数据 (集成数据库缓存)"""
-    # 目前仅对日线数据使用数据库缓存
+    """获取历史数据，返回行式列表 [{'date': ..., 'close': ...}, ...]"""
+    columns = fetch_historical_columns(symbol, period, interval)
+    return serialize.columns_to_records(columns) if columns else None
+
+
+def fetch_historical_columns(symbol, period='1mo', interval='1d'):
+    """获取列式历史数据 (集成数据库缓存，并发请求合并为一次上游调用)"""
+    return upstream_flight.do(('history', symbol, period, interval),
+                              _fetch_historical_columns, symbol, period, interval)
+
+
+def refresh_history(symbol, period, interval):
+    """后台刷新一条历史数据缓存 (与 fetch_historical_columns 共用单飞 key，返回值相同)"""
+    columns = _fetch_historical_columns(symbol, period, interval)
+    if columns is not None:
+        set_cached_data(symbol, period, interval, columns)
+    return columns
+
+
+def download_daily_batch(symbols, start=None, period=None):
+    """一次请求批量拉取多个符号的日线，返回 {symbol: DataFrame}"""
+    kwargs = {'start': start} if start else {'period': period or 'max'}
+
+    def _download():
+        data = yf.download(symbols, interval='1d', group_by='ticker',
+                           auto_adjust=True, actions=False, threads=True, progress=False, **kwargs)
+        frames = _split_download(data, symbols)
+        if not any(not df.empty for df in frames.values()):
+            # yf.download 不会因单个符号失败 (如 429) 抛出异常，只返回空结果；
+            # 在网关内抛出，计入失败次数和熔断
+            errors = {s: e for s, e in getattr(yf.shared, '_ERRORS', {}).items() if s in symbols}
+            raise RuntimeError(f"yf.download returned no data for {symbols}" + (f": {errors}" if errors else ''))
+        return frames
+
+    return call_upstream('download', _download)
+
+
+def _split_download(data, symbols):
+    """把 yf.download (group_by='ticker') 的结果拆分为 {symbol: DataFrame}"""
+    if data is None or data.empty:
+        return {}
+
+    frames = {}
+    for symbol in symbols:
+        if isinstance(data.columns, pd.MultiIndex):
+            if symbol not in data.columns.get_level_values(0):
+                continue
+            df = data[symbol]
+        else:
+            df = data
+        df = df.dropna(how='all')
+        df.index.name = 'Date'
+        frames[symbol] = df
+    return frames
+
+
+def update_indicators(symbol, specs):
+    """
+    把指标推进到本地最新日线 (只读本地数据)，返回 {指标: 状态记录}
+    已有状态时只处理其后新增的 K 线；首次计算或最后处理的那根日线被修订时全量向量化重算
+    """
+    records = database.get_indicator_states(symbol, [ind.key for ind in specs])
+    complete = len(records) == len(specs)
+    # 所有指标都有状态时只需读取最早状态之后的日线
+    start = min(r['last_date'] for r in records.values()) if complete else None
+    dates, closes = database.get_daily_closes(symbol, start)
+    history = None if complete else (dates, closes)
+
+    for ind in specs:
+        record = records.get(ind.key)
+        if record is not None:
+            i = bisect.bisect_left(dates, record['last_date'])
+            if i < len(dates) and dates[i] == record['last_date'] and closes[i] == record['last_close']:
+                if i + 1 < len(dates):
+                    columns, state = ind.update(record['state'], closes[i + 1:])
+                    values = database.save_indicator(symbol, ind.key, dates[i + 1:], columns, closes[-1], state)
+                    records[ind.key] = {'last_date': dates[-1], 'last_close': float(closes[-1]),
+                                        'state': state, 'values': values}
+                continue
+            logging.info(f"Daily history of {symbol} was revised, recomputing {ind.key}")
+
+        if history is None:
+            history = database.get_daily_closes(symbol)
+        all_dates, all_closes = history
+        if not all_dates:
+            continue
+        columns, state = ind.compute(all_closes)
+        values = database.save_indicator(symbol, ind.key, all_dates, columns, all_closes[-1], state, replace=True)
+        records[ind.key] = {'last_date': all_dates[-1], 'last_close': float(all_closes[-1]),
+                            'state': state, 'values': values}
+    return records
+
+
+def update_saved_indicators(symbols):
+    """日线入库后增量更新这些符号已持久化的指标"""
+    for symbol, keys in database.list_indicators(symbols).items():
+        try:
+            update_indicators(symbol, indicators.parse(','.join(keys)))
+        except Exception as e:
+            logging.error(f"Failed to update indicators for {symbol}: {e}")
+
+
+# 日线同步调度器：只对过期的符号批量拉取，写入新日线后增量更新已保存的指标
+daily_sync = sync_scheduler.DailySyncScheduler(
+    download_daily_batch,
+    settle_minutes=config.DAILY_BAR_SETTLE_MINUTES,
+    poll_interval=config.DAILY_SYNC_POLL_INTERVAL,
+    batch_size=config.DAILY_SYNC_BATCH_SIZE,
+    on_saved=update_saved_indicators
+)
+
+
+def track_daily(symbols):
+    """把符号加入日线后台同步列表 (多进程部署时由中枢进程的调度器同步)"""
+    if hub is not None:
+        return hub.control.track_daily(symbols)
+    for symbol in symbols:
+        daily_sync.track(symbol)
+
+
+def request_daily_refresh(symbols):
+    """请求后台调度器尽快刷新日线"""
+    if hub is not None:
+        hub.control.request_daily_refresh(symbols)
+        # 日线由中枢进程写入，本进程缓存的最新日期需要重新读库
+        daily_sync.forget(symbols)
+        return
+    for symbol in symbols:
+        daily_sync.request_refresh(symbol)
+
+
+def daily_sync_running():
+    """后台日线同步是否在运行 (worker 不启动自己的调度器，由中枢进程运行)"""
+    return hub is not None or daily_sync.running
+
+
+def sync_daily_data(symbol):
+    """同步拉取单个符号的日线 (同一符号的并发同步只执行一次)"""
+    return upstream_flight.do(('daily_sync', symbol), daily_sync.refresh, [symbol])
+
+
+def sync_daily_batch(symbols):
+    """用一次批量下载刷新多个符号中已过期的日线，返回 {symbol: 保存条数}"""
+    stale = sorted({s for s in symbols if not daily_sync.is_fresh(s)})
+    track_daily(list(symbols))
+    if daily_sync_running():
+        # 已有本地数据的符号交给后台调度器刷新，与单符号接口一致
+        background = [s for s in stale if daily_sync.latest_date(s)]
+        if background:
+            request_daily_refresh(background)
+        stale = [s for s in stale if s not in background]
+    if not stale:
+        return {}
+    return upstream_flight.do(('daily_sync_batch',) + tuple(stale), daily_sync.refresh, stale)
+
+
+def _fetch_historical_columns(symbol, period, interval):
+    # 日线和最近几个交易日的分钟线使用数据库缓存
     if interval != '1d':
         try:
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period=period, interval=interval)
+            if interval in INTRADAY_INTERVAL_SECONDS and period in INTRADAY_PERIOD_SESSIONS:
+                hist = load_intraday_bars(symbol, period, interval)
+            else:
+                hist = fetch_ticker_history(symbol, period, interval)
 
             if hist.empty:
                 return None
 
-            data = []
-            if len(hist) > 0:
-                base_close = hist['Close'].iloc[0]
-                for date, row in hist.iterrows():
-                    # Intraday data index is datetime with timezone
-                    date_str = date.strftime(
-                        '%Y-%m-%d %H:%M') if interval != '1d' else date.strftime('%Y-%m-%d')
-                    data.append({
-                        'date': date_str,
-                        'open': round(row['Open'], 2),
-                        'high': round(row['High'], 2),
-                        'low': round(row['Low'], 2),
-                        'close': round(row['Close'], 2),
-                        'volume': int(row['Volume']),
-                        'change_percent': ((row['Close'] - base_close) / base_close) * 100
-                    })
-            return data
+            # Intraday data index is datetime with timezone
+            return serialize.history_columns(hist, intraday=True)
         except Exception as e:
             logging.error(f"Error fetching direct data for {symbol}: {e}")
             return None
 
     # === 日线数据逻辑 ===
     
-    # 1. 尝试更新数据 (即使失败也继续读取数据库)
+    # 1. 仅在本地日线过期时才访问网络 (即使失败也继续读取数据库)
     try:
-        # 获取本地最新日期
-        latest_date = database.get_latest_date(symbol)
-
-        # 决定拉取策略
-        if latest_date:
-            # 增量更新：从 latest_date 的下一天开始
-            # start_date 包含 latest_date，yf.download 会处理，但为了稳妥我们检查日期
-            start_date = latest_date # yfinance include start date
-            
-            # 只有当今天不是 latest_date 才拉取 (简单检查)
-            if start_date != datetime.now().strftime('%Y-%m-%d'):
-                logging.info(f"Incremental update for {symbol} from {start_date}")
-                ticker = yf.Ticker(symbol)
-                # history(start=...) 会包含 start_date，save_daily_data 使用 REPLACE INTO 所以没问题
-                new_data = ticker.history(start=start_date, interval='1d')
-                if not new_data.empty:
-                    database.save_daily_data(symbol, new_data)
-        else:
-            # 全量拉取
-            logging.info(f"Full fetch for {symbol}")
-            ticker = yf.Ticker(symbol)
-            new_data = ticker.history(period='max', interval='1d')
-            if not new_data.empty:
-                database.save_daily_data(symbol, new_data)
-
+        if not daily_sync.is_fresh(symbol):
+            if daily_sync_running() and daily_sync.latest_date(symbol):
+                # 已有本地数据：交给后台调度器批量刷新，请求直接读库
+                request_daily_refresh([symbol])
+            else:
+                sync_daily_data(symbol)
+        track_daily([symbol])
     except Exception as e:
         # 记录错误但不中断，继续尝试读取数据库
         logging.error(f"Failed to update data for {symbol} (using cached if available): {e}")
@@ -434,127 +982,258 @@ def fetch_historical_data(symbol, period='1mo', interval='1d'):
         if df.empty:
             return None
 
-        data = []
-        base_close = df['Close'].iloc[0]
+        return serialize.history_columns(df)
+
+    except Exception as e:
+        logging.error(f"Error in DB logic for {symbol}: {e}")
+        return None
+
+
+# 分钟线间隔 -> 秒数
+INTRADAY_INTERVAL_SECONDS = {
+    '1m': 60, '2m': 120, '5m': 300, '15m': 900, '30m': 1800,
+    '60m': 3600, '90m': 5400, '1h': 3600,
+}
+
+# 分钟线 period -> 交易日数
+INTRADAY_PERIOD_SESSIONS = {'1d': 1, '5d': 5}
+
+# 本地分钟线聚合器：订阅符号的当日 K 线由 WebSocket tick 实时生成
+bar_builder = bar_aggregator.BarAggregator(
+    {i: INTRADAY_INTERVAL_SECONDS[i] for i in config.INTRADAY_LOCAL_INTERVALS},
+    close_delay=config.INTRADAY_BAR_CLOSE_DELAY
+)
+
+# (symbol, interval) -> 最近一次从 Yahoo 补齐分钟线的时间 (UTC 秒)
+intraday_filled = {}
+
+# ========== 多进程部署 ==========
+# gunicorn 多 worker 模式下，WebSocket 接收、日线同步和分钟线聚合只在实时中枢进程中运行一次，
+# worker 通过本地 Unix socket 访问中枢的实时报价、订阅列表和本地 K 线；单进程运行时 hub 为 None
+hub = realtime_hub.connect_from_env()
+if hub is not None:
+    realtime_data = hub.quotes
+    bar_builder = hub.bars
+
+
+def sync_intraday_bars(symbol, interval):
+    """增量补齐本地分钟线 (同一符号/间隔的并发同步只执行一次)"""
+    return upstream_flight.do(('intraday_sync', symbol, interval), _sync_intraday_bars, symbol, interval)
+
+
+def _sync_intraday_bars(symbol, interval):
+    step = INTRADAY_INTERVAL_SECONDS[interval]
+    now = market_calendar.now_market()
+    session = market_calendar.current_session(now)
+    session_close_ts = market_calendar.session_close(session).timestamp()
+    live_from = (bar_builder.live_from(symbol, interval, session)
+                 if interval in config.INTRADAY_LOCAL_INTERVALS else None)
+
+    if live_from is not None:
+        if intraday_filled.get((symbol, interval), 0) >= live_from:
+            # live_from 之后由本地聚合，之前的缺口已从 Yahoo 补齐
+            return 0
+        # 只需补齐本地聚合开始之前的缺口
+        latest_ts = database.get_latest_intraday_ts(symbol, interval, before_ts=live_from)
+    else:
+        latest_ts = database.get_latest_intraday_ts(symbol, interval)
+        # 最近一个交易日的最后一根 K 线已在本地，且是收盘后拉取的 (不是盘中未完成的 K 线)，
+        # 收盘后/盘前无需访问网络；不按美股时段交易的符号 (加密货币、外汇等) 不做此判断
+        fetched = intraday_filled.get((symbol, interval), 0)
+        if (latest_ts is not None and latest_ts + step >= session_close_ts
+                and fetched >= session_close_ts + config.INTRADAY_BAR_CLOSE_DELAY
+                and market_calendar.follows_session(symbol)):
+            return 0
+
+    if latest_ts is None or now.timestamp() - latest_ts > config.INTRADAY_TOPUP_MAX_AGE:
+        # 首次拉取或本地数据过旧：按 period 回补
+        hist = fetch_ticker_history(symbol, config.INTRADAY_BACKFILL_PERIOD, interval)
+    else:
+        # 增量：从最新一根 (可能未完成的) K 线开始拉取
+        hist = fetch_ticker_history(symbol, interval=interval,
+                                    start=pd.Timestamp(latest_ts, unit='s', tz='UTC'))
 
-        for date, row in df.iterrows():
-            data.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'open': round(row['Open'], 2),
-                'high': round(row['High'], 2),
-                'low': round(row['Low'], 2),
-                'close': round(row['Close'], 2),
-                'volume': int(row['Volume']),
-                'change_percent': ((row['Close'] - base_close) / base_close) * 100
-            })
+    count = database.save_intraday_bars(symbol, interval, hist)
+    intraday_filled[(symbol, interval)] = now.timestamp()
+    database.prune_intraday_bars(symbol, interval,
+                                 int(now.timestamp()) - config.INTRADAY_RETENTION_DAYS * 86400)
+    return count
 
-        return data
 
+def load_intraday_bars(symbol, period, interval):
+    """补齐后从本地库读取最近 1/5 个交易日的分钟线"""
+    try:
+        sync_intraday_bars(symbol, interval)
     except Exception as e:
-        logging.error(f"Error in DB logic for {symbol}: {e}")
+        # 记录错误但不中断，继续使用本地已有数据
+        logging.error(f"Failed to update intraday data for {symbol} {interval}: {e}")
+    df = database.get_intraday_bars(symbol, interval, sessions=INTRADAY_PERIOD_SESSIONS[period])
+    if interval not in config.INTRADAY_LOCAL_INTERVALS:
+        return df
+
+    # 合并尚未写库的本地 K 线 (含正在形成的一根)，同一时间以本地为准
+    live = bar_builder.frame(symbol, interval)
+    if live.empty:
+        return df
+    if df.empty:
+        return live
+    df = pd.concat([df, live])
+    return df[~df.index.duplicated(keep='last')].sort_index()
+
+
+def is_subscribed(symbol):
+    """符号是否已在订阅列表中"""
+    if hub is not None:
+        return hub.control.is_subscribed(symbol)
+    return symbol in ws_feed
+
+
+def list_subscriptions():
+    """当前订阅的符号列表"""
+    if hub is not None:
+        return hub.control.subscriptions()
+    return ws_feed.symbols()
+
+
+def load_intraday_records(symbol, period, interval):
+    """读取分钟线并写入缓存，返回逐行记录，没有数据时返回 None"""
+    cache_key = ('intraday', symbol, period, interval)
+    hist = upstream_flight.do(cache_key, load_intraday_bars, symbol, period, interval)
+    if hist.empty:
         return None
 
+    data = serialize.columns_to_records(serialize.intraday_columns(hist))
+    # 本地聚合中的符号最新一根 K 线随 tick 变化，只做极短缓存
+    ttl = config.INTRADAY_LIVE_CACHE_TTL if bar_builder.is_live(symbol) else get_cache_ttl(interval)
+    data_cache.set(cache_key, data, ttl=ttl)
+    return data
+
+
+def _apply_subscriptions(added, evicted):
+    """把订阅登记的变化同步到 WebSocket 连接池 (调用方持有 subscription_lock)"""
+    if evicted:
+        drop_subscriptions(evicted, 'LRU 淘汰')
+    for symbol in ws_feed.add(added):
+        logging.info(f"动态订阅符号: {symbol} (连接 {ws_feed.shard_of(symbol)})")
+    return added
+
+
+def drop_subscriptions(symbols, reason):
+    """退订符号并清理其实时数据"""
+    removed = ws_feed.remove(symbols)
+    for symbol in removed:
+        realtime_data.remove(symbol)
+        metrics.ticks_received.remove(symbol)
+    # 重新订阅前的行情有缺口，本地聚合不能再视为连续
+    bar_builder.reset_coverage(removed)
+    if removed:
+        logging.info(f"退订 {len(removed)} 个符号 ({reason}): {removed}")
+
+
+def expire_subscriptions(symbols):
+    """退订空闲超时的符号 (后台清理线程调用)"""
+    with subscription_lock:
+        # 清理期间被重新访问的符号保留
+        drop_subscriptions([s for s in symbols if s not in subscription_registry], '空闲超时')
+
 
 def add_subscription(symbol):
-    """动态添加订阅符号"""
-    global ws_instance, subscribed_symbols
+    """动态添加订阅符号 (同时记录访问时间)，新订阅时返回 True"""
     symbol = symbol.upper()
+    if hub is not None:
+        return hub.control.add_subscription(symbol)
 
-    with subscribed_symbols_lock:
-        if symbol in subscribed_symbols:
-            return False  # 已订阅
-        subscribed_symbols.add(symbol)
+    with subscription_lock:
+        return bool(_apply_subscriptions(*subscription_registry.touch([symbol])))
 
-    # 尝试添加到 WebSocket 订阅
-    with ws_instance_lock:
-        if ws_instance is not None:
-            try:
-                ws_instance.subscribe([symbol])
-                logging.info(f"动态订阅符号: {symbol}")
-                return True
-            except Exception as e:
-                logging.error(f"动态订阅 {symbol} 失败: {e}")
-                return False
-    return False
 
+def retain_subscriptions(symbols):
+    """推送连接开始引用这些符号 (未订阅的自动订阅)，引用期间不会被退订"""
+    if hub is not None:
+        return hub.control.retain_subscriptions(symbols)
+    with subscription_lock:
+        return _apply_subscriptions(*subscription_registry.acquire(symbols))
+
+
+def release_subscriptions(symbols):
+    """推送连接结束，释放对符号的引用"""
+    if hub is not None:
+        return hub.control.release_subscriptions(symbols)
+    subscription_registry.release(symbols)
+
+
+def on_ws_message(message):
+    """WebSocket 消息回调 (各连接的接收线程中调用)"""
+    global latest_data
+
+    # 提取符号ID
+    symbol = message.get('id', '').upper()
+
+    if symbol:
+        # 原地更新实时报价
+        realtime_data.update(symbol, message)
+        metrics.ticks_received.labels(symbol).inc()
+        tick_ms = message.get('time')
+        if tick_ms is not None:
+            metrics.tick_lag_seconds.observe(max(0.0, time.time() - int(tick_ms) / 1000))
+
+    # 保持原有功能
+    with latest_data_lock:
+        latest_data = message
+    if symbol:
+        realtime_bus.publish(symbol, message)
 
-def websocket_data_handler():
-    """通过WebSocket获取yfinance数据（支持动态订阅）"""
-    global latest_data, connection_status, ws_instance, realtime_data
 
+def on_ws_connect(symbols):
+    """连接 (重新) 建立：断线期间的行情可能有缺口，本地聚合重新计算这些符号的连续区间"""
+    bar_builder.reset_coverage(symbols)
+
+
+# 订阅生命周期：记录访问时间和推送连接引用，空闲超时或超过上限时退订 (INITIAL_SYMBOLS 常驻)
+subscription_registry = subscriptions.SubscriptionRegistry(
+    idle_ttl=config.SUBSCRIPTION_IDLE_TTL,
+    max_symbols=config.SUBSCRIPTION_MAX_SYMBOLS,
+    pinned=[s.strip().upper() for s in config.INITIAL_SYMBOLS if s.strip()]
+)
+# 保证订阅登记与连接池的增删一致
+subscription_lock = threading.Lock()
+
+# tick 记录器：把全部 WebSocket 消息追加写入压缩日志 (config.TICK_RECORDER_ENABLED 开启)
+tick_log = tick_recorder.TickRecorder(
+    tick_recorder.TICK_LOG_DIR,
+    segment_seconds=config.TICK_SEGMENT_SECONDS,
+    segment_bytes=config.TICK_SEGMENT_BYTES,
+    flush_interval=config.TICK_FLUSH_INTERVAL,
+    retention_days=config.TICK_RETENTION_DAYS
+)
+
+# WebSocket 连接池：按单连接最大符号数把订阅分散到多条连接，各连接独立重连 (指数退避，盘中无 tick 时强制重连)
+ws_feed = ws_pool.WebSocketPool(
+    factory=lambda: yf.WebSocket(verbose=False),
+    on_message=on_ws_message,
+    on_connect=on_ws_connect,
+    max_symbols=config.WS_MAX_SYMBOLS_PER_CONNECTION,
+    max_connections=config.WS_MAX_CONNECTIONS,
+    backoff_base=config.WS_BACKOFF_BASE,
+    backoff_max=config.WS_BACKOFF_MAX,
+    rate_window=config.WS_RATE_WINDOW,
+    stale_timeout=config.WS_STALE_TIMEOUT,
+    is_active=market_calendar.is_market_open
+)
+
+
+def websocket_data_handler():
+    """通过 WebSocket 连接池获取yfinance数据（支持动态订阅）"""
     # 默认初始订阅列表 (从 config.py 获取)
     # 清洗数据：转大写，去空，去重
     initial_symbols = [s.strip().upper()
                        for s in config.INITIAL_SYMBOLS if s.strip()]
 
-    with subscribed_symbols_lock:
-        subscribed_symbols.update(initial_symbols)
-
-    while True:
-        try:
-            with status_lock:
-                connection_status = 'connecting'
-
-            # 创建WebSocket对象获取实时数据
-            ws = yf.WebSocket(verbose=False)
-
-            # 保存 WebSocket 实例引用
-            with ws_instance_lock:
-                ws_instance = ws
-
-            # 设置消息处理回调
-            def on_message(message):
-                global latest_data, realtime_data
-
-                # 提取符号ID
-                symbol = message.get('id', '').upper()
-
-                if symbol:
-                    # 存储到实时数据字典
-                    with realtime_data_lock:
-                        realtime_data[symbol] = {
-                            'symbol': symbol,
-                            'price': message.get('price'),
-                            'change': message.get('change'),
-                            'change_percent': message.get('changePercent'),
-                            'volume': message.get('dayVolume'),
-                            'bid': message.get('bid'),
-                            'ask': message.get('ask'),
-                            'high': message.get('dayHigh'),
-                            'low': message.get('dayLow'),
-                            'open': message.get('openPrice'),
-                            'previous_close': message.get('previousClose'),
-                            'market_hours': message.get('marketHours'),
-                            'timestamp': datetime.now().isoformat(),
-                            'raw': message  # 保留原始数据
-                        }
-
-                # 保持原有功能
-                with latest_data_lock:
-                    latest_data = message
-                with status_lock:
-                    global connection_status
-                    connection_status = 'connected'
-                data_queue.put(message)
-
-            # 订阅初始符号列表
-            with subscribed_symbols_lock:
-                symbols_to_subscribe = list(subscribed_symbols)
-
-            ws.subscribe(symbols_to_subscribe)
-            logging.info(
-                f"WebSocket 已订阅 {len(symbols_to_subscribe)} 个符号: {symbols_to_subscribe}")
-
-            # 运行WebSocket监听
-            ws.listen(message_handler=on_message)
-
-        except Exception as e:
-            logging.error(f"WebSocket错误: {e}")
-            with status_lock:
-                connection_status = f'error: {str(e)}'
-            with ws_instance_lock:
-                ws_instance = None
-            time.sleep(5)  # 5秒后重连
+    with subscription_lock:
+        _apply_subscriptions(*subscription_registry.touch(initial_symbols))
+    ws_feed.start()
+    subscription_registry.start(expire_subscriptions, config.SUBSCRIPTION_SWEEP_INTERVAL)
+    logging.info(f"WebSocket 已订阅 {len(initial_symbols)} 个符号: {initial_symbols}")
 
 
 # ============ 原有接口（保持兼容） ============
@@ -562,22 +1241,92 @@ def websocket_data_handler():
 @app.route('/api/data', methods=['GET'])
 def get_data():
     """HTTP路由 - 返回WebSocket获取的数据，默认返回QQQ的实时数据"""
-    with realtime_data_lock:
-        qqq_data = realtime_data.get('QQQ')
-        if qqq_data:
-            return jsonify(qqq_data['raw'])
+    qqq_raw = realtime_data.get_raw('QQQ')
+    if qqq_raw:
+        return jsonify(qqq_raw)
     return jsonify({'error': 'QQQ 数据尚未获取，请稍后重试'})
 
 
+def realtime_status():
+    """WebSocket 连接及后台任务状态 (多进程模式下由中枢进程提供)"""
+    if hub is not None:
+        return hub.control.status()
+    return {
+        'status': ws_feed.status(),
+        'websocket': ws_feed.stats(),
+        'subscriptions': subscription_registry.stats(),
+        'daily_sync': daily_sync.stats(),
+        'tick_bus': realtime_bus.stats(),
+        'bar_aggregator': bar_builder.stats(),
+        'tick_recorder': tick_log.stats(),
+        'upstream': upstream_gateway.stats()
+    }
+
+
+def collect_runtime_metrics():
+    """把缓存、WebSocket 连接池等已有统计转为指标 (输出 /metrics 时调用)"""
+    cache_stats = data_cache.stats()
+    labels = {'cache': 'data'}
+    families = [
+        metrics.family('cache_hits_total', 'counter', '缓存命中次数', [(labels, cache_stats['hits'])]),
+        metrics.family('cache_misses_total', 'counter', '缓存未命中次数', [(labels, cache_stats['misses'])]),
+        metrics.family('cache_evictions_total', 'counter', '缓存淘汰次数', [(labels, cache_stats['evictions'])]),
+        metrics.family('cache_hit_ratio', 'gauge', '缓存命中率', [(labels, cache_stats['hit_ratio'])]),
+        metrics.family('cache_entries', 'gauge', '缓存条目数', [(labels, cache_stats['entries'])]),
+        metrics.family('cache_bytes', 'gauge', '缓存占用字节数 (估算)', [(labels, cache_stats['bytes'])]),
+    ]
+
+    gateway = upstream_gateway.stats()
+    families += [
+        metrics.family('upstream_circuit_open', 'gauge', '上游熔断是否打开 (半开也计为 1)', [
+            ({}, int(gateway['circuit'] != upstream.CircuitBreaker.CLOSED))]),
+        metrics.family('upstream_rejected_total', 'counter', '被上游网关拒绝的调用数', [
+            ({'reason': reason}, count) for reason, count in gateway['rejected'].items()]),
+    ]
+    if hub is not None:
+        # 实时行情相关指标由中枢进程提供
+        return families
+
+    shards = ws_feed.stats()['shards']
+    families += [
+        metrics.family('ws_subscribed_symbols', 'gauge', '订阅中的符号数', [({}, len(ws_feed))]),
+        metrics.family('ws_shard_connected', 'gauge', 'WebSocket 连接是否正常', [
+            ({'shard': str(s['index'])}, int(s['status'] == 'connected')) for s in shards]),
+        metrics.family('ws_shard_messages_total', 'counter', '各 WebSocket 连接收到的消息数', [
+            ({'shard': str(s['index'])}, s['messages']) for s in shards]),
+        metrics.family('ws_shard_reconnects_total', 'counter', '各 WebSocket 连接的重连次数', [
+            ({'shard': str(s['index'])}, max(0, s['connects'] - 1)) for s in shards]),
+        metrics.family('tick_bus_dropped_total', 'counter', 'tick 总线因消费者缓冲满丢弃的 tick 数', [
+            ({}, realtime_bus.stats()['dropped'])]),
+    ]
+    return families
+
+
+metrics.REGISTRY.register_collector(collect_runtime_metrics)
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus 文本格式指标"""
+    if hub is None:
+        text = metrics.render((metrics.REGISTRY.collect(), None))
+    else:
+        # 各 worker 的请求指标按进程号区分，实时行情和后台任务指标来自中枢进程
+        text = metrics.render((metrics.REGISTRY.collect(), {'process': str(os.getpid())}),
+                              (hub.control.metrics(), {'process': 'hub'}))
+    return Response(text, content_type=metrics.CONTENT_TYPE)
+
+
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """获取连接状态"""
-    global connection_status
-    with status_lock:
-        return jsonify({
-            'status': connection_status,
-            'supported_benchmarks': list(config.SUPPORTED_BENCHMARKS.keys())
-        })
+    result = realtime_status()
+    result['supported_benchmarks'] = list(config.SUPPORTED_BENCHMARKS.keys())
+    if hub is not None:
+        # 本 worker 的推送连接
+        result['worker'] = {'pid': os.getpid(), 'tick_bus': realtime_bus.stats(),
+                            'upstream': upstream_gateway.stats()}
+    return jsonify(result)
 
 
 # ============ 新增接口 ============
@@ -600,37 +1349,105 @@ def get_history(symbol):
     - symbol: 股票/ETF 代码
     - period: 时间范围 (1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, ytd, max)
     - interval: 数据间隔 (1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo)
+    - format: records (默认，逐行对象) 或 columnar (按列数组，体积更小)
     """
     symbol = symbol.upper()
     period = request.args.get('period', '1mo')
     interval = request.args.get('interval', '1d')
+    columnar = request.args.get('format') == 'columnar'
 
     # 检查缓存
-    cached = get_cached_data(symbol, period)
-    if cached:
-        return jsonify({
-            'symbol': symbol,
-            'period': period,
-            'interval': interval,
-            'data': cached,
-            'cached': True
-        })
+    columns = get_cached_data(symbol, period, interval)
+    cached = columns is not None
+    stale = False
+
+    if not cached:
+        # 获取新数据
+        columns = fetch_historical_columns(symbol, period, interval)
+
+        if columns is None:
+            # Yahoo 不可用时退回过期的缓存
+            columns = get_stale_data((symbol, period, interval))
+            if columns is None:
+                return jsonify({'error': f'无法获取 {symbol} 的数据'}), 404
+            stale = True
+        else:
+            # 缓存数据
+            set_cached_data(symbol, period, interval, columns)
 
-    # 获取新数据
-    data = fetch_historical_data(symbol, period, interval)
+    return json_response({
+        'symbol': symbol,
+        'period': period,
+        'interval': interval,
+        'format': 'columnar' if columnar else 'records',
+        'data': columns if columnar else serialize.columns_to_records(columns),
+        'cached': cached,
+        'stale': stale or history_is_stale(symbol, interval)
+    })
 
-    if data is None:
-        return jsonify({'error': f'无法获取 {symbol} 的数据'}), 404
 
-    # 缓存数据
-    set_cached_data(symbol, period, data)
+def load_daily_batch(symbols, period):
+    """批量刷新过期日线后一次查询读出多个符号，写入缓存并返回 {symbol: 列式数据}"""
+    # 过期的符号合并为一次批量下载 (失败时继续读取本地已有数据)
+    try:
+        sync_daily_batch(symbols)
+    except Exception as e:
+        logging.error(f"Failed to update data for {symbols} (using cached if available): {e}")
+
+    # 一次查询读出全部符号
+    query_start = get_start_date_from_period(period)
+    df = database.get_daily_data_multi(
+        symbols, start_date=query_start.strftime('%Y-%m-%d') if query_start else None)
+    if df.empty:
+        return {}
+    found = serialize.history_columns_by_symbol(df)
+    for symbol, columns in found.items():
+        set_cached_data(symbol, period, '1d', columns)
+    return found
+
+
+@app.route('/api/history', methods=['GET'])
+def get_history_batch():
+    """
+    批量获取多个符号的日线
+    参数:
+    - symbols: 逗号分隔的代码列表 (如 QQQ,SPY,DIA)
+    - period: 时间范围 (同 /api/history/<symbol>)
+    - format: records (默认) 或 columnar
+    """
+    symbols_str = request.args.get('symbols', '')
+    period = request.args.get('period', '1mo')
+    columnar = request.args.get('format') == 'columnar'
+
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols_str.split(',') if s.strip()))
+    if not symbols:
+        return jsonify({'error': 'symbols 参数不能为空'}), 400
+    if len(symbols) > config.HISTORY_MAX_SYMBOLS:
+        return jsonify({'error': f'最多支持 {config.HISTORY_MAX_SYMBOLS} 个符号'}), 400
+
+    # 与单符号接口共用缓存
+    found = {s: get_cached_data(s, period, '1d') for s in symbols}
+    cached = {s: found[s] is not None for s in symbols}
+    misses = [s for s in symbols if found[s] is None]
+    if misses:
+        found.update(load_daily_batch(misses, period))
+
+    data = {}
+    errors = {}
+    for symbol in symbols:
+        columns = found[symbol]
+        if columns is None:
+            errors[symbol] = f'无法获取 {symbol} 的数据'
+        else:
+            data[symbol] = columns if columnar else serialize.columns_to_records(columns)
 
-    return jsonify({
-        'symbol': symbol,
+    return json_response({
         'period': period,
-        'interval': interval,
+        'interval': '1d',
+        'format': 'columnar' if columnar else 'records',
         'data': data,
-        'cached': False
+        'cached': cached,
+        'errors': errors
     })
 
 
@@ -648,36 +1465,35 @@ def get_intraday(symbol):
         period = request.args.get('period', '1d')
 
         # 验证 interval 和 period
-        valid_intervals = ['1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h']
-        valid_periods = ['1d', '5d']
+        valid_intervals = list(INTRADAY_INTERVAL_SECONDS)
+        valid_periods = list(INTRADAY_PERIOD_SESSIONS)
 
         if interval not in valid_intervals:
             return jsonify({'error': f'Invalid interval. Valid options: {", ".join(valid_intervals)}'}), 400
         if period not in valid_periods:
             return jsonify({'error': f'Invalid period for intraday. Valid options: {", ".join(valid_periods)}'}), 400
 
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(period=period, interval=interval)
-
-        if hist.empty:
-            return jsonify({'error': f'No intraday data found for {symbol}'}), 404
-
-        data = []
-        for index, row in hist.iterrows():
-            data.append({
-                'timestamp': index.isoformat(),
-                'open': row['Open'],
-                'high': row['High'],
-                'low': row['Low'],
-                'close': row['Close'],
-                'volume': row['Volume']
-            })
-
-        return jsonify({
+        # 检查缓存
+        cache_key = ('intraday', symbol, period, interval)
+        data = data_cache.get(cache_key)
+        cached = data is not None
+        stale = False
+
+        if not cached:
+            data = load_intraday_records(symbol, period, interval)
+            if data is None:
+                data = get_stale_data(cache_key)
+                if data is None:
+                    return jsonify({'error': f'No intraday data found for {symbol}'}), 404
+                stale = True
+
+        return json_response({
             'symbol': symbol,
             'period': period,
             'interval': interval,
-            'data': data
+            'data': data,
+            'cached': cached,
+            'stale': stale
         })
 
     except Exception as e:
@@ -685,6 +1501,25 @@ def get_intraday(symbol):
         return jsonify({'error': str(e)}), 500
 
 
+def load_daily_columns(symbol, period):
+    """读取日线列式数据并写入缓存 (在线程池中执行，超时后完成的结果也能留给下次请求)"""
+    columns = fetch_historical_columns(symbol, period)
+    if columns:
+        set_cached_data(symbol, period, '1d', columns)
+    return columns
+
+
+def parse_timeout(value, maximum):
+    """解析等待秒数：必须是有限的正数，超过 maximum 时取 maximum；无效时返回 None"""
+    try:
+        timeout = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(timeout) or timeout <= 0:
+        return None
+    return min(timeout, maximum)
+
+
 @app.route('/api/compare', methods=['GET'])
 def compare_benchmarks():
     """
@@ -692,54 +1527,236 @@ def compare_benchmarks():
     参数:
     - symbols: 逗号分隔的代码列表 (如 QQQ,SPY,DIA)
     - period: 时间范围
+    - timeout: 最长等待秒数 (不超过 config.COMPARE_TIMEOUT)，超时的符号在 errors 中返回
     """
     symbols_str = request.args.get('symbols', 'QQQ,SPY')
     period = request.args.get('period', '1mo')
-
-    symbols = [s.strip().upper() for s in symbols_str.split(',')]
+    timeout = parse_timeout(request.args.get('timeout', config.COMPARE_TIMEOUT), config.COMPARE_TIMEOUT)
+    if timeout is None:
+        return jsonify({'error': 'Invalid timeout'}), 400
+    deadline = time.monotonic() + timeout
+
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols_str.split(',') if s.strip()))
+
+    # 尝试使用内存缓存
+    found = {s: get_cached_data(s, period, '1d') for s in symbols}
+    misses = [s for s in symbols if not found[s]]
+    errors = {}
+
+    if misses:
+        # 过期的符号先用一次批量下载刷新，随后各符号只需读库
+        stale = [s for s in misses if not daily_sync.is_fresh(s)]
+        if stale:
+            refresh = compare_executor.submit(sync_daily_batch, stale)
+            done, _ = wait([refresh], timeout=max(0.0, deadline - time.monotonic()))
+            if refresh not in done:
+                # 批量刷新仍在进行，不再逐个重复拉取
+                for symbol in stale:
+                    errors[symbol] = 'timeout'
+            elif refresh.exception() is not None:
+                # 批量刷新失败时退回逐个符号同步
+                logging.error(f"Batch daily refresh failed for {stale}: {refresh.exception()}")
+
+        futures = {compare_executor.submit(load_daily_columns, s, period): s
+                   for s in misses if s not in errors}
+        done, _ = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        for future, symbol in futures.items():
+            if future not in done:
+                errors[symbol] = 'timeout'
+            elif future.exception() is not None:
+                errors[symbol] = str(future.exception())
+            else:
+                found[symbol] = future.result()
 
     result = {}
     for symbol in symbols:
-        # 尝试使用内存缓存
-        data = get_cached_data(symbol, period)
-        
-        if not data:
-            data = fetch_historical_data(symbol, period)
-            # 如果获取成功，写入缓存
-            if data:
-                set_cached_data(symbol, period, data)
-                
-        if data:
+        columns = found[symbol]
+        if columns:
             result[symbol] = {
-                'data': data,
-                'start_price': data[0]['close'] if data else 0,
-                'end_price': data[-1]['close'] if data else 0,
-                'total_change': data[-1]['change_percent'] if data else 0
+                'data': serialize.columns_to_records(columns),
+                'start_price': columns['close'][0],
+                'end_price': columns['close'][-1],
+                'total_change': columns['change_percent'][-1]
             }
+        elif symbol not in errors:
+            errors[symbol] = f'无法获取 {symbol} 的数据'
 
-    return jsonify({
+    return json_response({
+        'period': period,
+        'benchmarks': result,
+        'errors': errors
+    })
+
+
+def load_close_series(symbols):
+    """
+    各符号完整的日线收盘价 {symbol: Series}，按日线版本号缓存，返回 (series, versions)
+    只有写入过新日线 (版本号变化) 的符号需要重新读库
+    """
+    versions = database.get_daily_versions(symbols)
+    series = {}
+    misses = []
+    for symbol in symbols:
+        closes = data_cache.get(('daily_close', symbol, versions[symbol]))
+        if closes is None:
+            misses.append(symbol)
+        else:
+            series[symbol] = closes
+    if misses:
+        loaded = analytics.close_matrix(database.get_daily_data_multi(misses))
+        for symbol, closes in loaded.items():
+            data_cache.set(('daily_close', symbol, versions[symbol]), closes, ttl=config.ANALYTICS_CACHE_TTL)
+        series.update(loaded)
+    return series, versions
+
+
+def compute_analytics(symbols, period, window, series=False):
+    """刷新过期日线后计算收益/风险指标和相关系数矩阵，返回 (result, cached)"""
+    try:
+        sync_daily_batch(symbols)
+    except Exception as e:
+        logging.error(f"Failed to update data for {symbols} (using cached if available): {e}")
+
+    closes_by_symbol, versions = load_close_series(symbols)
+    query_start = get_start_date_from_period(period)
+    start = query_start.strftime('%Y-%m-%d') if query_start else None
+    # 版本号在 key 中：任一符号写入新日线后自动重新计算
+    key = ('analytics', tuple(symbols), start, window, series, tuple(versions[s] for s in symbols))
+    result = data_cache.get(key)
+    if result is not None:
+        return result, True
+
+    closes = pd.DataFrame({s: closes_by_symbol[s] for s in symbols if s in closes_by_symbol})
+    if start is not None:
+        closes = closes[closes.index >= start]
+    names, matrix = analytics.correlation(closes, config.ANALYTICS_MIN_PERIODS) if len(closes) else ([], [])
+    result = {
+        'as_of': closes.index[-1].strftime('%Y-%m-%d') if len(closes) else None,
+        'metrics': analytics.summarize(closes, window, series) if len(closes) else {},
+        'correlation': {'symbols': names, 'matrix': matrix},
+    }
+    data_cache.set(key, result, ttl=config.ANALYTICS_CACHE_TTL)
+    return result, False
+
+
+@app.route('/api/analytics', methods=['GET'])
+def get_analytics():
+    """
+    多符号收益/风险分析 (基于本地日线)
+    参数:
+    - symbols: 逗号分隔的代码列表
+    - period: 时间范围 (同 /api/history/<symbol>，默认 1y)
+    - window: 滚动波动率窗口 (交易日，默认 config.ANALYTICS_DEFAULT_WINDOW)
+    - series: true 时附带逐日累计收益、滚动波动率和回撤序列
+    """
+    symbols_str = request.args.get('symbols', '')
+    period = request.args.get('period', '1y')
+    series = request.args.get('series') == 'true'
+    try:
+        window = int(request.args.get('window', config.ANALYTICS_DEFAULT_WINDOW))
+    except ValueError:
+        return jsonify({'error': 'Invalid window'}), 400
+    if window < 2:
+        return jsonify({'error': 'window 至少为 2'}), 400
+
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols_str.split(',') if s.strip()))
+    if not symbols:
+        return jsonify({'error': 'symbols 参数不能为空'}), 400
+    if len(symbols) > config.ANALYTICS_MAX_SYMBOLS:
+        return jsonify({'error': f'最多支持 {config.ANALYTICS_MAX_SYMBOLS} 个符号'}), 400
+
+    result, cached = compute_analytics(symbols, period, window, series)
+    return json_response(dict(
+        result,
+        period=period,
+        window=window,
+        errors={s: f'无法获取 {s} 的数据' for s in symbols if s not in result['metrics']},
+        cached=cached
+    ))
+
+
+def compute_indicators(symbol, specs, period):
+    """刷新过期日线并更新指标，返回 ({'as_of', 'indicators': {指标: 列式结构}}, cached)，无本地数据时为 None"""
+    try:
+        sync_daily_batch([symbol])
+    except Exception as e:
+        logging.error(f"Failed to update data for {symbol} (using cached if available): {e}")
+
+    query_start = get_start_date_from_period(period)
+    start = query_start.strftime('%Y-%m-%d') if query_start else None
+    # 版本号在 key 中：写入新日线后自动重新读取
+    version = database.get_daily_versions([symbol])[symbol]
+    key = ('indicators', symbol, tuple(ind.key for ind in specs), start, version)
+    result = data_cache.get(key)
+    if result is not None:
+        return result, True
+
+    records = update_indicators(symbol, specs)
+    if not records:
+        return None, False
+    result = {'as_of': max(r['last_date'] for r in records.values()), 'indicators': {}}
+    for ind in specs:
+        columns = database.get_indicator_values(symbol, ind.key, ind.outputs, start)
+        for name in ind.outputs:
+            columns[name] = indicators.rounded(columns[name])
+        result['indicators'][ind.key] = columns
+    data_cache.set(key, result, ttl=config.INDICATOR_CACHE_TTL)
+    return result, False
+
+
+def parse_indicators(spec):
+    """解析 ind 参数，返回 (指标列表, 错误信息)"""
+    try:
+        specs = indicators.parse(spec)
+    except ValueError as e:
+        return None, str(e)
+    if len(specs) > config.INDICATOR_MAX_COUNT:
+        return None, f'最多支持 {config.INDICATOR_MAX_COUNT} 个指标'
+    return specs, None
+
+
+@app.route('/api/indicators/<symbol>', methods=['GET'])
+def get_indicators(symbol):
+    """
+    技术指标 (基于本地完整日线，结果和递推状态持久化在数据库中)
+    参数:
+    - ind: 逗号分隔的指标，如 sma:50,ema:20,rsi:14,macd:12:26:9,bb:20:2 (省略参数时使用默认值)
+    - period: 返回的时间范围 (同 /api/history/<symbol>，默认 1y)
+    - format: records (默认) 或 columnar
+    """
+    symbol = symbol.upper()
+    period = request.args.get('period', '1y')
+    columnar = request.args.get('format') == 'columnar'
+    specs, error = parse_indicators(request.args.get('ind', ''))
+    if error:
+        return jsonify({'error': error}), 400
+
+    result, cached = compute_indicators(symbol, specs, period)
+    if result is None:
+        return jsonify({'error': f'无法获取 {symbol} 的数据'}), 404
+    data = result['indicators']
+    return json_response({
+        'symbol': symbol,
         'period': period,
-        'benchmarks': result
+        'as_of': result['as_of'],
+        'format': 'columnar' if columnar else 'records',
+        'indicators': data if columnar else {k: serialize.columns_to_records(v) for k, v in data.items()},
+        'cached': cached
     })
 
 
 @app.route('/api/quote/<symbol>', methods=['GET'])
 def get_quote(symbol):
-    """获取当前报价"""
+    """
+    获取当前报价 (source 为数据来源: realtime/fast_info/info/database，cached 表示来自短期缓存，
+    stale 表示 Yahoo 不可用时返回的过期数据)
+    """
     symbol = symbol.upper()
     try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-
-        return jsonify({
-            'symbol': symbol,
-            'name': info.get('shortName', symbol),
-            'price': info.get('regularMarketPrice', 0),
-            'change': info.get('regularMarketChange', 0),
-            'change_percent': info.get('regularMarketChangePercent', 0),
-            'volume': info.get('regularMarketVolume', 0),
-            'previous_close': info.get('regularMarketPreviousClose', 0),
-        })
+        quote, source, cached = resolve_quote(symbol)
+        return jsonify(dict(quote, source=source, cached=cached))
+    except upstream.UpstreamUnavailable as e:
+        return upstream_error(e)
     except Exception as e:
         logging.error(f"获取 {symbol} 报价失败: {e}")
         return jsonify({'error': str(e)}), 500
@@ -756,12 +1773,8 @@ def get_realtime(symbol):
     """
     symbol = symbol.upper()
 
-    # 检查是否需要添加订阅
-    with subscribed_symbols_lock:
-        is_subscribed = symbol in subscribed_symbols
-
-    if not is_subscribed:
-        add_subscription(symbol)
+    # 每次查询都记录访问时间 (轮询中的符号不会被空闲清理退订)，未订阅时自动添加订阅
+    if add_subscription(symbol):
         # 刚订阅，可能还没有数据
         return jsonify({
             'symbol': symbol,
@@ -771,8 +1784,7 @@ def get_realtime(symbol):
         })
 
     # 获取已有的实时数据
-    with realtime_data_lock:
-        data = realtime_data.get(symbol)
+    data = realtime_data.get(symbol, include_raw=True)
 
     if data:
         return jsonify({
@@ -801,10 +1813,8 @@ def get_realtime_batch():
 
     if not symbols_str:
         # 返回所有已订阅符号的数据
-        with realtime_data_lock:
-            all_data = dict(realtime_data)
-        with subscribed_symbols_lock:
-            all_subscribed = list(subscribed_symbols)
+        all_data = realtime_data.snapshot(include_raw=True)
+        all_subscribed = list_subscriptions()
 
         return jsonify({
             'status': 'ok',
@@ -822,12 +1832,8 @@ def get_realtime_batch():
     newly_subscribed = []
 
     for symbol in requested_symbols:
-        # 检查是否需要添加订阅
-        with subscribed_symbols_lock:
-            is_subscribed = symbol in subscribed_symbols
-
-        if not is_subscribed:
-            add_subscription(symbol)
+        # 每次查询都记录访问时间，未订阅时自动添加订阅
+        if add_subscription(symbol):
             newly_subscribed.append(symbol)
             result[symbol] = {
                 'status': 'subscribed',
@@ -836,8 +1842,7 @@ def get_realtime_batch():
             }
         else:
             # 获取实时数据
-            with realtime_data_lock:
-                data = realtime_data.get(symbol)
+            data = realtime_data.get(symbol, include_raw=True)
 
             if data:
                 result[symbol] = {
@@ -859,13 +1864,239 @@ def get_realtime_batch():
     })
 
 
+def sse_event(event, data, event_id=None):
+    """格式化一条 SSE 事件"""
+    lines = f'event: {event}\n'
+    if event_id is not None:
+        lines += f'id: {event_id}\n'
+    return lines + 'data: ' + serialize.dumps(data).decode('utf-8') + '\n\n'
+
+
+class LiveIndicators:
+    """
+    推送连接中的实时指标：以已保存的日线状态为基础，用最新价格预估当前交易日收盘时的指标值
+    每隔 config.INDICATOR_STREAM_RELOAD 秒重新加载状态，新日线入库后改为推送已保存的值
+    """
+
+    def __init__(self, specs, symbols):
+        self.specs = specs
+        self.symbols = symbols
+        self.records = {}
+        self.session = None
+        self.loaded_at = None
+        self._sync = None
+
+    def due(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= config.INDICATOR_STREAM_RELOAD
+
+    def reload(self):
+        """
+        从本地日线更新指标状态 (只读 SQLite，不等待网络)
+        过期日线交给 refresh_executor 在后台刷新，刷新完成后下一条报价时重新加载
+        """
+        self.loaded_at = time.monotonic()
+        if self._sync is None or self._sync.done():
+            self._sync = refresh_executor.submit(self._sync_daily)
+        for symbol in self.symbols:
+            try:
+                self.records[symbol] = update_indicators(symbol, self.specs)
+            except Exception as e:
+                logging.error(f"Failed to load indicators for {symbol}: {e}")
+        self.session = market_calendar.current_session().isoformat()
+
+    def _sync_daily(self):
+        try:
+            if any(sync_daily_batch(self.symbols).values()):
+                # 写入了新日线，下一条报价时重新加载指标状态
+                self.loaded_at = None
+        except Exception as e:
+            logging.error(f"Failed to update data for {self.symbols} (using cached if available): {e}")
+
+    def event(self, symbol, price):
+        """indicators 事件内容，没有本地日线时为 None"""
+        records = self.records.get(symbol)
+        if not records:
+            return None
+        values = {}
+        estimated = False
+        for ind in self.specs:
+            record = records.get(ind.key)
+            if record is None:
+                continue
+            if price is not None and record['last_date'] < self.session:
+                # 当前交易日的日线尚未入库：假设以当前价收盘
+                result = ind.preview(record['state'], price)
+                estimated = True
+            else:
+                result = record['values']
+            values[ind.key] = dict(zip(result, indicators.rounded(result.values())))
+        return {'symbol': symbol, 'date': self.session, 'price': price,
+                'estimated': estimated, 'indicators': values}
+
+
+@app.route('/api/stream', methods=['GET'])
+def stream_realtime():
+    """
+    SSE 实时行情推送
+    参数:
+    - symbols: 逗号分隔的代码列表 (如 AAPL,MSFT)，未订阅的符号自动订阅
+    - max_rate: 每个符号每秒最多推送次数 (默认 config.STREAM_MAX_RATE)
+    - ind: 可选，技术指标 (同 /api/indicators)，每条报价后推送一条 indicators 事件
+    """
+    requested_symbols = [s.strip().upper()
+                         for s in request.args.get('symbols', '').split(',') if s.strip()]
+    if not requested_symbols:
+        return jsonify({'error': '请通过 symbols 参数指定要推送的符号'}), 400
+    if len(requested_symbols) > config.STREAM_MAX_SYMBOLS:
+        return jsonify({'error': f'单个连接最多 {config.STREAM_MAX_SYMBOLS} 个符号'}), 400
+
+    specs = None
+    if request.args.get('ind'):
+        specs, error = parse_indicators(request.args['ind'])
+        if error:
+            return jsonify({'error': error}), 400
+
+    try:
+        max_rate = float(request.args.get('max_rate', config.STREAM_MAX_RATE))
+    except ValueError:
+        return jsonify({'error': 'max_rate 必须是数字'}), 400
+    min_interval = 1.0 / min(max(max_rate, 0.1), config.STREAM_MAX_RATE)
+
+    symbols = list(dict.fromkeys(requested_symbols))
+
+    # 每个符号只保留最新一条，慢客户端不会积压；连接数上限在总线注册时原子检查
+    try:
+        if hub is not None:
+            # 多进程模式下 tick 不经过本 worker，定期向中枢查询有更新的符号
+            sub = realtime_hub.PollingSubscription(realtime_bus, 'sse', realtime_data, symbols,
+                                                   config.STREAM_POLL_INTERVAL, limit=config.STREAM_MAX_CLIENTS)
+        else:
+            sub = realtime_bus.subscribe('sse', maxlen=len(symbols), policy=tick_bus.CONFLATE, symbols=symbols,
+                                         limit=config.STREAM_MAX_CLIENTS)
+    except tick_bus.BusFull:
+        return jsonify({'error': '推送连接数已达上限，请稍后重试'}), 429
+
+    # 连接期间引用这些符号，避免被空闲清理退订
+    retain_subscriptions(symbols)
+    live = LiveIndicators(specs, symbols) if specs else None
+    closed = []
+
+    def close():
+        """断开时释放订阅 (生成器结束和响应关闭都会调用，只执行一次)"""
+        if not closed:
+            closed.append(True)
+            sub.close()
+            release_subscriptions(symbols)
+
+    def quote_events(symbol, data):
+        yield sse_event('quote', data, data['seq'])
+        if live is not None:
+            if live.due():
+                live.reload()
+            event = live.event(symbol, data.get('price'))
+            if event:
+                yield sse_event('indicators', event)
+
+    def generate():
+        try:
+            yield f'retry: {config.STREAM_RETRY_MS}\n\n'
+            last_sent = {}
+            pending = set()
+            last_write = time.monotonic()
+
+            # 先推送已有的快照
+            for symbol in symbols:
+                data = realtime_data.get(symbol)
+                if data:
+                    last_sent[symbol] = last_write
+                    yield from quote_events(symbol, data)
+
+            timeout = config.STREAM_HEARTBEAT
+
+            while True:
+                for symbol, _ in sub.drain(timeout=timeout):
+                    pending.add(symbol)
+
+                now = time.monotonic()
+                timeout = config.STREAM_HEARTBEAT - (now - last_write)
+                for symbol in list(pending):
+                    delay = last_sent.get(symbol, 0) + min_interval - now
+                    if delay > 0:
+                        # 超过限速，合并到下一次发送
+                        timeout = min(timeout, delay)
+                        continue
+                    pending.discard(symbol)
+                    data = realtime_data.get(symbol)
+                    if data:
+                        last_sent[symbol] = now
+                        last_write = now
+                        yield from quote_events(symbol, data)
+
+                if now - last_write >= config.STREAM_HEARTBEAT:
+                    last_write = now
+                    yield ': heartbeat\n\n'
+                timeout = max(0.01, min(timeout, config.STREAM_HEARTBEAT))
+        finally:
+            close()
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # 客户端在生成器开始之前断开时 finally 不会执行
+    response.call_on_close(close)
+    return response
+
+
+def parse_time_ms(value, default_ms):
+    """查询参数中的时间转为毫秒：Unix 秒，或纽约时间 YYYY-MM-DD HH:MM[:SS]"""
+    if not value:
+        return default_ms
+    try:
+        return int(float(value) * 1000)
+    except ValueError:
+        pass
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=market_calendar.MARKET_TZ)
+    return int(dt.timestamp() * 1000)
+
+
+@app.route('/api/ticks/<symbol>', methods=['GET'])
+def get_ticks(symbol):
+    """
+    回放记录的 tick
+    参数:
+    - from / to: Unix 秒或纽约时间 (默认最近 1 小时)
+    - limit: 最多返回条数 (默认 config.TICK_QUERY_LIMIT)
+    """
+    symbol = symbol.upper()
+    try:
+        end_ms = parse_time_ms(request.args.get('to'), int(time.time() * 1000))
+        start_ms = parse_time_ms(request.args.get('from'), end_ms - 3600 * 1000)
+        limit = max(1, min(int(request.args.get('limit', config.TICK_QUERY_LIMIT)), config.TICK_QUERY_LIMIT))
+    except (ValueError, OverflowError) as e:
+        return jsonify({'error': f'参数格式错误: {e}'}), 400
+    if start_ms > end_ms:
+        return jsonify({'error': 'from 不能晚于 to'}), 400
+
+    ticks, truncated = tick_recorder.read_ticks(tick_recorder.TICK_LOG_DIR, symbol, start_ms, end_ms, limit)
+    return json_response({
+        'symbol': symbol,
+        'from': start_ms / 1000,
+        'to': end_ms / 1000,
+        'recording': config.TICK_RECORDER_ENABLED,
+        'count': len(ticks),
+        'truncated': truncated,
+        'ticks': ticks
+    })
+
+
 @app.route('/api/subscriptions', methods=['GET'])
 def get_subscriptions():
     """获取当前所有订阅的符号列表"""
-    with subscribed_symbols_lock:
-        symbols = list(subscribed_symbols)
-    with realtime_data_lock:
-        data_symbols = list(realtime_data.keys())
+    symbols = list_subscriptions()
+    data_symbols = realtime_data.symbols()
 
     return jsonify({
         'subscribed_symbols': symbols,
@@ -875,6 +2106,14 @@ def get_subscriptions():
     })
 
 
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """获取历史数据缓存统计"""
+    stats = data_cache.stats()
+    stats['singleflight'] = upstream_flight.stats()
+    return jsonify(stats)
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """健康检查"""
@@ -914,8 +2153,7 @@ def test_api():
 
     # 测试2: 获取SPY报价
     try:
-        ticker = yf.Ticker('SPY')
-        price = ticker.info.get('regularMarketPrice', 0)
+        price = resolve_quote('SPY')[0]['price'] or 0
         results['tests'].append({
             'name': 'SPY当前报价',
             'status': 'success' if price > 0 else 'failed',
@@ -930,8 +2168,7 @@ def test_api():
         })
 
     # 测试3: 实时数据配置检查
-    with subscribed_symbols_lock:
-        subs_count = len(subscribed_symbols)
+    subs_count = len(list_subscriptions())
 
     results['tests'].append({
         'name': '实时订阅配置',
@@ -943,10 +2180,28 @@ def test_api():
     return jsonify(results)
 
 
+def start_background_tasks():
+    """启动 WebSocket 接收、日线同步和分钟线聚合 (每个部署只运行一份)"""
+    # 启动 WebSocket 连接池获取数据（原有功能）
+    websocket_data_handler()
+
+    # 启动日线后台同步
+    daily_sync.start()
+
+    # 启动本地分钟线聚合
+    bar_builder.start(
+        realtime_bus.subscribe('bar_aggregator', maxlen=config.INTRADAY_TICK_BUFFER),
+        database.save_intraday_bars
+    )
+
+    # 可选：记录全部 tick
+    if config.TICK_RECORDER_ENABLED:
+        tick_log.start(realtime_bus.subscribe('tick_recorder', maxlen=config.TICK_RECORDER_BUFFER))
+
+
 if __name__ == '__main__':
-    # 启动WebSocket线程获取数据（原有功能）
-    ws_thread = threading.Thread(target=websocket_data_handler, daemon=True)
-    ws_thread.start()
+    # 开发模式：单进程运行 Flask 自带服务器，生产环境使用 gunicorn -c gunicorn.conf.py main:app
+    start_background_tasks()
 
     logging.info("=" * 50)
     logging.info("Yahoo Finance API 服务启动")
@@ -957,14 +2212,19 @@ if __name__ == '__main__':
     logging.info("新增接口:")
     logging.info("  GET /api/benchmarks        - 获取支持的基准列表")
     logging.info("  GET /api/history/<symbol>  - 获取历史数据")
+    logging.info("  GET /api/history?symbols=  - 批量获取日线")
     logging.info("  GET /api/compare           - 对比多个基准")
+    logging.info("  GET /api/analytics         - 收益/风险分析")
+    logging.info("  GET /api/indicators/<symbol> - 技术指标")
     logging.info("  GET /api/quote/<symbol>    - 获取当前报价")
     logging.info("  GET /api/test              - 测试API功能")
     logging.info("  GET /api/health            - 健康检查")
+    logging.info("  GET /api/cache/stats       - 缓存统计")
     logging.info("实时数据接口:")
     logging.info("  GET /api/realtime/<symbol> - 获取单个符号实时数据")
     logging.info("  GET /api/realtime?symbols= - 批量获取实时数据")
     logging.info("  GET /api/subscriptions     - 查看当前订阅列表")
+    logging.info("  GET /api/stream?symbols=   - SSE 实时行情推送")
     logging.info("=" * 50)
     logging.info("访问 http://localhost:5000/api/test 测试API")
     logging.info("=" * 50)
@@ -0,0 +1,170 @@
+"""
+美股交易日历
+计算交易日、收盘时间、最近一个已完成的交易时段，以及下一根日线何时可能出现
+"""
+
+import re
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+MARKET_TZ = ZoneInfo('America/New_York')
+
+SESSION_OPEN = time(9, 30)
+SESSION_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+
+# 按本日历交易的符号：普通美股代码，可带 1~2 位股份类别后缀 (如 BRK-B)
+_EXCHANGE_SYMBOL = re.compile(r'^[A-Z0-9]+(-[A-Z]{1,2})?$')
+
+
+def _nth_weekday(year, month, weekday, n):
+    """某月第 n 个星期几 (weekday: 0=周一)"""
+    first = date(year, month, 1)
+    offset = (weekday - first.weekday()) % 7
+    return first + timedelta(days=offset + 7 * (n - 1))
+
+
+def _last_weekday(year, month, weekday):
+    """某月最后一个星期几"""
+    if month == 12:
+        last = date(year, 12, 31)
+    else:
+        last = date(year, month + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    """公历复活节 (Anonymous Gregorian algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(d):
+    """周六的假日提前到周五，周日的假日顺延到周一"""
+    if d.weekday() == 5:
+        return d - timedelta(days=1)
+    if d.weekday() == 6:
+        return d + timedelta(days=1)
+    return d
+
+
+@lru_cache(maxsize=32)
+def holidays(year):
+    """NYSE 全天休市日"""
+    days = {
+        _nth_weekday(year, 1, 0, 3),                # 马丁路德金日
+        _nth_weekday(year, 2, 0, 3),                # 总统日
+        _easter(year) - timedelta(days=2),          # 耶稣受难日
+        _last_weekday(year, 5, 0),                  # 阵亡将士纪念日
+        _observed(date(year, 7, 4)),                # 独立日
+        _nth_weekday(year, 9, 0, 1),                # 劳动节
+        _nth_weekday(year, 11, 3, 4),               # 感恩节
+        _observed(date(year, 12, 25)),              # 圣诞节
+    }
+    # 元旦落在周六时不在前一年 12/31 补休
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        days.add(_observed(new_year))
+    if year >= 2022:
+        days.add(_observed(date(year, 6, 19)))      # 六月节
+    return frozenset(days)
+
+
+@lru_cache(maxsize=32)
+def early_closes(year):
+    """13:00 提前收盘日"""
+    days = {_nth_weekday(year, 11, 3, 4) + timedelta(days=1)}  # 感恩节次日
+    for d in (date(year, 7, 3), date(year, 12, 24)):
+        if d.weekday() < 5:
+            days.add(d)
+    return frozenset(days - holidays(year))
+
+
+def is_trading_day(d):
+    """是否为交易日"""
+    return d.weekday() < 5 and d not in holidays(d.year)
+
+
+def previous_trading_day(d):
+    """d 之前最近的交易日 (不含 d)"""
+    d -= timedelta(days=1)
+    while not is_trading_day(d):
+        d -= timedelta(days=1)
+    return d
+
+
+def next_trading_day(d):
+    """d 之后最近的交易日 (不含 d)"""
+    d += timedelta(days=1)
+    while not is_trading_day(d):
+        d += timedelta(days=1)
+    return d
+
+
+def now_market():
+    """当前美东时间"""
+    return datetime.now(MARKET_TZ)
+
+
+def session_open(d):
+    """交易日开盘时间 (美东时区)"""
+    return datetime.combine(d, SESSION_OPEN, tzinfo=MARKET_TZ)
+
+
+def session_close(d):
+    """交易日收盘时间 (美东时区)"""
+    close = EARLY_CLOSE if d in early_closes(d.year) else SESSION_CLOSE
+    return datetime.combine(d, close, tzinfo=MARKET_TZ)
+
+
+def is_market_open(now=None):
+    """当前是否处于常规交易时段"""
+    now = (now or now_market()).astimezone(MARKET_TZ)
+    d = now.date()
+    return is_trading_day(d) and session_open(d) <= now < session_close(d)
+
+
+def current_session(now=None):
+    """最近一个已开盘的交易日 (盘中为当天，盘前为上一交易日)"""
+    now = (now or now_market()).astimezone(MARKET_TZ)
+    d = now.date()
+    if is_trading_day(d) and now >= session_open(d):
+        return d
+    return previous_trading_day(d)
+
+
+def last_completed_session(now=None, settle=timedelta(0)):
+    """最近一个已收盘 (并经过 settle 延迟) 的交易日"""
+    now = (now or now_market()).astimezone(MARKET_TZ)
+    d = now.date()
+    if is_trading_day(d) and now >= session_close(d) + settle:
+        return d
+    return previous_trading_day(d)
+
+
+def next_bar_available(now=None, settle=timedelta(0)):
+    """下一根日线预计可以拉取到的时间：下一个收盘时间 + settle 延迟"""
+    now = (now or now_market()).astimezone(MARKET_TZ)
+    d = now.date()
+    if not (is_trading_day(d) and now < session_close(d) + settle):
+        d = next_trading_day(d)
+    return session_close(d) + settle
+
+
+def follows_session(symbol):
+    """
+    符号是否按美股常规时段交易
+    加密货币 (BTC-USD)、外汇 (EURUSD=X)、期货 (ES=F)、指数 (^GSPC) 和外国交易所 (7203.T) 的符号
+    交易时间与本日历不同，统一视为否 (美国指数也包含在内，只会多一次网络请求)
+    """
+    return bool(_EXCHANGE_SYMBOL.match(symbol.upper()))
@@ -0,0 +1,231 @@
+"""
+Prometheus 文本格式指标
+不依赖 prometheus_client：计数器和直方图在进程内累加，/metrics 请求时按文本格式输出
+缓存、连接池等已有统计通过 collector 在输出时读取，不在热路径上重复计数
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# 请求/查询耗时的默认分桶 (秒)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _CounterChild:
+    __slots__ = ('_lock', 'value')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ('_lock', '_upper', 'counts', 'sum', 'count')
+
+    def __init__(self, upper):
+        self._lock = threading.Lock()
+        self._upper = upper
+        self.counts = [0] * (len(upper) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = bisect.bisect_left(self._upper, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *values):
+        """按标签值取子指标 (首次访问时创建)"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}')
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def remove(self, *values):
+        """删除一组标签 (如已退订的符号)"""
+        with self._lock:
+            self._children.pop(values, None)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def collect(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def collect(self):
+        name = self.name + '_total'
+        samples = [(name, dict(zip(self.labelnames, values)), child.value)
+                   for values, child in list(self._children.items())]
+        return name, self.type, self.documentation, samples
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def collect(self):
+        samples = []
+        for values, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, values))
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for upper, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                samples.append((self.name + '_bucket', dict(labels, le=_format_value(upper)), cumulative))
+            samples.append((self.name + '_sum', labels, total))
+            samples.append((self.name + '_count', labels, count))
+        return self.name, self.type, self.documentation, samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def register_collector(self, collector):
+        """collector() 返回 [(name, type, help, [(sample_name, labels, value)])]，输出时调用"""
+        self._collectors.append(collector)
+
+    def collect(self):
+        families = [metric.collect() for metric in self._metrics]
+        for collector in self._collectors:
+            families.extend(collector())
+        return families
+
+
+REGISTRY = Registry()
+
+
+@contextmanager
+def timed(histogram, *labels, errors=None):
+    """记录代码块耗时，出错时 errors 计数器 (同样的标签) 加一"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if errors is not None:
+            errors.labels(*labels).inc()
+        raise
+    finally:
+        histogram.labels(*labels).observe(time.perf_counter() - start)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if value == float('-inf'):
+        return '-Inf'
+    if value != value:
+        return 'NaN'
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def family(name, kind, documentation, samples):
+    """由 [(labels, value)] 构造 collector 返回的一组指标 (counter 的 name 需带 _total)"""
+    return name, kind, documentation, [(name, labels, value) for labels, value in samples]
+
+
+def render(*sources):
+    """
+    把若干组 collect() 结果输出为 Prometheus 文本格式
+    sources: [(families, labels)]，同名指标合并输出 (多进程时用 labels 区分来源)
+    """
+    merged = {}
+    for families, labels in sources:
+        for name, kind, documentation, samples in families:
+            family = merged.setdefault(name, (kind, documentation, []))
+            if labels:
+                samples = [(sample, dict(labels, **sample_labels), value)
+                           for sample, sample_labels, value in samples]
+            family[2].extend(samples)
+
+    lines = []
+    for name, (kind, documentation, samples) in merged.items():
+        lines.append(f'# HELP {name} {documentation}')
+        lines.append(f'# TYPE {name} {kind}')
+        for sample, labels, value in samples:
+            if labels:
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f'{sample}{{{label_text}}} {_format_value(value)}')
+            else:
+                lines.append(f'{sample} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+# ========== 各模块共用的指标 ==========
+http_request_seconds = Histogram(
+    'http_request_duration_seconds', 'HTTP 请求处理耗时 (流式响应为首字节耗时)',
+    ('route', 'method', 'status'))
+
+serialize_seconds = Histogram(
+    'response_serialize_duration_seconds', 'JSON 响应序列化耗时')
+
+upstream_seconds = Histogram(
+    'upstream_request_duration_seconds', 'Yahoo (yfinance) 调用耗时', ('call',))
+
+upstream_errors = Counter(
+    'upstream_errors', 'Yahoo (yfinance) 调用失败次数', ('call',))
+
+sqlite_seconds = Histogram(
+    'sqlite_query_duration_seconds', 'SQLite 查询/写入耗时', ('query',))
+
+ticks_received = Counter(
+    'ws_ticks', 'WebSocket 收到的 tick 数', ('symbol',))
+
+tick_lag_seconds = Histogram(
+    'ws_tick_lag_seconds', 'tick 时间戳到本机收到的延迟',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 300))
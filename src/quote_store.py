@@ -0,0 +1,140 @@
+"""
+实时报价存储
+每个符号一个 __slots__ 记录，收到 tick 时原地更新，只在读取时才构造 dict
+"""
+
+import threading
+import time
+from datetime import datetime
+
+# 记录字段 -> WebSocket 消息字段 (yfinance 保留 protobuf 原名) 及兼容的驼峰写法
+FIELD_MAP = (
+    ('name', 'short_name', 'shortName'),
+    ('price', 'price', None),
+    ('change', 'change', None),
+    ('change_percent', 'change_percent', 'changePercent'),
+    ('volume', 'day_volume', 'dayVolume'),
+    ('bid', 'bid', None),
+    ('ask', 'ask', None),
+    ('high', 'day_high', 'dayHigh'),
+    ('low', 'day_low', 'dayLow'),
+    ('open', 'open_price', 'openPrice'),
+    ('previous_close', 'previous_close', 'previousClose'),
+    ('market_hours', 'market_hours', 'marketHours'),
+)
+
+
+class Quote:
+    """单个符号的最新报价"""
+
+    __slots__ = ('symbol', 'seq', 'updated_at', 'raw') + tuple(f for f, _, _ in FIELD_MAP)
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.seq = 0
+        self.updated_at = 0.0
+        self.raw = None
+        for field, _, _ in FIELD_MAP:
+            setattr(self, field, None)
+
+    def update(self, message, now):
+        for field, key, alias in FIELD_MAP:
+            value = message.get(key)
+            if value is None and alias is not None:
+                value = message.get(alias)
+            setattr(self, field, value)
+        # 只保留对最新原始消息的引用 (不复制)，供 /api/data 兼容输出
+        self.raw = message
+        self.updated_at = now
+        self.seq += 1
+
+    def to_dict(self, include_raw=False):
+        data = {'symbol': self.symbol}
+        for field, _, _ in FIELD_MAP:
+            data[field] = getattr(self, field)
+        data['timestamp'] = datetime.fromtimestamp(self.updated_at).isoformat()
+        data['updated_at'] = self.updated_at
+        data['seq'] = self.seq
+        if include_raw:
+            data['raw'] = self.raw
+        return data
+
+
+class QuoteStore:
+    """线程安全的实时报价表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._quotes = {}
+        # 全局版本号，每次更新递增
+        self.version = 0
+
+    def update(self, symbol, message):
+        """用 WebSocket 消息原地更新报价，返回该符号的序列号"""
+        now = time.time()
+        with self._lock:
+            quote = self._quotes.get(symbol)
+            if quote is None:
+                quote = self._quotes[symbol] = Quote(symbol)
+            quote.update(message, now)
+            self.version += 1
+            return quote.seq
+
+    def get(self, symbol, include_raw=False):
+        """获取报价 dict，不存在返回 None"""
+        with self._lock:
+            quote = self._quotes.get(symbol)
+            return quote.to_dict(include_raw) if quote is not None else None
+
+    def get_raw(self, symbol):
+        """获取最新原始消息"""
+        with self._lock:
+            quote = self._quotes.get(symbol)
+            return quote.raw if quote is not None else None
+
+    def get_field(self, symbol, field):
+        """读取单个字段，避免构造整个 dict"""
+        with self._lock:
+            quote = self._quotes.get(symbol)
+            return getattr(quote, field) if quote is not None else None
+
+    def seq(self, symbol):
+        with self._lock:
+            quote = self._quotes.get(symbol)
+            return quote.seq if quote is not None else 0
+
+    def snapshot(self, symbols=None, include_raw=False):
+        """批量获取报价 {symbol: dict}"""
+        with self._lock:
+            if symbols is None:
+                quotes = list(self._quotes.values())
+            else:
+                quotes = [q for q in (self._quotes.get(s) for s in symbols) if q is not None]
+            return {q.symbol: q.to_dict(include_raw) for q in quotes}
+
+    def changed_since(self, seqs, symbols=None):
+        """返回序列号比 seqs 中记录更新的报价 {symbol: dict}"""
+        with self._lock:
+            names = self._quotes.keys() if symbols is None else symbols
+            result = {}
+            for symbol in names:
+                quote = self._quotes.get(symbol)
+                if quote is not None and quote.seq > seqs.get(symbol, 0):
+                    result[symbol] = quote.to_dict()
+            return result
+
+    def remove(self, symbol):
+        with self._lock:
+            return self._quotes.pop(symbol, None) is not None
+
+    def symbols(self):
+        with self._lock:
+            return list(self._quotes)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._quotes)
+
+    def __contains__(self, symbol):
+        with self._lock:
+            return symbol in self._quotes
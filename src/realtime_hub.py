@@ -0,0 +1,200 @@
+"""
+实时行情中枢
+多 worker 部署时由 gunicorn 主进程启动一个独立进程，运行唯一的 WebSocket 接收线程、日线同步和分钟线聚合，
+worker 通过本地 Unix socket (multiprocessing manager) 访问实时报价和订阅列表
+"""
+
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.managers import BaseManager
+
+import tick_bus
+
+logger = logging.getLogger(__name__)
+
+# 中枢地址和认证密钥通过环境变量传给 worker (worker 由主进程 fork，继承环境变量)
+ADDRESS_ENV = 'YAHOO_HUB_ADDRESS'
+AUTHKEY_ENV = 'YAHOO_HUB_AUTHKEY'
+
+# 各共享对象允许远程调用的方法
+QUOTE_METHODS = ('get', 'get_raw', 'get_field', 'seq', 'snapshot', 'changed_since',
+                 'remove', 'symbols', '__len__', '__contains__')
+BAR_METHODS = ('live_from', 'frame', 'is_live', 'stats')
+CONTROL_METHODS = ('add_subscription', 'retain_subscriptions', 'release_subscriptions',
+                   'is_subscribed', 'subscriptions', 'track_daily', 'request_daily_refresh', 'status', 'metrics')
+
+
+class HubManager(BaseManager):
+    pass
+
+
+class HubControl:
+    """订阅管理、日线同步请求和状态查询，在中枢进程内转调 main 中的函数"""
+
+    def __init__(self, app_module):
+        self._main = app_module
+
+    def add_subscription(self, symbol):
+        return self._main.add_subscription(symbol)
+
+    def retain_subscriptions(self, symbols):
+        return self._main.retain_subscriptions(symbols)
+
+    def release_subscriptions(self, symbols):
+        return self._main.release_subscriptions(symbols)
+
+    def is_subscribed(self, symbol):
+        return self._main.is_subscribed(symbol)
+
+    def subscriptions(self):
+        return self._main.list_subscriptions()
+
+    def track_daily(self, symbols):
+        return self._main.track_daily(symbols)
+
+    def request_daily_refresh(self, symbols):
+        return self._main.request_daily_refresh(symbols)
+
+    def status(self):
+        return self._main.realtime_status()
+
+    def metrics(self):
+        return self._main.metrics.REGISTRY.collect()
+
+
+class Hub:
+    """worker 端持有的中枢代理"""
+
+    def __init__(self, address, authkey):
+        for name, methods in (('quotes', QUOTE_METHODS), ('bars', BAR_METHODS), ('control', CONTROL_METHODS)):
+            HubManager.register(name, exposed=methods)
+        self.address = address
+        self._manager = HubManager(address=address, authkey=authkey)
+        self._manager.connect()
+        self.quotes = self._manager.quotes()
+        self.bars = self._manager.bars()
+        self.control = self._manager.control()
+
+
+def connect_from_env(retries=30, delay=1.0):
+    """按环境变量连接中枢，未配置时返回 None (单进程模式)"""
+    address = os.getenv(ADDRESS_ENV)
+    if not address:
+        return None
+    authkey = bytes.fromhex(os.environ[AUTHKEY_ENV])
+    for attempt in range(retries):
+        try:
+            return Hub(address, authkey)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            if attempt == retries - 1:
+                raise
+            logger.warning(f"Realtime hub not ready ({e}), retrying")
+            time.sleep(delay)
+
+
+class PollingSubscription(tick_bus.Subscription):
+    """
+    worker 内的 SSE 订阅：tick 不经过本进程的总线，改为定期向中枢查询序列号有变化的符号
+    注册到本地总线上，连接数统计和上限检查与单进程模式一致
+    """
+
+    def __init__(self, bus, name, store, symbols, poll_interval, limit=None):
+        super().__init__(bus, name, len(symbols), tick_bus.CONFLATE, symbols)
+        self.store = store
+        self.poll_interval = poll_interval
+        self._seqs = {}
+        bus.attach(self, limit)
+
+    def drain(self, timeout=None):
+        deadline = time.monotonic() + (timeout if timeout is not None else float('inf'))
+        while not self.closed:
+            changed = self.store.changed_since(self._seqs, list(self.symbols))
+            if changed:
+                for symbol, data in changed.items():
+                    self._seqs[symbol] = data['seq']
+                self.received += len(changed)
+                self.delivered += len(changed)
+                return list(changed.items())
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            with self._cond:
+                if not self._closed:
+                    self._cond.wait(min(self.poll_interval, remaining))
+        return []
+
+
+def _serve(address, authkey):
+    """中枢进程入口：启动后台任务并提供共享对象"""
+    import main
+
+    control = HubControl(main)
+    HubManager.register('quotes', callable=lambda: main.realtime_data, exposed=QUOTE_METHODS)
+    HubManager.register('bars', callable=lambda: main.bar_builder, exposed=BAR_METHODS)
+    HubManager.register('control', callable=lambda: control, exposed=CONTROL_METHODS)
+
+    if os.path.exists(address):
+        os.remove(address)
+    server = HubManager(address=address, authkey=authkey).get_server()
+    main.start_background_tasks()
+    threading.Thread(target=_watch_parent, args=(os.getppid(),), name='hub-watchdog', daemon=True).start()
+    logger.info(f"Realtime hub listening on {address}")
+    server.serve_forever()
+
+
+def _watch_parent(parent_pid):
+    """gunicorn 主进程意外退出 (未执行 stop) 时结束中枢进程"""
+    while os.getppid() == parent_pid:
+        time.sleep(1)
+    os._exit(0)
+
+
+_process = None
+
+
+def start(address, timeout=120):
+    """启动中枢进程并等待就绪，随后把地址和密钥写入环境变量供 worker 继承"""
+    global _process
+    authkey = os.urandom(16)
+    env = dict(os.environ, **{ADDRESS_ENV: address, AUTHKEY_ENV: authkey.hex()})
+    # 独立的进程组：终端 Ctrl-C 和 gunicorn 的信号只发给主进程，本进程由 stop() 结束
+    # 不使用 multiprocessing，避免 fork 出的 worker 继承子进程记录后在退出时误杀中枢
+    _process = subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env, start_new_session=True)
+
+    deadline = time.monotonic() + timeout
+    while True:
+        if _process.poll() is not None:
+            raise RuntimeError(f'Realtime hub exited with code {_process.returncode}')
+        try:
+            Hub(address, authkey)
+            break
+        except (FileNotFoundError, ConnectionRefusedError):
+            if time.monotonic() > deadline:
+                stop()
+                raise RuntimeError('Realtime hub did not start in time')
+            time.sleep(0.2)
+
+    os.environ[ADDRESS_ENV] = address
+    os.environ[AUTHKEY_ENV] = authkey.hex()
+    return _process
+
+
+def stop():
+    """结束中枢进程"""
+    if _process is not None and _process.poll() is None:
+        _process.terminate()
+        try:
+            _process.wait(10)
+        except subprocess.TimeoutExpired:
+            _process.kill()
+
+
+if __name__ == '__main__':
+    # 中枢进程自身不作为 worker 连接中枢
+    hub_address = os.environ.pop(ADDRESS_ENV)
+    hub_authkey = bytes.fromhex(os.environ.pop(AUTHKEY_ENV))
+    _serve(hub_address, hub_authkey)
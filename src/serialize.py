@@ -0,0 +1,130 @@
+"""
+K 线序列化
+按列一次性完成日期格式化、四舍五入和涨跌幅计算，避免逐行构造 dict
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，缺失时退回标准库
+    orjson = None
+
+
+def format_dates(index, intraday=False):
+    """把日期索引格式化为字符串列表 ('%Y-%m-%d' 或 '%Y-%m-%d %H:%M')"""
+    index = pd.DatetimeIndex(index)
+    # 带时区的索引保留交易所本地时间
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    if not intraday:
+        return np.datetime_as_string(index.values.astype('datetime64[D]'), unit='D').tolist()
+    minutes = np.datetime_as_string(index.values.astype('datetime64[m]'), unit='m')
+    return np.char.replace(minutes, 'T', ' ').tolist()
+
+
+def history_columns(df, intraday=False):
+    """
+    把 OHLCV DataFrame 转为列式结构:
+    {'date': [...], 'open': [...], 'high': [...], 'low': [...], 'close': [...],
+     'volume': [...], 'change_percent': [...]}
+    change_percent 相对于第一根 K 线的收盘价
+    """
+    close = df['Close'].to_numpy(dtype=float)
+    base_close = close[0]
+    volume = np.nan_to_num(df['Volume'].to_numpy(dtype=float)).astype(np.int64)
+
+    return {
+        'date': format_dates(df.index, intraday),
+        'open': np.round(df['Open'].to_numpy(dtype=float), 2).tolist(),
+        'high': np.round(df['High'].to_numpy(dtype=float), 2).tolist(),
+        'low': np.round(df['Low'].to_numpy(dtype=float), 2).tolist(),
+        'close': np.round(close, 2).tolist(),
+        'volume': volume.tolist(),
+        'change_percent': ((close - base_close) / base_close * 100).tolist(),
+    }
+
+
+def history_columns_by_symbol(df):
+    """
+    多个符号的日线 (含 Symbol 列，按 Symbol、Date 排序) 一次性转为 {symbol: 列式结构}
+    各列整体计算后按符号切片，change_percent 相对于各符号第一根 K 线的收盘价
+    """
+    symbols = df['Symbol'].to_numpy()
+    close = df['Close'].to_numpy(dtype=float)
+    # 每个符号第一行的位置
+    starts = np.flatnonzero(np.r_[True, symbols[1:] != symbols[:-1]])
+    ends = np.r_[starts[1:], len(df)]
+    base_close = np.repeat(close[starts], ends - starts)
+
+    columns = {
+        'date': format_dates(df['Date']),
+        'open': np.round(df['Open'].to_numpy(dtype=float), 2).tolist(),
+        'high': np.round(df['High'].to_numpy(dtype=float), 2).tolist(),
+        'low': np.round(df['Low'].to_numpy(dtype=float), 2).tolist(),
+        'close': np.round(close, 2).tolist(),
+        'volume': np.nan_to_num(df['Volume'].to_numpy(dtype=float)).astype(np.int64).tolist(),
+        'change_percent': ((close - base_close) / base_close * 100).tolist(),
+    }
+    return {
+        symbols[start]: {key: values[start:end] for key, values in columns.items()}
+        for start, end in zip(starts.tolist(), ends.tolist())
+    }
+
+
+def format_timestamps(index):
+    """带时区的时间索引格式化为 ISO 8601 字符串 (如 2026-01-29T09:30:00-05:00)"""
+    index = pd.DatetimeIndex(index).as_unit('s')
+    wall = index.tz_localize(None)
+    text = np.datetime_as_string(wall.values, unit='s')
+    # 同一段数据中的时区偏移只有少数几种 (夏令时切换)，按偏移分组拼接
+    offsets = (wall.asi8 - index.asi8) // 60
+    suffix = {}
+    for minutes in np.unique(offsets).tolist():
+        sign = '+' if minutes >= 0 else '-'
+        hours, mins = divmod(abs(minutes), 60)
+        suffix[minutes] = f'{sign}{hours:02d}:{mins:02d}'
+    return [t + suffix[o] for t, o in zip(text.tolist(), offsets.tolist())]
+
+
+def intraday_columns(df):
+    """分钟线 DataFrame 转为列式结构 (时间为 ISO 8601，价格不做四舍五入)"""
+    return {
+        'timestamp': format_timestamps(df.index),
+        'open': df['Open'].to_numpy(dtype=float).tolist(),
+        'high': df['High'].to_numpy(dtype=float).tolist(),
+        'low': df['Low'].to_numpy(dtype=float).tolist(),
+        'close': df['Close'].to_numpy(dtype=float).tolist(),
+        'volume': np.nan_to_num(df['Volume'].to_numpy(dtype=float)).astype(np.int64).tolist(),
+    }
+
+
+def columns_to_records(columns):
+    """列式结构转为行式 [{'date': ..., 'close': ...}, ...]"""
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+
+def dumps(obj):
+    """序列化为 JSON bytes (优先使用 orjson)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def loads(data):
+    """解析 JSON bytes (优先使用 orjson)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
@@ -0,0 +1,109 @@
+"""
+单飞 (single-flight) 请求合并
+同一个 key 同时只执行一次调用，并发的调用方等待并共享同一个结果（或异常）
+"""
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """一次进行中的调用"""
+
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按 key 合并并发调用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+        self.background = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """执行 fn(*args, **kwargs)；若相同 key 的调用正在进行，则等待其结果"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        return self._run(key, call, fn, args, kwargs)
+
+    def submit(self, executor, key, fn, *args, **kwargs):
+        """
+        在 executor 中后台执行 fn；相同 key 的调用正在进行时不再提交，返回是否提交
+        后台调用进行期间，相同 key 的 do() 直接等待其结果
+        """
+        with self._lock:
+            if key in self._calls:
+                return False
+            call = _Call()
+            self._calls[key] = call
+            self.executed += 1
+            self.background += 1
+        try:
+            executor.submit(self._run_background, key, call, fn, args, kwargs)
+        except RuntimeError:
+            # executor 已关闭
+            self._finish(key, call)
+            return False
+        return True
+
+    def _run(self, key, call, fn, args, kwargs):
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+        return call.result
+
+    def _run_background(self, key, call, fn, args, kwargs):
+        try:
+            self._run(key, call, fn, args, kwargs)
+        except Exception as e:
+            logger.warning(f"Background call {key} failed: {e}")
+
+    def _finish(self, key, call):
+        with self._lock:
+            del self._calls[key]
+        call.event.set()
+
+    def in_flight(self):
+        """当前正在执行的 key 数量"""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        """返回合并统计"""
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executed': self.executed,
+                'shared': self.shared,
+                'background': self.background,
+            }
@@ -0,0 +1,174 @@
+"""
+实时订阅生命周期
+记录每个符号的最近访问时间和推送连接引用数：空闲超时的符号自动退订，总数超过上限时按 LRU 淘汰，
+常驻符号 (config.INITIAL_SYMBOLS) 和仍被推送连接引用的符号不会被退订
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ('last_access', 'refs')
+
+    def __init__(self, now):
+        self.last_access = now
+        self.refs = 0
+
+
+class SubscriptionRegistry:
+    """订阅符号的访问时间、引用计数和淘汰"""
+
+    def __init__(self, idle_ttl, max_symbols, pinned=(), clock=time.monotonic):
+        self.idle_ttl = idle_ttl
+        self.max_symbols = max_symbols
+        self.pinned = set(pinned)
+        self._clock = clock
+        self._lock = threading.Lock()
+        # 按最近访问排序，最久未访问的在前
+        self._entries = OrderedDict()
+        self._thread = None
+
+        self.added = 0
+        self.expired = 0
+        self.evicted = 0
+        self.rejected = 0
+
+    def __contains__(self, symbol):
+        return symbol in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def symbols(self):
+        with self._lock:
+            return list(self._entries)
+
+    def refs(self, symbol):
+        with self._lock:
+            entry = self._entries.get(symbol)
+            return entry.refs if entry is not None else 0
+
+    def _removable(self, symbol, entry):
+        return entry.refs == 0 and symbol not in self.pinned
+
+    def _touch(self, symbol, now, added):
+        entry = self._entries.get(symbol)
+        if entry is None:
+            entry = self._entries[symbol] = _Entry(now)
+            self.added += 1
+            added.append(symbol)
+        else:
+            entry.last_access = now
+            self._entries.move_to_end(symbol)
+        return entry
+
+    def _evict(self, added):
+        """超过上限时退订最久未访问的可退订符号；全部不可退订时拒绝本次新增的符号"""
+        evicted = []
+        overflow = len(self._entries) - self.max_symbols
+        if overflow <= 0:
+            return evicted
+        for symbol, entry in list(self._entries.items()):
+            if overflow <= 0:
+                break
+            if symbol in added or not self._removable(symbol, entry):
+                continue
+            del self._entries[symbol]
+            evicted.append(symbol)
+            overflow -= 1
+        self.evicted += len(evicted)
+
+        for symbol in reversed(list(added)):
+            if overflow <= 0:
+                break
+            if self._removable(symbol, self._entries[symbol]):
+                del self._entries[symbol]
+                added.remove(symbol)
+                self.added -= 1
+                self.rejected += 1
+                overflow -= 1
+        return evicted
+
+    def touch(self, symbols):
+        """记录一次访问，返回 (新增的符号, 被 LRU 淘汰的符号)"""
+        added = []
+        with self._lock:
+            now = self._clock()
+            for symbol in symbols:
+                self._touch(symbol, now, added)
+            evicted = self._evict(added)
+        return added, evicted
+
+    def acquire(self, symbols):
+        """推送连接开始引用这些符号，返回 (新增的符号, 被 LRU 淘汰的符号)"""
+        added = []
+        with self._lock:
+            now = self._clock()
+            for symbol in symbols:
+                self._touch(symbol, now, added).refs += 1
+            evicted = self._evict(added)
+        return added, evicted
+
+    def release(self, symbols):
+        """推送连接结束，空闲时间从此刻开始计算"""
+        with self._lock:
+            now = self._clock()
+            for symbol in symbols:
+                entry = self._entries.get(symbol)
+                if entry is not None and entry.refs > 0:
+                    entry.refs -= 1
+                    entry.last_access = now
+                    self._entries.move_to_end(symbol)
+
+    def expire(self):
+        """移除空闲超时的符号并返回"""
+        expired = []
+        with self._lock:
+            deadline = self._clock() - self.idle_ttl
+            for symbol, entry in list(self._entries.items()):
+                if entry.last_access > deadline:
+                    # 按访问时间排序，之后的都未超时
+                    break
+                if self._removable(symbol, entry):
+                    del self._entries[symbol]
+                    expired.append(symbol)
+            self.expired += len(expired)
+        return expired
+
+    def start(self, on_expire, interval):
+        """启动后台线程，定期把空闲超时的符号交给 on_expire 退订"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, args=(on_expire, interval),
+                                        name='subscription-sweep', daemon=True)
+        self._thread.start()
+
+    def _run(self, on_expire, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                expired = self.expire()
+                if expired:
+                    on_expire(expired)
+            except Exception as e:
+                logger.error(f"Subscription sweep failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            referenced = sum(1 for entry in self._entries.values() if entry.refs)
+            return {
+                'symbols': len(self._entries),
+                'pinned': len(self.pinned),
+                'referenced': referenced,
+                'max_symbols': self.max_symbols,
+                'idle_ttl': self.idle_ttl,
+                'added': self.added,
+                'expired': self.expired,
+                'evicted': self.evicted,
+                'rejected': self.rejected,
+            }
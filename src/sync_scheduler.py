@@ -0,0 +1,203 @@
+"""
+日线增量同步调度器
+根据交易日历判断本地日线是否已是最新，只对过期的符号批量向 Yahoo 拉取
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+
+import database
+import market_calendar
+
+logger = logging.getLogger(__name__)
+
+
+class DailySyncScheduler:
+    """后台批量刷新过期日线数据"""
+
+    def __init__(self, fetch_batch, settle_minutes=20, poll_interval=300, batch_size=50, on_saved=None):
+        # fetch_batch(symbols, start=None, period=None) -> {symbol: DataFrame}
+        self._fetch_batch = fetch_batch
+        # on_saved(symbols)：写入新日线后回调 (如增量更新派生指标)，异常只记录日志
+        self._on_saved = on_saved
+        self.settle = timedelta(minutes=settle_minutes)
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self._tracked = set()
+        self._latest = {}   # symbol -> 本地最新日期 'YYYY-MM-DD'
+        self._checked = {}  # symbol -> 最近一次成功同步的时间
+        self._wakeup = threading.Event()
+        self._thread = None
+
+        self.runs = 0
+        self.symbols_refreshed = 0
+        self.rows_saved = 0
+        self.errors = 0
+        self.last_run = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def track(self, symbol):
+        """加入后台同步列表"""
+        with self._lock:
+            self._tracked.add(symbol)
+
+    def request_refresh(self, symbol):
+        """请求后台尽快刷新指定符号"""
+        self.track(symbol)
+        self._wakeup.set()
+
+    def forget(self, symbols):
+        """丢弃缓存的最新日期，下次查询时重新读库 (日线由其他进程写入时使用)"""
+        with self._lock:
+            for symbol in symbols:
+                self._latest.pop(symbol, None)
+
+    def latest_date(self, symbol):
+        """本地最新日线日期 (首次查询后缓存在内存中)"""
+        with self._lock:
+            if symbol in self._latest:
+                return self._latest[symbol]
+        latest = database.get_latest_date(symbol)
+        with self._lock:
+            self._latest.setdefault(symbol, latest)
+        return latest
+
+    def is_fresh(self, symbol, now=None):
+        """
+        本地日线是否已是最新:
+        - 已包含最近一个已完成交易日的日线，或
+        - 在该日线预计可用之后已经同步过 (例如停牌、Yahoo 暂无数据)
+        """
+        now = now or market_calendar.now_market()
+        target = market_calendar.last_completed_session(now, self.settle)
+        latest = self.latest_date(symbol)
+        if latest and latest >= target.isoformat():
+            return True
+        with self._lock:
+            checked = self._checked.get(symbol)
+        return checked is not None and checked >= market_calendar.session_close(target) + self.settle
+
+    def stale_symbols(self, now=None):
+        """跟踪列表中已过期的符号"""
+        with self._lock:
+            tracked = sorted(self._tracked)
+        return [s for s in tracked if not self.is_fresh(s, now)]
+
+    def seconds_until_next_bar(self, now=None):
+        """距离下一根日线预计可用还有多少秒"""
+        now = now or market_calendar.now_market()
+        return max(0.0, (market_calendar.next_bar_available(now, self.settle) - now).total_seconds())
+
+    def refresh(self, symbols, now=None):
+        """批量拉取并保存日线，返回 {symbol: 保存条数}"""
+        now = now or market_calendar.now_market()
+        target = market_calendar.last_completed_session(now, self.settle).isoformat()
+
+        counts = {}
+        for i in range(0, len(symbols), self.batch_size):
+            batch = symbols[i:i + self.batch_size]
+            latest = {s: self.latest_date(s) for s in batch}
+
+            frames = {}
+            full = [s for s in batch if not latest[s]]
+            incremental = [s for s in batch if latest[s]]
+            if full:
+                logger.info(f"Full fetch for {full}")
+                frames.update(self._fetch(full, period='max'))
+            # 按本地最新日期分组，长期未更新的符号不会让整批从更早的日期重新下载
+            groups = {}
+            for symbol in incremental:
+                groups.setdefault(latest[symbol], []).append(symbol)
+            for start, group in sorted(groups.items()):
+                logger.info(f"Incremental update for {group} from {start}")
+                frames.update(self._fetch(group, start=start))
+
+            # 只保存已收盘的日线，盘中未完成的日线留到收盘后再拉取
+            to_save = {}
+            for symbol in batch:
+                df = frames.get(symbol)
+                if df is not None and not df.empty:
+                    df = df[df.index.strftime('%Y-%m-%d') <= target]
+                    if not df.empty:
+                        to_save[symbol] = df
+            saved = database.save_daily_data_bulk(to_save) if to_save else {}
+
+            with self._lock:
+                for symbol in batch:
+                    if symbol in to_save:
+                        newest = to_save[symbol].index.max().strftime('%Y-%m-%d')
+                        if not self._latest.get(symbol) or newest > self._latest[symbol]:
+                            self._latest[symbol] = newest
+                    # yf.download 对单个符号的失败 (如 429) 只返回空结果：没有拿到数据的符号不记为已同步，
+                    # 下次请求时重试 (本地已是最新的除外)
+                    df = frames.get(symbol)
+                    if (df is not None and not df.empty) or (self._latest.get(symbol) or '') >= target:
+                        self._checked[symbol] = now
+                    counts[symbol] = saved.get(symbol, 0)
+
+            if self._on_saved and saved:
+                try:
+                    self._on_saved([s for s in batch if saved.get(s)])
+                except Exception as e:
+                    logger.error(f"Post-save hook failed for {batch}: {e}")
+
+        self.runs += 1
+        self.symbols_refreshed += len(counts)
+        self.rows_saved += sum(counts.values())
+        self.last_run = now.isoformat()
+        return counts
+
+    def _fetch(self, symbols, **kwargs):
+        """拉取一组符号，失败时只记录日志 (这些符号不记为已同步，下次重试)，不影响同批其他分组"""
+        try:
+            return self._fetch_batch(symbols, **kwargs)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Daily fetch failed for {symbols}: {e}")
+            return {}
+
+    def start(self):
+        """启动后台同步线程"""
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name='daily-sync', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                stale = self.stale_symbols()
+                if stale:
+                    self.refresh(stale)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Daily sync failed: {e}")
+
+            timeout = min(self.poll_interval, max(1.0, self.seconds_until_next_bar()))
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            # 合并短时间内的多次唤醒请求
+            time.sleep(0.5)
+
+    def stats(self):
+        """返回调度器状态"""
+        with self._lock:
+            tracked = len(self._tracked)
+        return {
+            'running': self.running,
+            'tracked': tracked,
+            'last_completed_session': market_calendar.last_completed_session(settle=self.settle).isoformat(),
+            'next_bar_available': market_calendar.next_bar_available(settle=self.settle).isoformat(),
+            'runs': self.runs,
+            'symbols_refreshed': self.symbols_refreshed,
+            'rows_saved': self.rows_saved,
+            'errors': self.errors,
+            'last_run': self.last_run,
+        }
@@ -0,0 +1,175 @@
+"""
+实时行情发布/订阅总线
+每个消费者拥有独立的有界缓冲，慢消费者只会丢弃自己的旧数据，不会拖累推送线程或撑爆内存
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+# 缓冲满时丢弃最旧的 tick
+DROP_OLDEST = 'drop_oldest'
+# 每个符号只保留最新的 tick
+CONFLATE = 'conflate'
+
+
+class BusFull(Exception):
+    """同名订阅者数量已达上限"""
+
+
+class Subscription:
+    """单个消费者的有界缓冲"""
+
+    def __init__(self, bus, name, maxlen, policy, symbols=None):
+        if policy not in (DROP_OLDEST, CONFLATE):
+            raise ValueError(f'Unknown policy: {policy}')
+        self.bus = bus
+        self.name = name
+        self.maxlen = maxlen
+        self.policy = policy
+        self.symbols = set(symbols) if symbols else None
+        self.created_at = time.time()
+
+        self._cond = threading.Condition()
+        if policy == DROP_OLDEST:
+            self._buffer = deque(maxlen=maxlen)
+        else:
+            self._buffer = OrderedDict()
+        self._closed = False
+
+        self.received = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.conflated = 0
+
+    def wants(self, symbol):
+        return self.symbols is None or symbol in self.symbols
+
+    def set_symbols(self, symbols):
+        """更新符号过滤 (None 表示接收全部)"""
+        self.symbols = set(symbols) if symbols else None
+
+    def offer(self, symbol, tick):
+        """写入一条 tick (由总线调用，不阻塞)"""
+        with self._cond:
+            if self._closed:
+                return
+            self.received += 1
+            if self.policy == DROP_OLDEST:
+                if len(self._buffer) == self.maxlen:
+                    self.dropped += 1
+                self._buffer.append((symbol, tick))
+            else:
+                if symbol in self._buffer:
+                    self.conflated += 1
+                    self._buffer.move_to_end(symbol)
+                elif len(self._buffer) == self.maxlen:
+                    self._buffer.popitem(last=False)
+                    self.dropped += 1
+                self._buffer[symbol] = tick
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """取出一条 (symbol, tick)，超时或已关闭返回 None"""
+        with self._cond:
+            if not self._buffer and not self._closed:
+                self._cond.wait(timeout)
+            if not self._buffer:
+                return None
+            self.delivered += 1
+            if self.policy == DROP_OLDEST:
+                return self._buffer.popleft()
+            return self._buffer.popitem(last=False)
+
+    def drain(self, timeout=None):
+        """取出当前缓冲中的全部 tick；缓冲为空时最多等待 timeout 秒"""
+        with self._cond:
+            if not self._buffer and not self._closed:
+                self._cond.wait(timeout)
+            if self.policy == DROP_OLDEST:
+                items = list(self._buffer)
+            else:
+                items = list(self._buffer.items())
+            self._buffer.clear()
+            self.delivered += len(items)
+            return items
+
+    @property
+    def pending(self):
+        with self._cond:
+            return len(self._buffer)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        """取消订阅并唤醒等待中的消费者"""
+        self.bus.unsubscribe(self)
+        with self._cond:
+            self._closed = True
+            self._buffer.clear()
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'name': self.name,
+                'policy': self.policy,
+                'maxlen': self.maxlen,
+                'pending': len(self._buffer),
+                'symbols': len(self.symbols) if self.symbols is not None else None,
+                'received': self.received,
+                'delivered': self.delivered,
+                'dropped': self.dropped,
+                'conflated': self.conflated,
+            }
+
+
+class TickBus:
+    """扇出总线：publish 把 tick 投递到所有匹配的订阅者"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 写时复制的订阅者元组，publish 无需加锁遍历
+        self._subscriptions = ()
+        self.published = 0
+
+    def subscribe(self, name, maxlen=1024, policy=DROP_OLDEST, symbols=None, limit=None):
+        """注册消费者，返回 Subscription (同名订阅者已有 limit 个时抛出 BusFull)"""
+        return self.attach(Subscription(self, name, maxlen, policy, symbols), limit)
+
+    def attach(self, sub, limit=None):
+        """注册已创建的订阅 (如自定义数据来源的 Subscription 子类)，上限检查和注册在同一把锁内完成"""
+        with self._lock:
+            if limit is not None and sum(1 for s in self._subscriptions if s.name == sub.name) >= limit:
+                raise BusFull(f'{sub.name} 订阅者已达上限 {limit}')
+            self._subscriptions = self._subscriptions + (sub,)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscriptions = tuple(s for s in self._subscriptions if s is not sub)
+
+    def publish(self, symbol, tick):
+        """发布一条 tick"""
+        self.published += 1
+        for sub in self._subscriptions:
+            if sub.wants(symbol):
+                sub.offer(symbol, tick)
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    def count(self, name):
+        """指定名称的订阅者数量"""
+        return sum(1 for s in self._subscriptions if s.name == name)
+
+    def stats(self):
+        subs = self._subscriptions
+        return {
+            'published': self.published,
+            'subscribers': len(subs),
+            'dropped': sum(s.dropped for s in subs),
+            'subscriptions': [s.stats() for s in subs],
+        }
@@ -0,0 +1,263 @@
+"""
+tick 记录器
+把 WebSocket 收到的每条消息追加写入按时间分段的压缩日志，供盘后分析和重建 K 线
+
+目录结构 (TICK_LOG_DIR):
+  <起始毫秒>.seg  数据段：连续的块，每块 = 块头 + zlib 压缩的 JSON 行 (每行一条原始消息)
+  <起始毫秒>.idx  时间索引：每块一条 (最早 tick 毫秒, 最晚 tick 毫秒, 块在 .seg 中的偏移)
+只追加不修改；先写数据块再写索引，进程中断时未进索引的尾部数据会被忽略
+"""
+
+import bisect
+import contextlib
+import heapq
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+import serialize
+
+logger = logging.getLogger(__name__)
+
+TICK_LOG_DIR = os.getenv('TICK_LOG_DIR', 'ticks')
+
+BLOCK_MAGIC = b'TKB1'
+# 块头: magic, 最早 tick 毫秒, 最晚 tick 毫秒, 压缩后长度, 条数
+BLOCK_HEADER = struct.Struct('<4sqqII')
+# 索引项: 最早 tick 毫秒, 最晚 tick 毫秒, 块偏移
+INDEX_ENTRY = struct.Struct('<qqQ')
+
+
+def tick_time_ms(message, default):
+    """消息中的 tick 时间 (毫秒)，缺失时使用 default"""
+    ts = message.get('time')
+    try:
+        return int(ts) if ts is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+def list_segments(directory):
+    """按起始时间排序的 [(起始毫秒, 段文件路径)]"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    segments = []
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext == '.seg' and stem.isdigit():
+            segments.append((int(stem), os.path.join(directory, name)))
+    return sorted(segments)
+
+
+def read_index(seg_path):
+    """读取段的时间索引 [(first_ms, last_ms, offset)]"""
+    try:
+        with open(seg_path[:-4] + '.idx', 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    # 忽略写了一半的索引项
+    usable = len(data) - len(data) % INDEX_ENTRY.size
+    return list(INDEX_ENTRY.iter_unpack(data[:usable]))
+
+
+def read_ticks(directory, symbol, start_ms, end_ms, limit=None, slack_ms=60000):
+    """
+    读取 [start_ms, end_ms] 内某个符号的 tick (按 tick 时间排序)，返回 (ticks, truncated)
+    数据段通过 mmap 只读映射，只解压时间范围有重叠的块；指定 limit 时按块的最早时间顺序读取，
+    只保留最早的 limit + 1 条，剩余块的最早时间晚于已保留的 tick 时停止
+    """
+    needle = symbol.encode('utf-8')
+    segments = list_segments(directory)
+    starts = [start for start, _ in segments]
+
+    blocks = []
+    for i, (seg_start, path) in enumerate(segments):
+        # 段内 tick 时间大致落在 [本段起点, 下一段起点)，迟到的 tick 留出 slack_ms 余量
+        if seg_start > end_ms:
+            break
+        if i + 1 < len(starts) and starts[i + 1] + slack_ms < start_ms:
+            continue
+        blocks.extend((first, path, offset) for first, last, offset in read_index(path)
+                      if last >= start_ms and first <= end_ms)
+    blocks.sort(key=lambda block: block[0])
+
+    # limit 为 None 时保留全部；否则为按 (-时间, -序号) 排列的最大堆，堆顶是已保留的最晚一条
+    kept = []
+    seq = 0
+    with contextlib.ExitStack() as stack:
+        maps = {}
+        for first, path, offset in blocks:
+            if limit is not None and len(kept) > limit and first > -kept[0][0]:
+                break
+            mm = maps.get(path)
+            if mm is None:
+                f = stack.enter_context(open(path, 'rb'))
+                mm = maps[path] = stack.enter_context(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            magic, _, _, length, _ = BLOCK_HEADER.unpack_from(mm, offset)
+            if magic != BLOCK_MAGIC:
+                logger.error(f"Corrupt tick block at {path}:{offset}")
+                continue
+            body = offset + BLOCK_HEADER.size
+            for line in zlib.decompress(mm[body:body + length]).split(b'\n'):
+                # 先做字节匹配，只解析可能属于该符号的行
+                if needle not in line:
+                    continue
+                message = serialize.loads(line)
+                if message.get('id') != symbol:
+                    continue
+                ts = tick_time_ms(message, 0)
+                if not start_ms <= ts <= end_ms:
+                    continue
+                seq += 1
+                if limit is None:
+                    kept.append((ts, seq, message))
+                elif len(kept) <= limit:
+                    heapq.heappush(kept, (-ts, -seq, message))
+                elif (-ts, -seq) > kept[0][:2]:
+                    heapq.heapreplace(kept, (-ts, -seq, message))
+
+    if limit is None:
+        ticks = sorted(kept, key=lambda item: item[:2])
+        return [message for _, _, message in ticks], False
+    ticks = sorted(((-ts, -seq, message) for ts, seq, message in kept), key=lambda item: item[:2])
+    truncated = len(ticks) > limit
+    return [message for _, _, message in ticks[:limit]], truncated
+
+
+class TickRecorder:
+    """从 tick 总线订阅中批量取出消息，在后台线程中压缩写盘"""
+
+    def __init__(self, directory, segment_seconds=3600, segment_bytes=64 * 1024 * 1024,
+                 flush_interval=1.0, batch_size=5000, retention_days=None, level=6):
+        self.directory = directory
+        self.segment_ms = int(segment_seconds * 1000)
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retention_days = retention_days
+        self.level = level
+
+        self._thread = None
+        self._subscription = None
+        self._segment = None  # (起始毫秒, 数据文件, 索引文件)
+        self._starts = []
+
+        self.ticks = 0
+        self.blocks = 0
+        self.raw_bytes = 0
+        self.bytes_written = 0
+        self.segments_removed = 0
+        self.errors = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _open_segment(self, start_ms):
+        self._close_segment()
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f'{start_ms:013d}')
+        self._segment = (start_ms, open(base + '.seg', 'ab'), open(base + '.idx', 'ab'))
+        logger.info(f"Tick log segment {base}.seg opened")
+        self._remove_expired(start_ms)
+
+    def _close_segment(self):
+        if self._segment is not None:
+            _, data, index = self._segment
+            data.close()
+            index.close()
+            self._segment = None
+
+    def _remove_expired(self, now_ms):
+        if not self.retention_days:
+            return
+        cutoff = now_ms - self.retention_days * 86400 * 1000
+        segments = list_segments(self.directory)
+        # 保留最后一个早于 cutoff 的段之后的全部数据
+        for start, path in segments[:max(0, bisect.bisect_left([s for s, _ in segments], cutoff) - 1)]:
+            for p in (path, path[:-4] + '.idx'):
+                try:
+                    os.remove(p)
+                except FileNotFoundError:
+                    pass
+            self.segments_removed += 1
+
+    def write_block(self, messages, now_ms=None):
+        """把一批消息写成一个压缩块"""
+        if not messages:
+            return
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        times = [tick_time_ms(m, now_ms) for m in messages]
+        first, last = min(times), max(times)
+        raw = b'\n'.join(serialize.dumps(m) for m in messages)
+        payload = zlib.compress(raw, self.level)
+
+        if (self._segment is None or first - self._segment[0] >= self.segment_ms
+                or self._segment[1].tell() >= self.segment_bytes):
+            self._open_segment(max(first, self._segment[0] + 1) if self._segment else first)
+        _, data, index = self._segment
+
+        offset = data.tell()
+        data.write(BLOCK_HEADER.pack(BLOCK_MAGIC, first, last, len(payload), len(messages)))
+        data.write(payload)
+        data.flush()
+        # 数据落盘后再写索引，读者只会看到完整的块
+        index.write(INDEX_ENTRY.pack(first, last, offset))
+        index.flush()
+
+        self.ticks += len(messages)
+        self.blocks += 1
+        self.raw_bytes += len(raw)
+        self.bytes_written += BLOCK_HEADER.size + len(payload)
+
+    def start(self, subscription):
+        """启动后台写盘线程，从 tick 总线订阅中消费"""
+        if self.running:
+            return
+        self._subscription = subscription
+        self._thread = threading.Thread(target=self._run, args=(subscription,),
+                                        name='tick-recorder', daemon=True)
+        self._thread.start()
+
+    def _run(self, subscription):
+        batch = []
+        deadline = None
+        while not subscription.closed:
+            try:
+                timeout = self.flush_interval if deadline is None else max(0.0, deadline - time.monotonic())
+                items = subscription.drain(timeout=timeout)
+                if items and deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.extend(message for _, message in items)
+                if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                    self.write_block(batch)
+                    batch = []
+                    deadline = None
+            except Exception as e:
+                self.errors += 1
+                batch = []
+                deadline = None
+                logger.error(f"Tick recording failed: {e}")
+        self._close_segment()
+
+    def stats(self):
+        sub = self._subscription
+        return {
+            'running': self.running,
+            'directory': self.directory,
+            'ticks': self.ticks,
+            'blocks': self.blocks,
+            'bytes_written': self.bytes_written,
+            'compression_ratio': round(self.raw_bytes / self.bytes_written, 2) if self.bytes_written else None,
+            'segment': os.path.basename(self._segment[1].name) if self._segment else None,
+            'segments_removed': self.segments_removed,
+            'dropped': sub.dropped if sub is not None else 0,
+            'errors': self.errors,
+        }
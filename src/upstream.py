@@ -0,0 +1,234 @@
+"""
+上游 (Yahoo) 访问网关
+所有 yfinance REST 调用经过同一个网关：令牌桶限速、并发上限和熔断器
+Yahoo 连续出错 (如 429) 时熔断打开，请求立即失败并由调用方改用本地/过期数据，而不是排队等待超时
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamUnavailable(Exception):
+    """网关拒绝调用 (熔断打开、限流或并发已满)"""
+
+    def __init__(self, reason, retry_after=None):
+        super().__init__(f'upstream unavailable: {reason}')
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """令牌桶：平均每秒 rate 个请求，允许 burst 个突发"""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = clock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """取一个令牌，成功返回 0，否则返回需要等待的秒数"""
+        with self._lock:
+            self._refill(self._clock())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout):
+        """最多等待 timeout 秒取得令牌"""
+        deadline = self._clock() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            remaining = deadline - self._clock()
+            if wait > remaining:
+                return False
+            time.sleep(wait)
+
+    def available(self):
+        with self._lock:
+            self._refill(self._clock())
+            return self._tokens
+
+
+class CircuitBreaker:
+    """
+    熔断器：window 秒内失败至少 failure_threshold 次且失败率达到 failure_ratio 时打开，
+    open_seconds 后进入半开状态，只放行一个探测请求，成功则关闭，失败则重新打开
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, failure_ratio=0.5, window=30.0, open_seconds=30.0,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.failure_ratio = failure_ratio
+        self.window = window
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._opened_at = None
+        self._probing = False
+        self._results = deque()  # (时间, 是否失败)
+
+        self.opened = 0
+        self.last_error = None
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state(self._clock())
+
+    def _current_state(self, now):
+        if self._state == self.OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def retry_after(self):
+        """熔断打开时距离半开还有多少秒"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (self._clock() - self._opened_at))
+
+    def allow(self):
+        """是否放行一次调用 (半开时占用唯一的探测名额，调用结束后必须 record_* 或 cancel)"""
+        with self._lock:
+            state = self._current_state(self._clock())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def cancel(self):
+        """放行后未实际调用上游 (被限流等)，归还探测名额"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            now = self._clock()
+            if self._state == self.HALF_OPEN:
+                logger.info("Upstream circuit closed")
+                self._state = self.CLOSED
+                self._results.clear()
+            self._probing = False
+            self._record(now, False)
+
+    def record_failure(self, error=None):
+        with self._lock:
+            now = self._clock()
+            self.last_error = str(error) if error is not None else None
+            if self._state == self.HALF_OPEN:
+                self._open(now)
+                return
+            self._record(now, True)
+            failures = sum(1 for _, failed in self._results if failed)
+            if (self._state == self.CLOSED and failures >= self.failure_threshold
+                    and failures >= self.failure_ratio * len(self._results)):
+                self._open(now)
+
+    def _record(self, now, failed):
+        self._results.append((now, failed))
+        while self._results and now - self._results[0][0] > self.window:
+            self._results.popleft()
+
+    def _open(self, now):
+        logger.warning(f"Upstream circuit opened for {self.open_seconds}s: {self.last_error}")
+        self._state = self.OPEN
+        self._opened_at = now
+        self._probing = False
+        self._results.clear()
+        self.opened += 1
+
+
+class UpstreamGateway:
+    """限速 + 并发上限 + 熔断，包装每一次上游调用"""
+
+    def __init__(self, rate, burst, max_concurrency, max_wait=2.0, failure_threshold=5,
+                 failure_ratio=0.5, failure_window=30.0, open_seconds=30.0, clock=time.monotonic):
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self._clock = clock
+        self.bucket = TokenBucket(rate, burst, clock)
+        self.breaker = CircuitBreaker(failure_threshold, failure_ratio, failure_window, open_seconds, clock)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._active = 0
+
+        self.calls = {}     # 调用名 -> 次数
+        self.failures = 0
+        self.rejected = {'circuit_open': 0, 'rate_limited': 0, 'concurrency': 0}
+
+    def _reject(self, reason, retry_after=None):
+        with self._lock:
+            self.rejected[reason] += 1
+        raise UpstreamUnavailable(reason, retry_after)
+
+    def call(self, name, fn, *args, **kwargs):
+        """经网关执行 fn(*args, **kwargs)，被拒绝时抛出 UpstreamUnavailable"""
+        if not self.breaker.allow():
+            self._reject('circuit_open', self.breaker.retry_after())
+
+        deadline = self._clock() + self.max_wait
+        if not self._slots.acquire(timeout=self.max_wait):
+            self.breaker.cancel()
+            self._reject('concurrency')
+        try:
+            if not self.bucket.acquire(max(0.0, deadline - self._clock())):
+                self.breaker.cancel()
+                self._reject('rate_limited', 1 / self.bucket.rate)
+
+            with self._lock:
+                self._active += 1
+                self.calls[name] = self.calls.get(name, 0) + 1
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                self.breaker.record_failure(e)
+                raise
+            finally:
+                with self._lock:
+                    self._active -= 1
+            self.breaker.record_success()
+            return result
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        """网关状态 (供 /api/status)"""
+        with self._lock:
+            calls, failures, rejected, active = dict(self.calls), self.failures, dict(self.rejected), self._active
+        return {
+            'circuit': self.breaker.state,
+            'retry_after': round(self.breaker.retry_after(), 1),
+            'circuit_opened': self.breaker.opened,
+            'last_error': self.breaker.last_error,
+            'active': active,
+            'max_concurrency': self.max_concurrency,
+            'tokens': round(self.bucket.available(), 2),
+            'rate': self.bucket.rate,
+            'calls': calls,
+            'failures': failures,
+            'rejected': rejected,
+        }
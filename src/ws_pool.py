@@ -0,0 +1,409 @@
+"""
+WebSocket 连接池
+按单连接最大符号数把订阅分散到多条 yfinance WebSocket 连接，每条连接在独立线程中接收和重连，
+一条连接变慢或断开只影响它负责的符号
+"""
+
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 连续因无消息被强制重连时，静默判定时间按 2^n 倍放宽的上限
+STALE_BACKOFF_MAX_EXP = 4
+
+
+class Shard:
+    """
+    一条 WebSocket 连接 (符号归属由连接池维护)
+    状态: connecting -> connected -> (断开) -> backoff -> connecting ...
+    断开后首次重连立即进行，连续失败 (连接后未收到任何消息) 时按带抖动的指数退避等待
+    冷门符号的分片可能长时间没有成交，连续因静默被强制重连时逐次放宽静默判定时间，避免周期性重连
+    """
+
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.index = index
+        self.status = 'disconnected'
+        self._ws = None
+        # 保护 _ws 及其上的发送
+        self._send_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._failures = 0
+        self._forced = None
+        self._healthy = False
+        # 连续因静默被强制重连且重连后仍未收到消息的次数
+        self._stale_streak = 0
+        self._last_activity = time.monotonic()
+        self._disconnected_at = None
+
+        self.messages = 0
+        self.connects = 0
+        self.errors = 0
+        self.forced_reconnects = 0
+        self.last_message = None
+        self.last_error = None
+        self.last_gap = None
+        self.rate = 0.0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f'ws-shard-{self.index}', daemon=True)
+        self._thread.start()
+
+    def send_subscribe(self, symbols):
+        """在已建立的连接上订阅 (未连接时由连接建立后统一订阅)"""
+        with self._send_lock:
+            if self._ws is None:
+                return
+            try:
+                self._ws.subscribe(list(symbols))
+            except Exception as e:
+                # 发送失败说明连接已断，立即重连并重新订阅全部符号
+                logger.error(f"Shard {self.index} subscribe {symbols} failed: {e}")
+                self._close_locked(f'subscribe failed: {e}')
+
+    def send_unsubscribe(self, symbols):
+        with self._send_lock:
+            if self._ws is None:
+                return
+            try:
+                self._ws.unsubscribe(list(symbols))
+            except Exception as e:
+                logger.error(f"Shard {self.index} unsubscribe {symbols} failed: {e}")
+                self._close_locked(f'unsubscribe failed: {e}')
+
+    def force_reconnect(self, reason):
+        """关闭当前连接，接收线程立即重连"""
+        with self._send_lock:
+            self._close_locked(reason)
+
+    def _close_locked(self, reason):
+        if self._ws is None:
+            return
+        self._forced = reason
+        try:
+            self._ws.close()
+        except Exception:
+            pass
+
+    def _on_message(self, message):
+        now = time.monotonic()
+        self.messages += 1
+        self.last_message = time.time()
+        self._last_activity = now
+        if not self._healthy:
+            self._healthy = True
+            self._stale_streak = 0
+            if self._disconnected_at is not None:
+                # 断开到重连后收到第一条消息的间隔
+                self.last_gap = now - self._disconnected_at
+                self._disconnected_at = None
+        if now - self._window_start >= self.pool.rate_window:
+            self.rate = (self.messages - self._window_count) / (now - self._window_start)
+            self._window_start = now
+            self._window_count = self.messages
+        self.pool.on_message(message)
+
+    def _connect(self):
+        """建立连接并订阅本分片的全部符号"""
+        ws = self.pool.factory()
+        try:
+            symbols = self.pool.members(self) or []
+            # 一次订阅全部符号：yf.WebSocket.subscribe 每次都会重发累计的全部订阅，分批只会增加发送量，
+            # 单条消息的大小由每条连接的符号上限 (max_symbols) 限制
+            # subscribe 会先建立连接，在锁外进行，避免阻塞并发的订阅请求
+            if symbols:
+                ws.subscribe(symbols)
+            with self._send_lock:
+                self._ws = ws
+                # 连接期间新分到本分片的符号
+                missed = [s for s in self.pool.members(self) if s not in set(symbols)]
+                if missed:
+                    ws.subscribe(missed)
+        except Exception:
+            self._disconnect(ws)
+            raise
+        self.connects += 1
+        self._last_activity = time.monotonic()
+        logger.info(f"Shard {self.index} connected with {len(symbols) + len(missed)} symbols")
+        return ws
+
+    def _disconnect(self, ws):
+        with self._send_lock:
+            if self._ws is ws:
+                self._ws = None
+        try:
+            ws.close()
+        except Exception:
+            pass
+
+    def _backoff(self):
+        """第 n 次连续失败后等待 base * 2^(n-1) 秒 (不超过上限)，取其 50%~100% 的随机值，避免多条连接同时重连"""
+        if self._failures == 0:
+            return 0.0
+        delay = min(self.pool.backoff_max, self.pool.backoff_base * 2 ** (self._failures - 1))
+        return random.uniform(delay / 2, delay)
+
+    def _run(self):
+        while not self.pool.closed:
+            self._healthy = False
+            self._forced = None
+            try:
+                self.status = 'connecting'
+                ws = self._connect()
+                self.status = 'connected'
+                if self.pool.on_connect is not None:
+                    self.pool.on_connect(self.pool.members(self))
+                try:
+                    # yfinance 在接收出错时记录日志并正常返回
+                    ws.listen(message_handler=self._on_message)
+                finally:
+                    self._disconnect(ws)
+                reason = self._forced or 'connection closed'
+            except Exception as e:
+                self.errors += 1
+                self.last_error = reason = str(e)
+                logger.error(f"Shard {self.index} WebSocket error: {e}")
+
+            if self._disconnected_at is None:
+                self._disconnected_at = time.monotonic()
+            if self._forced is not None:
+                self.forced_reconnects += 1
+            if self._forced == 'stale' and not self._healthy:
+                self._stale_streak += 1
+            if self._healthy or self._forced is not None:
+                self._failures = 0
+            else:
+                self._failures += 1
+
+            delay = self._backoff()
+            if self.pool.closed:
+                break
+            logger.warning(f"Shard {self.index} disconnected ({reason}), reconnecting in {delay:.2f}s")
+            if delay:
+                self.status = 'backoff'
+                self._wakeup.wait(delay)
+        self.status = 'closed'
+
+    def is_stale(self, timeout, now=None):
+        """已连接、有订阅符号，但超过 timeout 秒没有收到消息 (连续静默重连后 timeout 按 2^n 倍放宽)"""
+        now = now if now is not None else time.monotonic()
+        return (self.status == 'connected' and self._ws is not None
+                and bool(self.pool.members(self)) and now - self._last_activity > self.stale_limit(timeout))
+
+    def stale_limit(self, timeout):
+        return timeout * 2 ** min(self._stale_streak, STALE_BACKOFF_MAX_EXP)
+
+    def close(self):
+        self._wakeup.set()
+        with self._send_lock:
+            ws, self._ws = self._ws, None
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        now = time.monotonic()
+        rate = self.rate
+        if now - self._window_start >= 2 * self.pool.rate_window:
+            # 长时间没有消息，上一个窗口的速率已过时
+            rate = (self.messages - self._window_count) / (now - self._window_start)
+        return {
+            'index': self.index,
+            'status': self.status,
+            'symbols': len(self.pool.members(self)),
+            'messages': self.messages,
+            'message_rate': round(rate, 2),
+            'connects': self.connects,
+            'errors': self.errors,
+            'forced_reconnects': self.forced_reconnects,
+            'consecutive_failures': self._failures,
+            'stale_streak': self._stale_streak,
+            'last_error': self.last_error,
+            'last_gap': round(self.last_gap, 3) if self.last_gap is not None else None,
+            'last_message_age': round(time.time() - self.last_message, 1) if self.last_message else None,
+        }
+
+
+class WebSocketPool:
+    """按符号分片的多连接 WebSocket 订阅"""
+
+    def __init__(self, factory, on_message, max_symbols, max_connections, backoff_base=0.5, backoff_max=30.0,
+                 rate_window=10.0, stale_timeout=None, is_active=None, on_connect=None):
+        # factory() 返回新的 yf.WebSocket (或同接口对象)
+        self.factory = factory
+        self.on_message = on_message
+        # on_connect(symbols)：分片 (重新) 连接后回调，symbols 为该分片负责的符号
+        self.on_connect = on_connect
+        self.max_symbols = max_symbols
+        self.max_connections = max_connections
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_window = rate_window
+        # 超过 stale_timeout 秒没有消息的连接强制重连，is_active() 为 False 时 (如休市) 不检查
+        self.stale_timeout = stale_timeout
+        self.is_active = is_active
+
+        self._lock = threading.Lock()
+        self._shards = []
+        self._owner = {}    # symbol -> Shard
+        self._members = {}  # Shard -> set(symbol)
+        self._started = False
+        self._watchdog = None
+        self.closed = False
+        self.moves = 0
+
+    def __contains__(self, symbol):
+        return symbol in self._owner
+
+    def __len__(self):
+        return len(self._owner)
+
+    def symbols(self):
+        with self._lock:
+            return list(self._owner)
+
+    def members(self, shard):
+        with self._lock:
+            return list(self._members.get(shard, ()))
+
+    def shard_of(self, symbol):
+        shard = self._owner.get(symbol)
+        return shard.index if shard is not None else None
+
+    def _new_shard(self):
+        shard = Shard(self, len(self._shards))
+        self._shards.append(shard)
+        self._members[shard] = set()
+        if self._started:
+            shard.start()
+        return shard
+
+    def _place(self):
+        """新符号放到负载最低的连接，所有连接已满时新开连接"""
+        shard = min(self._shards, key=lambda s: len(self._members[s]), default=None)
+        if shard is None or len(self._members[shard]) >= self.max_symbols:
+            if len(self._shards) < self.max_connections:
+                return self._new_shard()
+            if shard is not None:
+                logger.warning(f"WebSocket pool full ({self.max_connections} connections), "
+                               f"shard {shard.index} exceeds {self.max_symbols} symbols")
+        return shard
+
+    def _rebalance(self):
+        """把符号从负载最高的连接迁到最低的连接，直到相差不超过 1，返回 [(symbol, from, to)]"""
+        moves = []
+        while len(self._shards) > 1:
+            ordered = sorted(self._shards, key=lambda s: len(self._members[s]))
+            low, high = ordered[0], ordered[-1]
+            if len(self._members[high]) - len(self._members[low]) <= 1:
+                break
+            symbol = next(iter(self._members[high]))
+            self._members[high].discard(symbol)
+            self._members[low].add(symbol)
+            self._owner[symbol] = low
+            moves.append((symbol, high, low))
+        self.moves += len(moves)
+        return moves
+
+    def add(self, symbols):
+        """订阅新符号，返回实际新增的符号列表"""
+        placed = {}
+        with self._lock:
+            added = [s for s in dict.fromkeys(symbols) if s not in self._owner]
+            for symbol in added:
+                shard = self._place()
+                self._members[shard].add(symbol)
+                self._owner[symbol] = shard
+                placed.setdefault(shard, []).append(symbol)
+            moves = self._rebalance() if added else []
+
+        # 迁移的符号先在新连接上订阅，再从旧连接退订，中间不断流
+        for symbol, _, target in moves:
+            placed.setdefault(target, []).append(symbol)
+        for shard, batch in placed.items():
+            shard.send_subscribe(batch)
+        for symbol, source, _ in moves:
+            source.send_unsubscribe([symbol])
+        if moves:
+            logger.info(f"Rebalanced {len(moves)} symbols across {len(self._shards)} connections")
+        return added
+
+    def remove(self, symbols):
+        """退订符号，返回实际移除的符号列表 (连接负载在下次新增时重新均衡)"""
+        removed = {}
+        with self._lock:
+            for symbol in dict.fromkeys(symbols):
+                shard = self._owner.pop(symbol, None)
+                if shard is not None:
+                    self._members[shard].discard(symbol)
+                    removed.setdefault(shard, []).append(symbol)
+        for shard, batch in removed.items():
+            shard.send_unsubscribe(batch)
+        return [symbol for batch in removed.values() for symbol in batch]
+
+    def start(self):
+        with self._lock:
+            self._started = True
+            if not self._shards:
+                self._new_shard()
+            else:
+                for shard in self._shards:
+                    shard.start()
+        if self.stale_timeout and self._watchdog is None:
+            self._watchdog = threading.Thread(target=self._watch, name='ws-watchdog', daemon=True)
+            self._watchdog.start()
+
+    def check_stale(self, now=None):
+        """强制重连长时间没有消息的连接，返回被重连的分片序号"""
+        if self.is_active is not None and not self.is_active():
+            return []
+        stale = [shard for shard in list(self._shards) if shard.is_stale(self.stale_timeout, now)]
+        for shard in stale:
+            logger.warning(f"Shard {shard.index} received no ticks for {shard.stale_limit(self.stale_timeout)}s, "
+                           f"reconnecting")
+            shard.force_reconnect('stale')
+        return [shard.index for shard in stale]
+
+    def _watch(self):
+        while not self.closed:
+            time.sleep(max(1.0, self.stale_timeout / 3))
+            try:
+                self.check_stale()
+            except Exception as e:
+                logger.error(f"WebSocket watchdog failed: {e}")
+
+    def close(self):
+        self.closed = True
+        for shard in list(self._shards):
+            shard.close()
+
+    def status(self):
+        """汇总连接状态：全部连接正常为 connected，部分正常为 degraded"""
+        statuses = [shard.status for shard in list(self._shards)]
+        if not statuses:
+            return 'disconnected'
+        connected = statuses.count('connected')
+        if connected == len(statuses):
+            return 'connected'
+        if connected:
+            return 'degraded'
+        return statuses[0]
+
+    def stats(self):
+        shards = [shard.stats() for shard in list(self._shards)]
+        return {
+            'connections': len(shards),
+            'symbols': len(self._owner),
+            'max_symbols_per_connection': self.max_symbols,
+            'rebalanced': self.moves,
+            'message_rate': round(sum(s['message_rate'] for s in shards), 2),
+            'shards': shards,
+        }
@@ -0,0 +1,75 @@
+"""
+日线写入性能基准
+对比逐行 iterrows + 单条 INSERT 与批量 executemany 的写入速度 (rows/sec)
+
+用法: PYTHONPATH=src python tests/bench_database.py [--rows 8000] [--symbols 10]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+
+def make_frame(rows):
+    """生成与 yfinance 相同结构的日线数据"""
+    dates = pd.bdate_range(end='2026-01-02', periods=rows, tz='America/New_York', name='Date')
+    close = 100 + np.cumsum(np.random.standard_normal(rows))
+    return pd.DataFrame({
+        'Open': close + 0.1,
+        'High': close + 0.5,
+        'Low': close - 0.5,
+        'Close': close,
+        'Volume': np.random.randint(1_000_000, 9_000_000, rows),
+    }, index=dates)
+
+
+def legacy_save(symbol, df):
+    """旧实现：逐行 iterrows，每行一条 INSERT"""
+    conn = sqlite3.connect(database.DB_FILE)
+    c = conn.cursor()
+    for _, row in df.reset_index().iterrows():
+        c.execute('''
+            INSERT OR REPLACE INTO daily_prices (symbol, date, open, high, low, close, volume)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (symbol, row['Date'].strftime('%Y-%m-%d'), row['Open'], row['High'],
+              row['Low'], row['Close'], int(row['Volume'])))
+    conn.commit()
+    conn.close()
+
+
+def run(label, fn, frames):
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    database.init_db()
+    total = sum(len(df) for df in frames.values())
+    start = time.perf_counter()
+    fn(frames)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {total:>8} rows  {elapsed:8.3f}s  {total / elapsed:>12,.0f} rows/sec")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=8000)
+    parser.add_argument('--symbols', type=int, default=10)
+    args = parser.parse_args()
+
+    frames = {f'SYM{i}': make_frame(args.rows) for i in range(args.symbols)}
+
+    before = run('iterrows + execute', lambda f: [legacy_save(s, df) for s, df in f.items()], frames)
+    after = run('save_daily_data_bulk', database.save_daily_data_bulk, frames)
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import unittest
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path to import analytics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics
+
+
+class TestAnalytics(unittest.TestCase):
+    def setUp(self):
+        dates = pd.bdate_range('2024-01-01', periods=6)
+        self.closes = pd.DataFrame({
+            'AAA': [100.0, 110.0, 88.0, 99.0, 121.0, 110.0],
+            # 晚两天开始交易
+            'BBB': [np.nan, np.nan, 50.0, 55.0, 60.5, 55.0],
+        }, index=dates)
+
+    def test_summary_matches_per_symbol_calculation(self):
+        result = analytics.summarize(self.closes, window=2)
+        aaa = result['AAA']
+        self.assertEqual(aaa['points'], 6)
+        self.assertAlmostEqual(aaa['total_return'], 0.1)
+        # 110 -> 88 为最大回撤
+        self.assertAlmostEqual(aaa['max_drawdown'], -0.2)
+        self.assertEqual((aaa['drawdown_peak'], aaa['drawdown_trough']), ('2024-01-02', '2024-01-03'))
+        self.assertAlmostEqual(aaa['current_drawdown'], 110 / 121 - 1, places=6)
+        expected = self.closes['AAA'].pct_change().std() * np.sqrt(analytics.TRADING_DAYS)
+        self.assertAlmostEqual(aaa['volatility'], expected, places=5)
+
+        bbb = result['BBB']
+        self.assertEqual((bbb['points'], bbb['start_date'], bbb['start_price']), (4, '2024-01-03', 50.0))
+        self.assertAlmostEqual(bbb['total_return'], 0.1)
+
+    def test_series_only_covers_traded_dates(self):
+        series = analytics.summarize(self.closes, window=2, series=True)['BBB']['series']
+        self.assertEqual(series['date'][0], '2024-01-03')
+        self.assertEqual(series['cumulative_return'][0], 0.0)
+        self.assertIsNone(series['rolling_volatility'][0])
+        self.assertEqual(len(series['drawdown']), 4)
+
+    def test_correlation_uses_common_dates(self):
+        symbols, matrix = analytics.correlation(self.closes, min_periods=2)
+        self.assertEqual(symbols, ['AAA', 'BBB'])
+        self.assertEqual(matrix[0][0], 1.0)
+        self.assertEqual(matrix[0][1], matrix[1][0])
+        _, matrix = analytics.correlation(self.closes, min_periods=10)
+        self.assertIsNone(matrix[0][1])
+
+    def test_close_matrix_from_long_frame(self):
+        df = pd.DataFrame({
+            'Symbol': ['AAA', 'AAA', 'BBB'],
+            'Date': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-02']),
+            'Close': [1.0, 2.0, 3.0],
+        })
+        series = analytics.close_matrix(df)
+        self.assertEqual(series['AAA'].tolist(), [1.0, 2.0])
+        self.assertEqual(len(series['BBB']), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
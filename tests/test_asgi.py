@@ -0,0 +1,185 @@
+import unittest
+import asyncio
+import os
+import sys
+import threading
+import time
+
+from starlette.testclient import TestClient
+
+# Add parent directory to path to import asgi
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import test_main  # 共用临时数据库的测试基类 (导入模块本身，避免重复收集其中的用例)
+import asgi
+import main
+
+
+class AsgiTestCase(test_main.MainTestCase):
+    """通过 Starlette TestClient 访问 asgi.app (不触发 lifespan，不启动后台任务)"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = TestClient(asgi.app)
+        self.threads = []
+
+    def record_thread(self, fn):
+        """包装 fn，记录每次调用所在的线程名"""
+        def wrapper(*args, **kwargs):
+            self.threads.append(threading.current_thread().name)
+            return fn(*args, **kwargs)
+        return wrapper
+
+    def assert_off_loop(self):
+        self.assertTrue(self.threads)
+        for name in self.threads:
+            self.assertTrue(name.startswith('asgi-'), name)
+
+
+class TestHistory(AsgiTestCase):
+    def test_freshness_checked_in_thread_pool(self):
+        self.patch(main, 'fetch_historical_columns', lambda symbol, period, interval: test_main.columns(100.0))
+        self.patch(main.daily_sync, 'is_fresh', self.record_thread(lambda symbol, now=None: False))
+
+        data = self.client.get('/api/history/ASGI').json()
+        self.assertEqual((data['cached'], data['stale'], len(data['data'])), (False, True, 2))
+        # 写缓存 (计算 TTL) 和 stale 判断都会读取本地日线日期
+        self.assertEqual(len(self.threads), 2)
+        self.assert_off_loop()
+
+        data = self.client.get('/api/history/ASGI').json()
+        self.assertTrue(data['cached'])
+        self.assert_off_loop()
+
+    def test_missing_symbol_is_404(self):
+        self.patch(main, 'fetch_historical_columns', lambda symbol, period, interval: None)
+        response = self.client.get('/api/history/NONE')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.headers['Access-Control-Allow-Origin'], '*')
+
+
+class TestCompare(AsgiTestCase):
+    def test_freshness_checked_in_thread_pool(self):
+        synced = []
+        self.patch(main.daily_sync, 'is_fresh',
+                   self.record_thread(lambda symbol, now=None: not symbol.startswith('OLD')))
+        self.patch(main, 'sync_daily_batch', lambda symbols: synced.append(list(symbols)) or {})
+        self.patch(main, 'load_daily_columns', lambda symbol, period: test_main.columns(100.0))
+
+        data = self.client.get('/api/compare?symbols=QQQ,OLD1').json()
+        self.assertEqual(sorted(data['benchmarks']), ['OLD1', 'QQQ'])
+        self.assertEqual(synced, [['OLD1']])
+        self.assert_off_loop()
+
+    def test_invalid_timeout(self):
+        for value in ('x', '0', '-1', 'nan'):
+            self.assertEqual(self.client.get(f'/api/compare?timeout={value}').status_code, 400, value)
+
+
+class TestQuote(AsgiTestCase):
+    symbol = 'ASGIQ'
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(main.realtime_data.remove, self.symbol)
+
+    def test_realtime_quote(self):
+        main.realtime_data.update(self.symbol, {'price': 10.0, 'change': 1.0})
+        data = self.client.get(f'/api/quote/{self.symbol}').json()
+        self.assertEqual((data['source'], data['price'], data['cached']), ('realtime', 10.0, False))
+
+    def test_cached_quote_read_in_thread_pool(self):
+        self.patch(main, 'quote_from_cache', self.record_thread(main.quote_from_cache))
+        main.data_cache.set(('quote', self.symbol), ({'symbol': self.symbol, 'price': 11.0}, 'fast_info'), ttl=60)
+
+        data = self.client.get(f'/api/quote/{self.symbol}').json()
+        self.assertEqual((data['source'], data['price'], data['cached']), ('fast_info', 11.0, True))
+        self.assert_off_loop()
+
+
+class TestViews(AsgiTestCase):
+    def test_sync_views_shared_with_flask(self):
+        self.assertEqual(self.client.get('/api/benchmarks').status_code, 200)
+        self.assertEqual(self.client.get('/api/ticks/QQQ?limit=x').status_code, 400)
+        self.assertEqual(self.client.get('/api/intraday/QQQ?interval=7m').status_code, 400)
+
+
+class TestStream(AsgiTestCase):
+    symbol = 'SSE2'
+
+    def setUp(self):
+        super().setUp()
+        self.retained = []
+        self.released = []
+        self.patch(main, 'retain_subscriptions', self.retained.append)
+        self.patch(main, 'release_subscriptions', self.released.append)
+        self.addCleanup(main.realtime_data.remove, self.symbol)
+
+    def read_stream(self, chunks):
+        """
+        直接调用 ASGI 应用读取 SSE 响应 (TestClient 会等待响应结束)，
+        收到 chunks 段内容后模拟客户端断开，返回 (状态码, 内容)
+        """
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0', 'spec_version': '2.3'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': '/api/stream', 'raw_path': b'/api/stream',
+            'query_string': f'symbols={self.symbol}'.encode(), 'root_path': '', 'headers': [],
+            'client': ('testclient', 50000), 'server': ('testserver', 80),
+        }
+        status = []
+        body = []
+
+        async def run():
+            disconnected = asyncio.Event()
+            requested = False
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+                elif message.get('body'):
+                    body.append(message['body'].decode())
+                    if len(body) >= chunks:
+                        disconnected.set()
+
+            await asyncio.wait_for(asgi.app(scope, receive, send), 5)
+
+        asyncio.run(run())
+        return status[0], body
+
+    def test_snapshot_then_release_on_disconnect(self):
+        main.realtime_data.update(self.symbol, {'price': 10.0})
+        status, body = self.read_stream(2)
+
+        self.assertEqual(status, 200)
+        self.assertTrue(body[0].startswith('retry:'))
+        self.assertTrue(body[1].startswith('event: quote'))
+        self.assertEqual(self.retained, [[self.symbol]])
+        # 断开后在本地线程池中释放符号引用
+        deadline = time.monotonic() + 2
+        while not self.released and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.released, [[self.symbol]])
+        self.assertEqual(main.realtime_bus.count('sse'), 0)
+
+    def test_client_cap_returns_429(self):
+        self.patch(main.config, 'STREAM_MAX_CLIENTS', 0)
+        response = self.client.get(f'/api/stream?symbols={self.symbol}')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.retained, [])
+        self.assertEqual(main.realtime_bus.count('sse'), 0)
+
+    def test_symbols_required(self):
+        self.assertEqual(self.client.get('/api/stream').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
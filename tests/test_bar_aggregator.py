@@ -0,0 +1,103 @@
+import unittest
+import os
+import sys
+from datetime import date, datetime
+
+# Add parent directory to path to import bar_aggregator
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bar_aggregator
+import market_calendar as mc
+
+
+def ts(*args):
+    return datetime(*args, tzinfo=mc.MARKET_TZ).timestamp()
+
+
+class TestBarAggregator(unittest.TestCase):
+    def setUp(self):
+        self.agg = bar_aggregator.BarAggregator({'1m': 60, '5m': 300, '1h': 3600}, close_delay=0)
+
+    def test_ticks_to_minute_bars(self):
+        self.agg.add_tick('QQQ', 100.0, ts(2026, 10, 16, 9, 30), day_volume=1000)
+        self.agg.add_tick('QQQ', 101.0, ts(2026, 10, 16, 9, 30, 20), day_volume=1300)
+        self.agg.add_tick('QQQ', 99.5, ts(2026, 10, 16, 9, 30, 40), day_volume=1500)
+        self.agg.add_tick('QQQ', 100.5, ts(2026, 10, 16, 9, 31, 5), day_volume=1600)
+
+        bars = self.agg.bars('QQQ', '1m')
+        self.assertEqual(bars[0], (ts(2026, 10, 16, 9, 30), 100.0, 101.0, 99.5, 99.5, 500))
+        self.assertEqual(bars[1], (ts(2026, 10, 16, 9, 31), 100.5, 100.5, 100.5, 100.5, 100))
+        # 5m 由同一 tick 流滚动生成
+        self.assertEqual(self.agg.bars('QQQ', '5m'),
+                         [(ts(2026, 10, 16, 9, 30), 100.0, 101.0, 99.5, 100.5, 600)])
+
+    def test_hour_bars_align_to_session_open(self):
+        self.agg.add_tick('QQQ', 100.0, ts(2026, 10, 16, 9, 30))
+        self.agg.add_tick('QQQ', 100.0, ts(2026, 10, 16, 10, 45))
+        self.assertEqual([b[0] for b in self.agg.bars('QQQ', '1h')],
+                         [ts(2026, 10, 16, 9, 30), ts(2026, 10, 16, 10, 30)])
+
+    def test_first_partial_bar_is_left_to_backfill(self):
+        self.agg.add_tick('QQQ', 100.0, ts(2026, 10, 16, 10, 2, 30))
+        self.agg.add_tick('QQQ', 100.0, ts(2026, 10, 16, 10, 3, 10))
+        self.assertEqual([b[0] for b in self.agg.bars('QQQ', '1m')], [ts(2026, 10, 16, 10, 3)])
+        self.assertEqual(self.agg.live_from('QQQ', '1m', date(2026, 10, 16)), ts(2026, 10, 16, 10, 3))
+        self.assertEqual(self.agg.live_from('QQQ', '5m', date(2026, 10, 16)), ts(2026, 10, 16, 10, 5))
+        self.assertIsNone(self.agg.live_from('QQQ', '1m', date(2026, 10, 15)))
+
+    def test_ignores_ticks_outside_regular_session(self):
+        self.agg.add_tick('QQQ', 100.0, ts(2026, 10, 16, 8, 0))
+        self.agg.add_tick('QQQ', 100.0, ts(2026, 10, 17, 10, 0))  # 周六
+        self.assertEqual(self.agg.bars('QQQ', '1m'), [])
+        self.assertEqual(self.agg.ignored, 2)
+
+    def test_close_expired_and_persist(self):
+        self.agg.add_tick('QQQ', 100.0, ts(2026, 10, 16, 9, 30), day_volume=10)
+        self.agg.add_tick('QQQ', 101.0, ts(2026, 10, 16, 9, 30, 30), day_volume=30)
+        self.agg.close_expired(ts(2026, 10, 16, 9, 31))
+
+        saved = {}
+
+        def save(symbol, interval, df):
+            saved[interval] = df
+            return len(df)
+
+        self.agg.persist(save)
+        self.assertEqual(list(saved), ['1m'])
+        df = saved['1m']
+        self.assertEqual(df.index[0], datetime(2026, 10, 16, 9, 30, tzinfo=mc.MARKET_TZ))
+        self.assertEqual(df['Volume'].tolist(), [20])
+        self.assertEqual(self.agg.bars_saved, 1)
+
+    def test_late_tick_does_not_replace_closed_bar(self):
+        self.agg.add_tick('QQQ', 100.0, ts(2026, 10, 16, 9, 30), day_volume=1000)
+        self.agg.add_tick('QQQ', 105.0, ts(2026, 10, 16, 9, 30, 20), day_volume=3000)
+        self.agg.close_expired(ts(2026, 10, 16, 9, 31))
+        # 收线之后才到达的 9:30 tick
+        self.agg.add_tick('QQQ', 101.0, ts(2026, 10, 16, 9, 30, 50), day_volume=3100)
+        self.agg.close_expired(ts(2026, 10, 16, 9, 32))
+
+        saved = []
+        self.agg.persist(lambda symbol, interval, df: saved.append((interval, df)) or len(df))
+        minute = [df for interval, df in saved if interval == '1m']
+        self.assertEqual(len(minute), 1)
+        self.assertEqual(len(minute[0]), 1)
+        self.assertEqual(minute[0].iloc[0].tolist(), [100.0, 105.0, 100.0, 105.0, 2000])
+        self.assertEqual(self.agg.bars('QQQ', '1m'),
+                         [(ts(2026, 10, 16, 9, 30), 100.0, 105.0, 100.0, 105.0, 2000)])
+        self.assertEqual(self.agg.late, 1)
+
+    def test_reset_coverage_drops_incomplete_bars(self):
+        self.agg.add_tick('QQQ', 100.0, ts(2026, 10, 16, 9, 30))
+        self.agg.reset_coverage()
+        self.assertFalse(self.agg.is_live('QQQ'))
+        self.assertEqual(self.agg.bars('QQQ', '1m'), [])
+
+    def test_parse_tick(self):
+        message = {'id': 'QQQ', 'price': 500.5, 'time': '1769756714000', 'day_volume': '1234'}
+        self.assertEqual(bar_aggregator.parse_tick(message), (500.5, 1769756714.0, 1234))
+        self.assertIsNone(bar_aggregator.parse_tick({'id': 'QQQ'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
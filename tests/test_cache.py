@@ -0,0 +1,94 @@
+import unittest
+import os
+import sys
+import time
+
+# Add parent directory to path to import cache
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_hit_and_miss(self):
+        c = cache.TTLCache(max_entries=10)
+        self.assertIsNone(c.get(('QQQ', '1mo', '1d')))
+        c.set(('QQQ', '1mo', '1d'), [{'close': 1.0}])
+        self.assertEqual(c.get(('QQQ', '1mo', '1d')), [{'close': 1.0}])
+
+        stats = c.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_interval_is_part_of_key(self):
+        c = cache.TTLCache(max_entries=10)
+        c.set(('QQQ', '1mo', '5m'), ['intraday'])
+        self.assertIsNone(c.get(('QQQ', '1mo', '1d')))
+
+    def test_ttl_expiry(self):
+        c = cache.TTLCache(max_entries=10)
+        c.set('k', 'v', ttl=0.05)
+        self.assertEqual(c.get('k'), 'v')
+        time.sleep(0.1)
+        self.assertIsNone(c.get('k'))
+        self.assertEqual(c.stats()['expirations'], 1)
+        self.assertEqual(len(c), 0)
+
+    def test_expired_entries_kept_for_peek(self):
+        c = cache.TTLCache(max_entries=10, stale_ttl=60)
+        c.set('k', 'v', ttl=0.05)
+        self.assertLess(c.peek('k')[1], 0)
+        time.sleep(0.1)
+        self.assertIsNone(c.get('k'))
+        value, expired_for = c.peek('k')
+        self.assertEqual(value, 'v')
+        self.assertGreater(expired_for, 0)
+        self.assertIsNone(c.peek('missing'))
+
+    def test_get_stale_within_max_staleness(self):
+        c = cache.TTLCache(max_entries=10, stale_ttl=60)
+        c.set('k', 'v', ttl=0.05)
+        self.assertEqual(c.get_stale('k', 0.1), ('v', False))
+        time.sleep(0.1)
+        self.assertEqual(c.get_stale('k', 10), ('v', True))
+        # 超过最大陈旧时间按未命中处理，但仍保留给 peek
+        self.assertIsNone(c.get_stale('k', 0.01))
+        self.assertEqual(c.peek('k')[0], 'v')
+
+        stats = c.stats()
+        self.assertEqual((stats['hits'], stats['stale_hits'], stats['misses']), (1, 1, 1))
+
+    def test_lru_eviction_by_count(self):
+        c = cache.TTLCache(max_entries=2)
+        c.set('a', 1)
+        c.set('b', 2)
+        # 访问 a，使 b 成为最久未使用
+        c.get('a')
+        c.set('c', 3)
+
+        self.assertIsNone(c.get('b'))
+        self.assertEqual(c.get('a'), 1)
+        self.assertEqual(c.get('c'), 3)
+        self.assertEqual(c.stats()['evictions'], 1)
+
+    def test_eviction_by_bytes(self):
+        c = cache.TTLCache(max_entries=100, max_bytes=250, sizeof=lambda v: 100)
+        c.set('a', 1)
+        c.set('b', 2)
+        c.set('c', 3)
+
+        self.assertIsNone(c.get('a'))
+        self.assertEqual(c.stats()['bytes'], 200)
+
+    def test_oversized_value_not_cached(self):
+        c = cache.TTLCache(max_entries=100, max_bytes=50, sizeof=lambda v: 100)
+        self.assertFalse(c.set('a', 1))
+        self.assertIsNone(c.get('a'))
+
+    def test_estimate_size_scales_with_rows(self):
+        row = {'date': '2026-01-01', 'close': 1.0, 'volume': 1}
+        self.assertGreater(cache.estimate_size([row] * 100), cache.estimate_size([row] * 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
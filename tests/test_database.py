@@ -1,6 +1,7 @@
 import unittest
 import os
 import sys
+import threading
 import pandas as pd
 from datetime import datetime
 
@@ -17,9 +18,11 @@ class TestDatabase(unittest.TestCase):
         database.init_db()
 
     def tearDown(self):
-        # 清理测试文件
-        if os.path.exists('test_market.db'):
-            os.remove('test_market.db')
+        # 清理测试文件 (包括 WAL 模式的 -wal/-shm 文件)
+        database.close_db_connections()
+        for path in ('test_market.db', 'test_market.db-wal', 'test_market.db-shm'):
+            if os.path.exists(path):
+                os.remove(path)
 
     def test_save_and_get_data(self):
         # 创建模拟数据
@@ -69,6 +72,128 @@ class TestDatabase(unittest.TestCase):
         self.assertEqual(len(loaded_df), 2)
         self.assertEqual(database.get_latest_date('TEST_SYM'), '2023-01-02')
 
+    def test_save_bulk_multi_symbol(self):
+        # yfinance 返回带时区的日期索引
+        dates = pd.date_range('2023-01-02', periods=3, freq='B', tz='America/New_York', name='Date')
+        df_a = pd.DataFrame({
+            'Open': [1.0, 2.0, 3.0], 'High': [1.5, 2.5, 3.5], 'Low': [0.5, 1.5, 2.5],
+            'Close': [1.2, 2.2, 3.2], 'Volume': [10, 20, 30]
+        }, index=dates)
+        df_b = df_a.iloc[:2] * 10
+
+        counts = database.save_daily_data_bulk({'AAA': df_a, 'BBB': df_b, 'CCC': pd.DataFrame()})
+        self.assertEqual(counts, {'AAA': 3, 'BBB': 2, 'CCC': 0})
+
+        self.assertEqual(database.get_latest_date('AAA'), '2023-01-04')
+        loaded_df = database.get_daily_data('BBB')
+        self.assertEqual(len(loaded_df), 2)
+        self.assertEqual(loaded_df.loc[datetime(2023, 1, 3), 'Close'], 22.0)
+        self.assertEqual(loaded_df.loc[datetime(2023, 1, 3), 'Volume'], 200)
+
+        # 每次写入有数据的符号版本号加一
+        database.save_daily_data('AAA', df_a.iloc[-1:])
+        self.assertEqual(database.get_daily_versions(['AAA', 'BBB', 'CCC']), {'AAA': 2, 'BBB': 1, 'CCC': 0})
+
+    def test_indicator_state_roundtrip(self):
+        database.save_indicator('TEST_SYM', 'bb:2:2', ['2023-01-02', '2023-01-03'],
+                                {'middle': [float('nan'), 1.5], 'upper': [float('nan'), 2.5],
+                                 'lower': [float('nan'), 0.5]}, 2.0, {'window': [1.0, 2.0]})
+        database.save_indicator('TEST_SYM', 'bb:2:2', ['2023-01-04'],
+                                {'middle': [2.5], 'upper': [3.5], 'lower': [1.5]}, 3.0, {'window': [2.0, 3.0]})
+
+        record = database.get_indicator_states('TEST_SYM', ['bb:2:2', 'sma:5'])['bb:2:2']
+        self.assertEqual((record['last_date'], record['last_close']), ('2023-01-04', 3.0))
+        self.assertEqual(record['state'], {'window': [2.0, 3.0]})
+        self.assertEqual(record['values'], {'middle': 2.5, 'upper': 3.5, 'lower': 1.5})
+        self.assertEqual(database.list_indicators(['TEST_SYM', 'OTHER']), {'TEST_SYM': ['bb:2:2']})
+
+        columns = database.get_indicator_values('TEST_SYM', 'bb:2:2', ('middle', 'upper', 'lower'))
+        self.assertEqual(columns['date'], ['2023-01-02', '2023-01-03', '2023-01-04'])
+        self.assertEqual(columns['middle'], [None, 1.5, 2.5])
+
+        # 全量重算时替换旧结果
+        database.save_indicator('TEST_SYM', 'bb:2:2', ['2023-01-04'],
+                                {'middle': [9.0], 'upper': [9.0], 'lower': [9.0]}, 9.0, {}, replace=True)
+        columns = database.get_indicator_values('TEST_SYM', 'bb:2:2', ('middle',), start_date='2023-01-01')
+        self.assertEqual(columns, {'date': ['2023-01-04'], 'middle': [9.0]})
+
+    def test_get_daily_data_multi(self):
+        dates = pd.date_range('2023-01-02', periods=3, freq='B', name='Date')
+        df = pd.DataFrame({
+            'Open': [1.0, 2.0, 3.0], 'High': [1.5, 2.5, 3.5], 'Low': [0.5, 1.5, 2.5],
+            'Close': [1.2, 2.2, 3.2], 'Volume': [10, 20, 30]
+        }, index=dates)
+        database.save_daily_data_bulk({'BBB': df, 'AAA': df * 2, 'ZZZ': df})
+
+        loaded = database.get_daily_data_multi(['BBB', 'AAA', 'MISSING'], start_date='2023-01-03')
+        self.assertEqual(loaded['Symbol'].tolist(), ['AAA', 'AAA', 'BBB', 'BBB'])
+        self.assertEqual(loaded['Close'].tolist(), [4.4, 6.4, 2.2, 3.2])
+        self.assertTrue(database.get_daily_data_multi([]).empty)
+
+    def test_intraday_bars_by_session(self):
+        index = pd.DatetimeIndex([
+            '2026-10-15 09:30', '2026-10-15 09:35',
+            '2026-10-16 09:30', '2026-10-16 09:35', '2026-10-16 09:40',
+        ]).tz_localize('America/New_York')
+        df = pd.DataFrame({
+            'Open': 1.0, 'High': 2.0, 'Low': 0.5, 'Close': 1.5, 'Volume': 100
+        }, index=index)
+
+        self.assertEqual(database.save_intraday_bars('TEST_SYM', '5m', df), 5)
+        self.assertEqual(database.get_latest_intraday_ts('TEST_SYM', '5m'), int(index[-1].timestamp()))
+        self.assertIsNone(database.get_latest_intraday_ts('TEST_SYM', '1m'))
+
+        last_session = database.get_intraday_bars('TEST_SYM', '5m', sessions=1)
+        self.assertEqual(len(last_session), 3)
+        self.assertEqual(last_session.index[0], index[2])
+        self.assertEqual(len(database.get_intraday_bars('TEST_SYM', '5m', sessions=5)), 5)
+
+        database.prune_intraday_bars('TEST_SYM', '5m', int(index[2].timestamp()))
+        self.assertEqual(len(database.get_intraday_bars('TEST_SYM', '5m', sessions=5)), 3)
+
+    def test_connection_pool_reuses_connections(self):
+        with database.connection() as conn1:
+            mode = conn1.execute('PRAGMA journal_mode').fetchone()[0]
+        with database.connection() as conn2:
+            pass
+        self.assertIs(conn1, conn2)
+        self.assertEqual(mode, 'wal')
+
+    def test_exhausted_pool_times_out(self):
+        pool = database.ConnectionPool(database.DB_FILE, 1, timeout=0.05)
+        conn = pool.acquire()
+        with self.assertRaises(database.sqlite3.OperationalError):
+            pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        pool.release(conn)
+        pool.close()
+
+    def test_concurrent_reads_during_write(self):
+        dates = pd.date_range('2000-01-03', periods=2000, freq='B', name='Date')
+        df = pd.DataFrame({
+            'Open': 1.0, 'High': 1.0, 'Low': 1.0, 'Close': 1.0, 'Volume': 1
+        }, index=dates)
+        database.save_daily_data('TEST_SYM', df.iloc[:10])
+        errors = []
+
+        def reader():
+            try:
+                for _ in range(20):
+                    self.assertGreaterEqual(len(database.get_daily_data('TEST_SYM')), 10)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=reader) for _ in range(8)]
+        for t in threads:
+            t.start()
+        database.save_daily_data('TEST_SYM', df)
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(database.get_daily_data('TEST_SYM')), 2000)
+
 
 if __name__ == '__main__':
     unittest.main()
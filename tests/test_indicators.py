@@ -0,0 +1,58 @@
+import unittest
+import json
+import os
+import sys
+
+import numpy as np
+
+# Add parent directory to path to import indicators
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import indicators
+
+
+class TestIndicators(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 300)))
+
+    def test_incremental_update_matches_full_compute(self):
+        for ind in indicators.parse('sma:10,ema:5,rsi:14,macd:12:26:9,bb:20:2.5'):
+            full, _ = ind.compute(self.closes)
+            # 历史不足一个周期、刚好跨过初值和已有较长历史时分别续算
+            for split in (0, 3, 40, 299):
+                head, state = ind.compute(self.closes[:split])
+                # 状态需要能经 JSON 持久化
+                columns, _ = ind.update(json.loads(json.dumps(state)), self.closes[split:])
+                for name in ind.outputs:
+                    np.testing.assert_allclose(np.r_[head[name], columns[name]], full[name],
+                                               rtol=1e-9, err_msg=f'{ind.key} {name} @ {split}')
+
+    def test_known_values(self):
+        closes = [1.0, 2.0, 3.0, 2.0, 3.0]
+        sma, rsi, bb = indicators.parse('sma:3,rsi:2,bb:2:1')
+        self.assertEqual(sma.compute(closes)[0]['value'][2:].tolist(), [2.0, 7 / 3, 8 / 3])
+        # 前两个涨跌幅均为上涨，之后按 1/2 平滑：gain=0.5/loss=0.5，再 gain=0.75/loss=0.25
+        self.assertEqual(rsi.compute(closes)[0]['value'][2:].tolist(), [100.0, 50.0, 75.0])
+        band = bb.compute(closes)[0]
+        self.assertEqual((band['upper'][1], band['lower'][1]), (2.0, 1.0))
+
+    def test_preview_does_not_modify_state(self):
+        ema = indicators.parse('ema:3')[0]
+        _, state = ema.compute([1.0, 2.0, 3.0])
+        self.assertEqual(ema.preview(state, 4.0), {'value': 3.0})
+        self.assertEqual(state['value'], 2.0)
+
+    def test_parse(self):
+        result = indicators.parse('SMA:50, sma:50,macd,bb:20')
+        self.assertEqual([ind.key for ind in result], ['sma:50', 'macd:12:26:9', 'bb:20:2'])
+        for spec in ('', 'foo:1', 'sma:0', 'sma:2.5', 'sma:x', 'bb:20:-1', 'rsi:14:2'):
+            with self.assertRaises(ValueError):
+                indicators.parse(spec)
+
+    def test_rounded(self):
+        self.assertEqual(indicators.rounded([1.234567, float('nan'), None]), [1.2346, None, None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,469 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pandas as pd
+
+# Add parent directory to path to import main
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# main 导入时初始化数据库，避免在当前目录生成 market_data.db
+os.environ.setdefault('DB_PATH', os.path.join(tempfile.gettempdir(), 'yahoo_test_import.db'))
+
+import database
+import main
+import market_calendar
+import realtime_hub
+import subscriptions
+import sync_scheduler
+import tick_recorder
+import upstream
+
+
+class MainTestCase(unittest.TestCase):
+    """使用临时数据库和空缓存的 Flask 接口测试基类"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        database.DB_FILE = os.path.join(self.tmpdir.name, 'test_market.db')
+        database.init_db()
+        main.data_cache.clear()
+        # 每个测试使用独立的上游网关，失败计数不会触发其他测试的熔断
+        self.patch(main, 'upstream_gateway', upstream.UpstreamGateway(rate=1000, burst=1000, max_concurrency=8))
+        self.client = main.app.test_client()
+
+    def tearDown(self):
+        database.close_db_connections()
+        self.tmpdir.cleanup()
+
+    def patch(self, target, name, value):
+        """临时替换 target.name，测试结束后恢复"""
+        original = getattr(target, name)
+        setattr(target, name, value)
+        self.addCleanup(setattr, target, name, original)
+
+
+class FakeTicker:
+    """yf.Ticker 替身：fast_info/info 为 None 时访问抛出异常，calls 记录访问过的属性"""
+
+    def __init__(self, fast_info=None, info=None):
+        self._fast_info = fast_info
+        self._info = info
+        self.calls = []
+
+    def __call__(self, symbol):
+        return self
+
+    @property
+    def fast_info(self):
+        self.calls.append('fast_info')
+        if self._fast_info is None:
+            raise RuntimeError('fast_info unavailable')
+        return SimpleNamespace(**self._fast_info)
+
+    @property
+    def info(self):
+        self.calls.append('info')
+        if self._info is None:
+            raise RuntimeError('info unavailable')
+        return self._info
+
+
+class TestQuoteTiers(MainTestCase):
+    symbol = 'TIER'
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(main.realtime_data.remove, self.symbol)
+
+    def use_ticker(self, **kwargs):
+        ticker = FakeTicker(**kwargs)
+        self.patch(main.yf, 'Ticker', ticker)
+        return ticker
+
+    def quote(self):
+        return self.client.get(f'/api/quote/{self.symbol}')
+
+    def test_realtime_first(self):
+        ticker = self.use_ticker()
+        main.realtime_data.update(self.symbol, {'price': 10.0, 'change': 1.0, 'short_name': 'Tier'})
+        data = self.quote().get_json()
+        self.assertEqual((data['source'], data['price'], data['previous_close'], data['stale']),
+                         ('realtime', 10.0, 9.0, False))
+        self.assertEqual(ticker.calls, [])
+
+    def test_stale_realtime_skipped_while_market_open(self):
+        self.patch(main.market_calendar, 'is_market_open', lambda now=None: True)
+        self.use_ticker(fast_info={'last_price': 12.0, 'regular_market_previous_close': 10.0, 'last_volume': 5},
+                        info={'shortName': 'Tier'})
+        main.realtime_data.update(self.symbol, {'price': 10.0})
+        main.realtime_data._quotes[self.symbol].updated_at -= main.config.QUOTE_REALTIME_MAX_AGE + 1
+        self.assertEqual(self.quote().get_json()['source'], 'fast_info')
+
+    def test_fast_info_then_cache(self):
+        ticker = self.use_ticker(
+            fast_info={'last_price': 12.0, 'regular_market_previous_close': 10.0, 'last_volume': 5},
+            info={'shortName': 'Tier Inc'})
+        data = self.quote().get_json()
+        self.assertEqual((data['source'], data['cached'], data['name']), ('fast_info', False, 'Tier Inc'))
+        self.assertAlmostEqual(data['change_percent'], 20.0)
+
+        data = self.quote().get_json()
+        self.assertEqual((data['source'], data['cached']), ('fast_info', True))
+        self.assertEqual(ticker.calls, ['fast_info', 'info'])
+
+    def test_info_when_fast_info_fails(self):
+        self.use_ticker(info={'shortName': 'Tier', 'regularMarketPrice': 7.0, 'regularMarketPreviousClose': 6.0})
+        data = self.quote().get_json()
+        self.assertEqual((data['source'], data['price']), ('info', 7.0))
+
+    def test_stale_fallback_from_database(self):
+        self.use_ticker()
+        dates = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=2, name='Date')
+        database.save_daily_data(self.symbol, pd.DataFrame({
+            'Open': 1.0, 'High': 1.0, 'Low': 1.0, 'Close': [8.0, 10.0], 'Volume': 100}, index=dates))
+        data = self.quote().get_json()
+        self.assertEqual((data['source'], data['stale'], data['price'], data['previous_close']),
+                         ('database', True, 10.0, 8.0))
+
+    def test_no_data_anywhere_is_an_error(self):
+        self.use_ticker()
+        self.assertEqual(self.quote().status_code, 500)
+
+
+def columns(close):
+    return {'date': ['2026-10-15', '2026-10-16'], 'close': [close, close * 1.1], 'change_percent': [0.0, 10.0]}
+
+
+class TestCompare(MainTestCase):
+    def setUp(self):
+        super().setUp()
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        self.synced = []
+        self.patch(main.daily_sync, 'is_fresh', lambda symbol, now=None: not symbol.startswith('OLD'))
+        self.patch(main, 'sync_daily_batch', lambda symbols: self.synced.append(list(symbols)) or {})
+        self.patch(main, 'load_daily_columns', self.load)
+        self.patch(main, 'compare_executor', ThreadPoolExecutor(max_workers=2))
+        self.addCleanup(main.compare_executor.shutdown, wait=False)
+
+    def load(self, symbol, period):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if symbol == 'SLOW':
+                self.release.wait(5)
+            else:
+                time.sleep(0.02)
+            return columns(100.0)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def test_partial_results_on_timeout(self):
+        started = time.monotonic()
+        data = self.client.get('/api/compare?symbols=AAA,SLOW,BBB&timeout=0.3').get_json()
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(sorted(data['benchmarks']), ['AAA', 'BBB'])
+        self.assertEqual(data['errors'], {'SLOW': 'timeout'})
+        self.assertAlmostEqual(data['benchmarks']['AAA']['end_price'], 110.0)
+
+    def test_fan_out_is_bounded_by_pool(self):
+        data = self.client.get('/api/compare?symbols=A1,A2,A3,A4,A5,A6').get_json()
+        self.assertEqual(len(data['benchmarks']), 6)
+        self.assertLessEqual(self.max_active, 2)
+
+    def test_stale_symbols_refreshed_in_one_batch(self):
+        data = self.client.get('/api/compare?symbols=OLD1,NEW,OLD2').get_json()
+        self.assertEqual(self.synced, [['OLD1', 'OLD2']])
+        self.assertEqual(data['errors'], {})
+
+    def test_timeout_capped_and_validated(self):
+        for value in ('x', '0', '-1', 'nan', 'inf'):
+            self.assertEqual(self.client.get(f'/api/compare?symbols=AAA&timeout={value}').status_code, 400, value)
+        self.patch(main.config, 'COMPARE_TIMEOUT', 0.2)
+        started = time.monotonic()
+        data = self.client.get('/api/compare?symbols=SLOW&timeout=100').get_json()
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(data['errors'], {'SLOW': 'timeout'})
+
+
+class TestStream(MainTestCase):
+    symbol = 'SSE1'
+
+    def setUp(self):
+        super().setUp()
+        self.retained = []
+        self.released = []
+        self.patch(main, 'retain_subscriptions', self.retained.append)
+        self.patch(main, 'release_subscriptions', self.released.append)
+        self.addCleanup(main.realtime_data.remove, self.symbol)
+
+    def open(self, query=''):
+        response = self.client.get(f'/api/stream?symbols={self.symbol}{query}', buffered=False)
+        self.addCleanup(response.close)
+        return response
+
+    def read_events(self, response, seconds):
+        """读取 seconds 秒内的事件 (依赖心跳返回控制权)"""
+        chunks = []
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            chunks.append(next(response.response).decode())
+        return chunks
+
+    def test_heartbeat_when_idle(self):
+        self.patch(main.config, 'STREAM_HEARTBEAT', 0.05)
+        response = self.open()
+        self.assertTrue(next(response.response).decode().startswith('retry:'))
+        self.assertEqual(next(response.response).decode(), ': heartbeat\n\n')
+
+    def test_rate_limit_conflates_to_latest(self):
+        self.patch(main.config, 'STREAM_HEARTBEAT', 0.05)
+        self.patch(main.config, 'STREAM_MAX_RATE', 4)
+        main.realtime_data.update(self.symbol, {'price': 0.0})
+        response = self.open()
+        stop = threading.Event()
+
+        def publish():
+            price = 0
+            while not stop.is_set():
+                price += 1
+                main.realtime_data.update(self.symbol, {'price': float(price)})
+                main.realtime_bus.publish(self.symbol, {'price': float(price)})
+                time.sleep(0.005)
+
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        try:
+            chunks = self.read_events(response, 0.8)
+        finally:
+            stop.set()
+            publisher.join()
+        quotes = [c for c in chunks if c.startswith('event: quote')]
+        # 快照 + 每 0.25 秒最多一条，中间的 tick 被合并
+        self.assertGreaterEqual(len(quotes), 2)
+        self.assertLessEqual(len(quotes), 5)
+        seqs = [int(c.split('id: ')[1].split('\n')[0]) for c in quotes]
+        self.assertGreater(seqs[-1] - seqs[0], len(quotes))
+
+    def test_client_cap_returns_429(self):
+        self.patch(main.config, 'STREAM_MAX_CLIENTS', 1)
+        first = self.open()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.open().status_code, 429)
+        # 被拒绝的连接不引用符号
+        self.assertEqual(self.retained, [[self.symbol]])
+        first.close()
+        self.assertEqual(self.open().status_code, 200)
+
+    def test_disconnect_releases_subscriptions(self):
+        response = self.open()
+        next(response.response)
+        self.assertEqual(main.realtime_bus.count('sse'), 1)
+        response.close()
+        self.assertEqual(self.released, [[self.symbol]])
+        self.assertEqual(main.realtime_bus.count('sse'), 0)
+
+    def test_indicator_reload_does_not_wait_for_upstream(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        synced = []
+
+        def slow_sync(symbols):
+            synced.append(list(symbols))
+            release.wait(5)
+            return {}
+
+        self.patch(main, 'sync_daily_batch', slow_sync)
+        self.patch(main.config, 'STREAM_HEARTBEAT', 0.05)
+        main.realtime_data.update(self.symbol, {'price': 10.0})
+        started = time.monotonic()
+        response = self.open('&ind=sma:5')
+        chunks = [next(response.response).decode() for _ in range(3)]
+        # 日线刷新在后台进行，加载指标 (没有本地日线，不推送 indicators) 后继续推送
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(chunks[1].startswith('event: quote'))
+        self.assertEqual(chunks[2], ': heartbeat\n\n')
+        deadline = time.monotonic() + 2
+        while not synced and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(synced, [[self.symbol]])
+
+    def test_disconnect_before_first_read_releases_subscriptions(self):
+        self.open().close()
+        self.assertEqual(self.released, [[self.symbol]])
+        self.assertEqual(main.realtime_bus.count('sse'), 0)
+
+
+def daily_frame(dates):
+    return pd.DataFrame({'Open': 1.0, 'High': 1.0, 'Low': 1.0, 'Close': 1.0, 'Volume': 100},
+                        index=pd.DatetimeIndex(pd.to_datetime(dates), name='Date'))
+
+
+class RecordingControl:
+    """中枢 control 代理的替身，记录 worker 发出的调用"""
+
+    def __init__(self):
+        self.calls = []
+
+    def track_daily(self, symbols):
+        self.calls.append(('track_daily', list(symbols)))
+
+    def request_daily_refresh(self, symbols):
+        self.calls.append(('request_daily_refresh', list(symbols)))
+
+
+class TestDailySyncUnderHub(MainTestCase):
+    """多进程部署时 worker 不运行调度器，日线跟踪和刷新请求转交中枢进程"""
+
+    def setUp(self):
+        super().setUp()
+        self.fetched = []
+
+        def fetch(symbols, start=None, period=None):
+            self.fetched.append(list(symbols))
+            return {}
+
+        self.patch(main, 'daily_sync', sync_scheduler.DailySyncScheduler(fetch))
+        self.control = RecordingControl()
+        self.patch(main, 'hub', SimpleNamespace(control=self.control))
+        database.save_daily_data_bulk({'OLD': daily_frame(['2020-01-02'])})
+
+    def test_worker_routes_track_and_refresh_to_hub(self):
+        main.sync_daily_batch(['OLD', 'NEW'])
+
+        # 已有本地数据的符号交给中枢刷新，没有数据的符号在本进程同步拉取
+        self.assertEqual(self.control.calls, [('track_daily', ['OLD', 'NEW']),
+                                              ('request_daily_refresh', ['OLD'])])
+        self.assertEqual(self.fetched, [['NEW']])
+        self.assertEqual(main.daily_sync.stats()['tracked'], 0)
+
+    def test_worker_rereads_latest_date_after_hub_refresh(self):
+        self.assertFalse(main.daily_sync.is_fresh('OLD'))
+        main.sync_daily_batch(['OLD'])
+
+        # 中枢写入最新日线后，worker 不再使用缓存的旧日期
+        target = market_calendar.last_completed_session(settle=main.daily_sync.settle)
+        database.save_daily_data_bulk({'OLD': daily_frame([target.isoformat()])})
+        self.assertTrue(main.daily_sync.is_fresh('OLD'))
+
+    def test_hub_control_uses_hub_scheduler(self):
+        self.patch(main, 'hub', None)
+        control = realtime_hub.HubControl(main)
+        control.track_daily(['OLD'])
+        control.request_daily_refresh(['NEW'])
+        self.assertEqual(main.daily_sync.stats()['tracked'], 2)
+
+
+class TestIntradaySync(MainTestCase):
+    """收盘后 (周五 17:00) 本地已有最后一根 30 分钟 K 线时是否还访问 Yahoo"""
+
+    close_ts = market_calendar.session_close(date(2026, 10, 16)).timestamp()
+
+    def setUp(self):
+        super().setUp()
+        self.fetches = []
+
+        def fetch(symbol, period=None, interval='1d', start=None):
+            self.fetches.append(symbol)
+            return pd.DataFrame()
+
+        now = datetime(2026, 10, 16, 17, 0, tzinfo=market_calendar.MARKET_TZ)
+        self.patch(market_calendar, 'now_market', lambda: now)
+        self.patch(main, 'fetch_ticker_history', fetch)
+        self.patch(main, 'intraday_filled', {})
+
+    def save_last_bar(self, symbol):
+        index = pd.DatetimeIndex([pd.Timestamp(self.close_ts - 1800, unit='s', tz='UTC')])
+        bars = pd.DataFrame({'Open': 1.0, 'High': 1.0, 'Low': 1.0, 'Close': 1.0, 'Volume': 100}, index=index)
+        database.save_intraday_bars(symbol, '30m', bars)
+
+    def test_bar_fetched_before_close_is_refetched(self):
+        self.save_last_bar('QQQ')
+        # 最后一根 K 线是盘中拉取的 (当时尚未完成)
+        main.intraday_filled[('QQQ', '30m')] = self.close_ts - 60
+        main._sync_intraday_bars('QQQ', '30m')
+        self.assertEqual(self.fetches, ['QQQ'])
+
+        # 收盘后拉取过一次，之后不再访问网络
+        main._sync_intraday_bars('QQQ', '30m')
+        self.assertEqual(self.fetches, ['QQQ'])
+
+    def test_round_the_clock_symbol_ignores_session_close(self):
+        self.save_last_bar('BTC-USD')
+        main.intraday_filled[('BTC-USD', '30m')] = self.close_ts + 60
+        main._sync_intraday_bars('BTC-USD', '30m')
+        self.assertEqual(self.fetches, ['BTC-USD'])
+
+
+class TestDailyDownload(MainTestCase):
+    def test_empty_download_opens_circuit(self):
+        gateway = upstream.UpstreamGateway(rate=1000, burst=1000, max_concurrency=8, failure_threshold=2)
+        self.patch(main, 'upstream_gateway', gateway)
+        # yf.download 遇到 429 等错误时只记录日志，返回空结果
+        self.patch(main.yf, 'download', lambda *args, **kwargs: pd.DataFrame())
+
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                main.download_daily_batch(['QQQ', 'SPY'], period='max')
+        self.assertEqual(gateway.breaker.state, 'open')
+        with self.assertRaises(upstream.UpstreamUnavailable):
+            main.download_daily_batch(['QQQ'], period='max')
+
+    def test_partial_download_returns_frames(self):
+        data = pd.concat({'QQQ': daily_frame(['2026-10-15'])}, axis=1)
+        self.patch(main.yf, 'download', lambda *args, **kwargs: data)
+        frames = main.download_daily_batch(['QQQ', 'NONE'], period='max')
+        self.assertEqual(list(frames), ['QQQ'])
+        self.assertEqual(main.upstream_gateway.failures, 0)
+
+
+class TestRealtimePolling(MainTestCase):
+    symbol = 'POLL'
+
+    def setUp(self):
+        super().setUp()
+        self.now = [0.0]
+        self.patch(main, 'subscription_registry',
+                   subscriptions.SubscriptionRegistry(idle_ttl=60, max_symbols=100, clock=lambda: self.now[0]))
+        self.addCleanup(main.drop_subscriptions, [self.symbol], 'test')
+
+    def test_polling_keeps_subscription_alive(self):
+        self.assertEqual(self.client.get(f'/api/realtime/{self.symbol}').get_json()['status'], 'subscribed')
+        self.now[0] = 50
+        self.assertEqual(self.client.get(f'/api/realtime/{self.symbol}').get_json()['status'], 'waiting')
+        self.now[0] = 100
+        self.assertEqual(self.client.get(f'/api/realtime?symbols={self.symbol}').get_json()['newly_subscribed'], [])
+        # 距首次订阅已超过空闲时间，但一直在被轮询
+        self.now[0] = 150
+        self.assertEqual(main.subscription_registry.expire(), [])
+        self.now[0] = 161
+        self.assertEqual(main.subscription_registry.expire(), [self.symbol])
+
+
+class TestTicks(MainTestCase):
+    def setUp(self):
+        super().setUp()
+        self.patch(tick_recorder, 'TICK_LOG_DIR', self.tmpdir.name)
+
+    def test_limit_is_at_least_one(self):
+        data = self.client.get('/api/ticks/QQQ?limit=-5').get_json()
+        self.assertEqual((data['count'], data['truncated']), (0, False))
+
+    def test_invalid_times_are_rejected(self):
+        for query in ('from=inf', 'to=-inf', 'from=nan', 'from=abc', 'limit=x'):
+            self.assertEqual(self.client.get(f'/api/ticks/QQQ?{query}').status_code, 400, query)
+
+
+if __name__ == '__main__':
+    unittest.main()
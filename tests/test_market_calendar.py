@@ -0,0 +1,64 @@
+import unittest
+import os
+import sys
+from datetime import date, datetime
+
+# Add parent directory to path to import market_calendar
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import market_calendar as mc
+
+
+def ny(*args):
+    return datetime(*args, tzinfo=mc.MARKET_TZ)
+
+
+class TestMarketCalendar(unittest.TestCase):
+    def test_holidays_2026(self):
+        h = mc.holidays(2026)
+        self.assertIn(date(2026, 4, 3), h)    # 耶稣受难日
+        self.assertIn(date(2026, 7, 3), h)    # 独立日 (周六) 提前到周五
+        self.assertIn(date(2026, 11, 26), h)  # 感恩节
+        self.assertNotIn(date(2026, 10, 16), h)
+
+    def test_new_year_on_saturday_not_observed_on_friday(self):
+        # 2022-01-01 是周六，2021-12-31 照常交易
+        self.assertTrue(mc.is_trading_day(date(2021, 12, 31)))
+
+    def test_early_close(self):
+        self.assertEqual(mc.session_close(date(2026, 11, 27)).hour, 13)
+        self.assertEqual(mc.session_close(date(2026, 10, 16)).hour, 16)
+
+    def test_last_completed_session_on_weekend(self):
+        # 周六返回周五
+        self.assertEqual(mc.last_completed_session(ny(2026, 10, 17, 12, 0)), date(2026, 10, 16))
+
+    def test_last_completed_session_during_trading(self):
+        # 盘中当天的日线尚未完成
+        self.assertEqual(mc.last_completed_session(ny(2026, 10, 16, 12, 0)), date(2026, 10, 15))
+        self.assertEqual(mc.last_completed_session(ny(2026, 10, 16, 16, 30)), date(2026, 10, 16))
+
+    def test_next_bar_available_skips_weekend_and_holiday(self):
+        self.assertEqual(mc.next_bar_available(ny(2026, 10, 17, 12, 0)), ny(2026, 10, 19, 16, 0))
+        # 耶稣受难日前一天收盘后，下一根日线在下周一
+        self.assertEqual(mc.next_bar_available(ny(2026, 4, 2, 17, 0)), ny(2026, 4, 6, 16, 0))
+
+    def test_current_session(self):
+        self.assertEqual(mc.current_session(ny(2026, 10, 16, 9, 0)), date(2026, 10, 15))
+        self.assertEqual(mc.current_session(ny(2026, 10, 16, 9, 30)), date(2026, 10, 16))
+        self.assertEqual(mc.current_session(ny(2026, 10, 18, 12, 0)), date(2026, 10, 16))
+
+    def test_is_market_open(self):
+        self.assertTrue(mc.is_market_open(ny(2026, 10, 16, 10, 0)))
+        self.assertFalse(mc.is_market_open(ny(2026, 10, 16, 9, 0)))
+        self.assertFalse(mc.is_market_open(ny(2026, 10, 17, 10, 0)))
+
+    def test_follows_session(self):
+        for symbol in ('QQQ', 'brk-b', 'BF-B'):
+            self.assertTrue(mc.follows_session(symbol), symbol)
+        for symbol in ('BTC-USD', 'EURUSD=X', 'ES=F', '^GSPC', '7203.T'):
+            self.assertFalse(mc.follows_session(symbol), symbol)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import os
+import sys
+
+# Add parent directory to path to import metrics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.Registry()
+
+    def render(self, labels=None):
+        return metrics.render((self.registry.collect(), labels)).splitlines()
+
+    def test_histogram_buckets_are_cumulative(self):
+        h = metrics.Histogram('req_seconds', 'latency', ('route',), buckets=(0.1, 1), registry=self.registry)
+        for value in (0.05, 0.5, 0.5, 5):
+            h.labels('/a').observe(value)
+        lines = self.render()
+        self.assertIn('# TYPE req_seconds histogram', lines)
+        self.assertIn('req_seconds_bucket{route="/a",le="0.1"} 1', lines)
+        self.assertIn('req_seconds_bucket{route="/a",le="1"} 3', lines)
+        self.assertIn('req_seconds_bucket{route="/a",le="+Inf"} 4', lines)
+        self.assertIn('req_seconds_sum{route="/a"} 6.05', lines)
+        self.assertIn('req_seconds_count{route="/a"} 4', lines)
+
+    def test_counter_labels_and_escaping(self):
+        c = metrics.Counter('ticks', 'ticks', ('symbol',), registry=self.registry)
+        c.labels('QQQ').inc()
+        c.labels('QQQ').inc(2)
+        c.labels('a"b').inc()
+        lines = self.render()
+        self.assertIn('# TYPE ticks_total counter', lines)
+        self.assertIn('ticks_total{symbol="QQQ"} 3', lines)
+        self.assertIn('ticks_total{symbol="a\\"b"} 1', lines)
+        c.remove('QQQ')
+        self.assertNotIn('ticks_total{symbol="QQQ"} 3', self.render())
+        with self.assertRaises(ValueError):
+            c.labels()
+
+    def test_timed_counts_errors(self):
+        h = metrics.Histogram('call_seconds', 'calls', ('call',), registry=self.registry)
+        errors = metrics.Counter('call_errors', 'errors', ('call',), registry=self.registry)
+        with self.assertRaises(RuntimeError):
+            with metrics.timed(h, 'history', errors=errors):
+                raise RuntimeError('boom')
+        self.assertEqual(h.labels('history').count, 1)
+        self.assertEqual(errors.labels('history').value, 1)
+
+    def test_merges_sources_with_process_labels(self):
+        self.registry.register_collector(
+            lambda: [metrics.family('cache_entries', 'gauge', 'entries', [({'cache': 'data'}, 3)])])
+        text = metrics.render((self.registry.collect(), {'process': '1'}),
+                              (self.registry.collect(), {'process': 'hub'}))
+        self.assertEqual(text.count('# TYPE cache_entries gauge'), 1)
+        self.assertIn('cache_entries{process="1",cache="data"} 3', text)
+        self.assertIn('cache_entries{process="hub",cache="data"} 3', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
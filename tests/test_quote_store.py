@@ -0,0 +1,57 @@
+import unittest
+import os
+import sys
+
+# Add parent directory to path to import quote_store
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quote_store
+
+
+class TestQuoteStore(unittest.TestCase):
+    def test_update_in_place_and_seq(self):
+        store = quote_store.QuoteStore()
+        store.update('QQQ', {'id': 'QQQ', 'price': 500.0, 'dayVolume': 10})
+        store.update('QQQ', {'id': 'QQQ', 'price': 501.0, 'dayVolume': 12})
+
+        data = store.get('QQQ')
+        self.assertEqual(data['price'], 501.0)
+        self.assertEqual(data['volume'], 12)
+        self.assertEqual(data['seq'], 2)
+        self.assertNotIn('raw', data)
+        self.assertEqual(store.get('QQQ', include_raw=True)['raw']['price'], 501.0)
+        self.assertEqual(len(store), 1)
+
+    def test_protobuf_field_names(self):
+        store = quote_store.QuoteStore()
+        store.update('QQQ', {'id': 'QQQ', 'price': 500.0, 'change_percent': 0.5,
+                             'day_volume': '100', 'short_name': 'Invesco QQQ'})
+        data = store.get('QQQ')
+        self.assertEqual(data['change_percent'], 0.5)
+        self.assertEqual(data['volume'], '100')
+        self.assertEqual(data['name'], 'Invesco QQQ')
+
+    def test_quote_has_no_instance_dict(self):
+        quote = quote_store.Quote('QQQ')
+        self.assertFalse(hasattr(quote, '__dict__'))
+
+    def test_changed_since(self):
+        store = quote_store.QuoteStore()
+        store.update('QQQ', {'price': 1.0})
+        store.update('SPY', {'price': 2.0})
+        seqs = {'QQQ': store.seq('QQQ'), 'SPY': store.seq('SPY')}
+        store.update('SPY', {'price': 3.0})
+
+        changed = store.changed_since(seqs)
+        self.assertEqual(list(changed), ['SPY'])
+        self.assertEqual(changed['SPY']['price'], 3.0)
+
+    def test_missing_symbol(self):
+        store = quote_store.QuoteStore()
+        self.assertIsNone(store.get('NOPE'))
+        self.assertIsNone(store.get_raw('NOPE'))
+        self.assertEqual(store.snapshot(['NOPE']), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
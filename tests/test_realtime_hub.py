@@ -0,0 +1,60 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+
+# Add parent directory to path to import realtime_hub
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quote_store
+import realtime_hub
+import tick_bus
+
+
+class TestPollingSubscription(unittest.TestCase):
+    def test_drain_returns_changed_symbols(self):
+        store = quote_store.QuoteStore()
+        bus = tick_bus.TickBus()
+        sub = realtime_hub.PollingSubscription(bus, 'sse', store, ['QQQ', 'SPY'], poll_interval=0.01)
+        self.assertEqual(bus.count('sse'), 1)
+
+        store.update('QQQ', {'price': 1.0})
+        store.update('AAPL', {'price': 2.0})
+        self.assertEqual([s for s, _ in sub.drain(timeout=0.1)], ['QQQ'])
+        # 没有新数据时等待到超时
+        self.assertEqual(sub.drain(timeout=0.05), [])
+
+        store.update('QQQ', {'price': 3.0})
+        self.assertEqual(sub.drain(timeout=0.1)[0][1]['price'], 3.0)
+
+        sub.close()
+        self.assertEqual(bus.count('sse'), 0)
+        self.assertEqual(sub.drain(timeout=1), [])
+
+
+class TestHubManager(unittest.TestCase):
+    def test_quotes_shared_over_unix_socket(self):
+        store = quote_store.QuoteStore()
+        store.update('QQQ', {'price': 500.0})
+        address = os.path.join(tempfile.mkdtemp(), 'hub.sock')
+        authkey = b'test'
+
+        class ServerManager(realtime_hub.HubManager):
+            pass
+
+        ServerManager.register('quotes', callable=lambda: store, exposed=realtime_hub.QUOTE_METHODS)
+        ServerManager.register('bars', callable=lambda: None, exposed=realtime_hub.BAR_METHODS)
+        ServerManager.register('control', callable=lambda: None, exposed=realtime_hub.CONTROL_METHODS)
+        server = ServerManager(address=address, authkey=authkey).get_server()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        hub = realtime_hub.Hub(address, authkey)
+        self.assertEqual(hub.quotes.get('QQQ')['price'], 500.0)
+        self.assertIn('QQQ', hub.quotes)
+        self.assertEqual(len(hub.quotes), 1)
+        self.assertEqual(list(hub.quotes.changed_since({'QQQ': 1})), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path to import serialize
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serialize
+
+
+def legacy_records(df, intraday=False):
+    """旧实现：逐行 iterrows 构造 dict"""
+    data = []
+    base_close = df['Close'].iloc[0]
+    for date, row in df.iterrows():
+        data.append({
+            'date': date.strftime('%Y-%m-%d %H:%M' if intraday else '%Y-%m-%d'),
+            'open': round(row['Open'], 2),
+            'high': round(row['High'], 2),
+            'low': round(row['Low'], 2),
+            'close': round(row['Close'], 2),
+            'volume': int(row['Volume']),
+            'change_percent': ((row['Close'] - base_close) / base_close) * 100
+        })
+    return data
+
+
+class TestSerialize(unittest.TestCase):
+    def setUp(self):
+        self.daily = pd.DataFrame({
+            'Open': [100.123, 101.456], 'High': [102.0, 103.333],
+            'Low': [99.0, 100.0], 'Close': [101.111, 102.777], 'Volume': [1000, 2000],
+        }, index=pd.DatetimeIndex(['2023-01-02', '2023-01-03'], name='Date'))
+
+    def test_daily_matches_legacy(self):
+        records = serialize.columns_to_records(serialize.history_columns(self.daily))
+        expected = legacy_records(self.daily)
+        self.assertEqual([r['date'] for r in records], [r['date'] for r in expected])
+        for got, want in zip(records, expected):
+            for key in ('open', 'high', 'low', 'close', 'volume'):
+                self.assertEqual(got[key], want[key])
+            self.assertAlmostEqual(got['change_percent'], want['change_percent'])
+
+    def test_by_symbol_matches_single(self):
+        other = self.daily * 3
+        multi = pd.concat([
+            self.daily.assign(Symbol='AAA').reset_index(),
+            other.assign(Symbol='BBB').reset_index(),
+        ], ignore_index=True)
+        columns = serialize.history_columns_by_symbol(multi)
+        self.assertEqual(list(columns), ['AAA', 'BBB'])
+        self.assertEqual(columns['AAA'], serialize.history_columns(self.daily))
+        self.assertEqual(columns['BBB'], serialize.history_columns(other))
+
+    def test_intraday_keeps_exchange_local_time(self):
+        index = pd.DatetimeIndex(['2026-01-29 09:30', '2026-01-29 09:35']).tz_localize('America/New_York')
+        df = self.daily.set_axis(index)
+        columns = serialize.history_columns(df, intraday=True)
+        self.assertEqual(columns['date'], ['2026-01-29 09:30', '2026-01-29 09:35'])
+        self.assertEqual(columns['date'], [r['date'] for r in legacy_records(df, intraday=True)])
+
+    def test_intraday_timestamps_match_isoformat(self):
+        # 跨越夏令时切换
+        index = pd.DatetimeIndex(['2026-03-06 15:55', '2026-03-09 09:30']).tz_localize('America/New_York')
+        df = self.daily.set_axis(index)
+        columns = serialize.intraday_columns(df)
+        self.assertEqual(columns['timestamp'], [t.isoformat() for t in index])
+        self.assertEqual(columns['volume'], [1000, 2000])
+
+    def test_missing_volume_becomes_zero(self):
+        df = self.daily.astype(float)
+        df.loc[df.index[1], 'Volume'] = np.nan
+        self.assertEqual(serialize.history_columns(df)['volume'], [1000, 0])
+
+    def test_dumps_roundtrip(self):
+        columns = serialize.history_columns(self.daily)
+        payload = {'symbol': 'QQQ', 'data': columns, 'n': np.int64(2)}
+        self.assertEqual(json.loads(serialize.dumps(payload))['data']['close'], [101.11, 102.78])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path to import singleflight
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import singleflight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flight = singleflight.SingleFlight()
+        calls = []
+        start = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'data'
+
+        results = []
+
+        def worker():
+            start.wait()
+            results.append(flight.do(('history', 'QQQ'), fetch))
+
+        threads = [threading.Thread(target=worker) for _ in range(20)]
+        for t in threads:
+            t.start()
+        start.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['data'] * 20)
+        self.assertEqual(flight.stats()['shared'], 19)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_error_is_shared_and_key_released(self):
+        flight = singleflight.SingleFlight()
+
+        def fail():
+            raise ValueError('upstream down')
+
+        with self.assertRaises(ValueError):
+            flight.do('k', fail)
+        # 失败后 key 被释放，下一次调用会重新执行
+        self.assertEqual(flight.do('k', lambda: 1), 1)
+
+    def test_background_submit_once_and_shared_with_do(self):
+        flight = singleflight.SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def refresh():
+            calls.append(1)
+            release.wait()
+            return 'fresh'
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.assertTrue(flight.submit(executor, 'k', refresh))
+            self.assertFalse(flight.submit(executor, 'k', refresh))
+            # 后台刷新进行中，同步调用等待同一个结果
+            waiter = executor.submit(flight.do, 'k', lambda: 'other')
+            release.set()
+            self.assertEqual(waiter.result(timeout=2), 'fresh')
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.stats()['background'], 1)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_different_keys_run_independently(self):
+        flight = singleflight.SingleFlight()
+        self.assertEqual(flight.do('a', lambda: 1), 1)
+        self.assertEqual(flight.do('b', lambda: 2), 2)
+        self.assertEqual(flight.stats()['executed'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import os
+import sys
+
+# Add parent directory to path to import subscriptions
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import subscriptions
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSubscriptionRegistry(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.registry = subscriptions.SubscriptionRegistry(
+            idle_ttl=100, max_symbols=3, pinned=['QQQ'], clock=self.clock)
+
+    def test_idle_symbols_expire_except_pinned(self):
+        self.assertEqual(self.registry.touch(['QQQ', 'AAPL']), (['QQQ', 'AAPL'], []))
+        self.clock.now = 50
+        self.registry.touch(['MSFT'])
+        self.clock.now = 120
+        self.assertEqual(self.registry.expire(), ['AAPL'])
+        self.assertEqual(self.registry.symbols(), ['QQQ', 'MSFT'])
+        self.assertEqual(self.registry.stats()['expired'], 1)
+
+    def test_stream_references_block_expiry(self):
+        self.registry.acquire(['AAPL'])
+        self.clock.now = 500
+        self.assertEqual(self.registry.expire(), [])
+        self.registry.release(['AAPL'])
+        # 空闲时间从连接结束开始计算
+        self.clock.now = 550
+        self.assertEqual(self.registry.expire(), [])
+        self.clock.now = 601
+        self.assertEqual(self.registry.expire(), ['AAPL'])
+
+    def test_lru_eviction_at_cap(self):
+        self.registry.touch(['QQQ', 'AAPL', 'MSFT'])
+        self.clock.now = 1
+        self.registry.touch(['AAPL'])
+        self.assertEqual(self.registry.touch(['NVDA']), (['NVDA'], ['MSFT']))
+        self.assertEqual(self.registry.stats()['evicted'], 1)
+
+    def test_rejects_new_symbol_when_nothing_evictable(self):
+        self.registry.acquire(['AAPL', 'MSFT'])
+        self.registry.touch(['QQQ'])
+        self.assertEqual(self.registry.touch(['NVDA']), ([], []))
+        self.assertNotIn('NVDA', self.registry)
+        self.assertEqual(self.registry.stats()['rejected'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import os
+import sys
+import pandas as pd
+from datetime import datetime
+
+# Add parent directory to path to import sync_scheduler
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import market_calendar
+import sync_scheduler
+
+
+def make_frame(dates):
+    df = pd.DataFrame({
+        'Open': [100.0] * len(dates),
+        'High': [101.0] * len(dates),
+        'Low': [99.0] * len(dates),
+        'Close': [100.5] * len(dates),
+        'Volume': [1000] * len(dates),
+    }, index=pd.DatetimeIndex(pd.to_datetime(dates), name='Date'))
+    return df
+
+
+class TestDailySyncScheduler(unittest.TestCase):
+    def setUp(self):
+        database.DB_FILE = 'test_market.db'
+        database.init_db()
+        self.calls = []
+
+        def fetch(symbols, start=None, period=None):
+            self.calls.append((tuple(symbols), start, period))
+            # 包含一根盘中未完成的日线 (10-16)
+            return {s: make_frame(['2026-10-14', '2026-10-15', '2026-10-16']) for s in symbols}
+
+        self.scheduler = sync_scheduler.DailySyncScheduler(fetch, settle_minutes=20)
+        self.now = datetime(2026, 10, 16, 12, 0, tzinfo=market_calendar.MARKET_TZ)
+
+    def tearDown(self):
+        database.close_db_connections()
+        for path in ('test_market.db', 'test_market.db-wal', 'test_market.db-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_unknown_symbol_is_stale(self):
+        self.assertFalse(self.scheduler.is_fresh('QQQ', self.now))
+
+    def test_refresh_skips_unfinished_bar(self):
+        counts = self.scheduler.refresh(['QQQ', 'SPY'], self.now)
+
+        self.assertEqual(counts, {'QQQ': 2, 'SPY': 2})
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.calls[0][2], 'max')
+        self.assertEqual(database.get_latest_date('QQQ'), '2026-10-15')
+        self.assertTrue(self.scheduler.is_fresh('QQQ', self.now))
+
+    def test_fresh_symbol_needs_no_network(self):
+        self.scheduler.refresh(['QQQ'], self.now)
+        self.scheduler.track('QQQ')
+        # 周末没有新的日线
+        weekend = datetime(2026, 10, 17, 12, 0, tzinfo=market_calendar.MARKET_TZ)
+        self.assertEqual(self.scheduler.stale_symbols(self.now), [])
+        # 周五收盘后需要拉取 10-16 的日线
+        self.assertEqual(self.scheduler.stale_symbols(weekend), ['QQQ'])
+
+        self.scheduler.refresh(['QQQ'], weekend)
+        self.assertEqual(self.calls[-1][1], '2026-10-15')
+        self.assertEqual(self.scheduler.stale_symbols(weekend), [])
+
+    def test_incremental_batches_grouped_by_latest_date(self):
+        database.save_daily_data('OLD', make_frame(['2026-09-01']))
+        database.save_daily_data('NEW1', make_frame(['2026-10-14']))
+        database.save_daily_data('NEW2', make_frame(['2026-10-14']))
+        self.scheduler.refresh(['NEW1', 'NEW2', 'OLD'], self.now)
+        self.assertEqual(self.calls, [(('OLD',), '2026-09-01', None), (('NEW1', 'NEW2'), '2026-10-14', None)])
+
+    def test_on_saved_receives_symbols_with_new_rows(self):
+        saved = []
+        self.scheduler._on_saved = saved.append
+        self.scheduler.refresh(['QQQ'], self.now)
+        self.assertEqual(saved, [['QQQ']])
+
+    def test_failed_download_is_not_marked_checked(self):
+        database.save_daily_data('QQQ', make_frame(['2026-10-12']))
+        self.scheduler._fetch_batch = lambda symbols, start=None, period=None: {}
+        after_close = datetime(2026, 10, 14, 17, 0, tzinfo=market_calendar.MARKET_TZ)
+        self.scheduler.refresh(['QQQ'], after_close)
+        # yf.download 失败时返回空结果，下次仍需重试
+        self.assertFalse(self.scheduler.is_fresh('QQQ', after_close))
+        self.assertFalse(self.scheduler.is_fresh('QQQ', datetime(2026, 10, 15, 12, 0, tzinfo=market_calendar.MARKET_TZ)))
+
+    def test_symbol_without_new_bars_is_checked(self):
+        # 停牌等情况：Yahoo 只返回本地已有的日线，同步后视为最新
+        database.save_daily_data('HALT', make_frame(['2026-10-12']))
+        self.scheduler._fetch_batch = lambda symbols, start=None, period=None: {
+            s: make_frame(['2026-10-12']) for s in symbols}
+        after_close = datetime(2026, 10, 14, 17, 0, tzinfo=market_calendar.MARKET_TZ)
+        self.scheduler.refresh(['HALT'], after_close)
+        self.assertTrue(self.scheduler.is_fresh('HALT', after_close))
+
+    def test_failed_group_does_not_drop_other_groups(self):
+        database.save_daily_data('OLD', make_frame(['2026-09-01']))
+        database.save_daily_data('NEW', make_frame(['2026-10-14']))
+
+        def fetch(symbols, start=None, period=None):
+            if 'OLD' in symbols:
+                raise RuntimeError('yf.download returned no data')
+            return {s: make_frame(['2026-10-14', '2026-10-15']) for s in symbols}
+
+        self.scheduler._fetch_batch = fetch
+        counts = self.scheduler.refresh(['OLD', 'NEW'], self.now)
+        self.assertEqual(counts, {'OLD': 0, 'NEW': 2})
+        self.assertEqual(self.scheduler.errors, 1)
+        self.assertFalse(self.scheduler.is_fresh('OLD', self.now))
+        self.assertTrue(self.scheduler.is_fresh('NEW', self.now))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import os
+import sys
+import threading
+
+# Add parent directory to path to import tick_bus
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tick_bus
+
+
+class TestTickBus(unittest.TestCase):
+    def test_fan_out_to_all_subscribers(self):
+        bus = tick_bus.TickBus()
+        a = bus.subscribe('a')
+        b = bus.subscribe('b')
+        bus.publish('QQQ', {'price': 1})
+
+        self.assertEqual(a.get(timeout=0), ('QQQ', {'price': 1}))
+        self.assertEqual(b.get(timeout=0), ('QQQ', {'price': 1}))
+        self.assertIsNone(a.get(timeout=0))
+
+    def test_drop_oldest_is_bounded(self):
+        bus = tick_bus.TickBus()
+        sub = bus.subscribe('slow', maxlen=3)
+        for i in range(10):
+            bus.publish('QQQ', i)
+
+        self.assertEqual([t for _, t in sub.drain(timeout=0)], [7, 8, 9])
+        self.assertEqual(sub.dropped, 7)
+
+    def test_conflate_keeps_latest_per_symbol(self):
+        bus = tick_bus.TickBus()
+        sub = bus.subscribe('sse', maxlen=100, policy=tick_bus.CONFLATE)
+        bus.publish('QQQ', 1)
+        bus.publish('SPY', 2)
+        bus.publish('QQQ', 3)
+
+        self.assertEqual(sub.drain(timeout=0), [('SPY', 2), ('QQQ', 3)])
+        self.assertEqual(sub.conflated, 1)
+
+    def test_symbol_filter(self):
+        bus = tick_bus.TickBus()
+        sub = bus.subscribe('aapl', symbols=['AAPL'])
+        bus.publish('QQQ', 1)
+        bus.publish('AAPL', 2)
+        self.assertEqual(sub.drain(timeout=0), [('AAPL', 2)])
+
+    def test_close_unsubscribes_and_wakes_consumer(self):
+        bus = tick_bus.TickBus()
+        sub = bus.subscribe('a')
+        results = []
+        t = threading.Thread(target=lambda: results.append(sub.get(timeout=5)))
+        t.start()
+        sub.close()
+        t.join(timeout=1)
+
+        self.assertEqual(results, [None])
+        self.assertEqual(len(bus), 0)
+        bus.publish('QQQ', 1)
+        self.assertEqual(sub.pending, 0)
+
+    def test_limit_is_checked_atomically(self):
+        bus = tick_bus.TickBus()
+        bus.subscribe('other')
+        results = []
+
+        def connect():
+            try:
+                results.append(bus.subscribe('sse', limit=3))
+            except tick_bus.BusFull:
+                results.append(None)
+
+        threads = [threading.Thread(target=connect) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(bus.count('sse'), 3)
+        self.assertEqual(sum(1 for r in results if r is not None), 3)
+
+        # 断开后空出名额
+        next(r for r in results if r is not None).close()
+        bus.subscribe('sse', limit=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import os
+import sys
+import tempfile
+import time
+
+# Add parent directory to path to import tick_recorder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tick_bus
+import tick_recorder
+
+
+def tick(symbol, ms, price=1.0):
+    return {'id': symbol, 'price': price, 'time': str(ms)}
+
+
+class TestTickRecorder(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.recorder = tick_recorder.TickRecorder(self.dir, segment_seconds=60)
+
+    def read(self, symbol, start, end, limit=None):
+        return tick_recorder.read_ticks(self.dir, symbol, start, end, limit)
+
+    def test_range_read_across_segments(self):
+        base = 1_792_000_000_000
+        self.recorder.write_block([tick('QQQ', base), tick('SPY', base + 10), tick('QQQ', base + 20)])
+        self.recorder.write_block([tick('QQQ', base + 30_000)])
+        # 超过段时长，新开一段
+        self.recorder.write_block([tick('QQQ', base + 61_000), tick('QQQ', base + 62_000)])
+        self.assertEqual(len(tick_recorder.list_segments(self.dir)), 2)
+
+        ticks, truncated = self.read('QQQ', base + 10, base + 61_000)
+        self.assertEqual([int(t['time']) for t in ticks], [base + 20, base + 30_000, base + 61_000])
+        self.assertFalse(truncated)
+        self.assertEqual([t['id'] for t in self.read('SPY', base, base + 100_000)[0]], ['SPY'])
+
+        ticks, truncated = self.read('QQQ', base, base + 100_000, limit=2)
+        self.assertEqual(len(ticks), 2)
+        self.assertTrue(truncated)
+        self.assertGreater(self.recorder.stats()['compression_ratio'], 0)
+
+    def test_limit_stops_after_earliest_blocks(self):
+        base = 1_792_000_000_000
+        for i in range(50):
+            self.recorder.write_block([tick('QQQ', base + i * 1000 + j) for j in range(10)])
+        # 迟到的 tick 写在后面的块中，但时间更早
+        self.recorder.write_block([tick('QQQ', base - 5)])
+
+        decompressed = []
+        original = tick_recorder.zlib.decompress
+
+        def decompress(data):
+            decompressed.append(len(data))
+            return original(data)
+
+        tick_recorder.zlib.decompress = decompress
+        try:
+            ticks, truncated = self.read('QQQ', base - 10, base + 100_000, limit=12)
+        finally:
+            tick_recorder.zlib.decompress = original
+        self.assertTrue(truncated)
+        self.assertEqual([int(t['time']) for t in ticks],
+                         [base - 5] + [base + j for j in range(10)] + [base + 1000])
+        # 只解压了时间最早的几个块
+        self.assertEqual(len(decompressed), 3)
+
+        ticks, truncated = self.read('QQQ', base - 10, base + 100_000, limit=501)
+        self.assertEqual((len(ticks), truncated), (501, False))
+
+    def test_partial_index_entry_is_ignored(self):
+        base = 1_792_000_000_000
+        self.recorder.write_block([tick('QQQ', base)])
+        self.recorder._close_segment()
+        _, path = tick_recorder.list_segments(self.dir)[0]
+        with open(path[:-4] + '.idx', 'ab') as f:
+            f.write(b'\x01\x02\x03')
+        self.assertEqual(len(self.read('QQQ', base, base)[0]), 1)
+
+    def test_retention_removes_old_segments(self):
+        recorder = tick_recorder.TickRecorder(self.dir, segment_seconds=60, retention_days=1)
+        day = 86400 * 1000
+        base = 1_792_000_000_000
+        for offset in (0, 60_000, 2 * day):
+            recorder.write_block([tick('QQQ', base + offset)])
+        starts = [start for start, _ in tick_recorder.list_segments(self.dir)]
+        self.assertEqual(starts, [base + 60_000, base + 2 * day])
+        self.assertEqual(recorder.segments_removed, 1)
+
+    def test_background_writer_batches_bus_ticks(self):
+        bus = tick_bus.TickBus()
+        recorder = tick_recorder.TickRecorder(self.dir, flush_interval=0.05)
+        recorder.start(bus.subscribe('tick_recorder', maxlen=100))
+        now = int(time.time() * 1000)
+        for i in range(5):
+            bus.publish('QQQ', tick('QQQ', now + i, price=100 + i))
+
+        deadline = time.monotonic() + 2
+        while recorder.ticks < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(recorder.blocks, 1)
+        ticks, _ = self.read('QQQ', now, now + 10)
+        self.assertEqual([t['price'] for t in ticks], [100, 101, 102, 103, 104])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+import os
+import sys
+import threading
+
+# Add parent directory to path to import upstream
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import upstream
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail():
+    raise ConnectionError('429 Too Many Requests')
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_refill(self):
+        clock = FakeClock()
+        bucket = upstream.TokenBucket(rate=2, burst=3, clock=clock)
+        self.assertEqual([bucket.try_acquire() for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(bucket.try_acquire(), 0.5)
+        clock.now = 0.5
+        self.assertEqual(bucket.try_acquire(), 0)
+        # 长时间空闲后最多攒到 burst 个
+        clock.now = 100
+        self.assertAlmostEqual(bucket.available(), 3)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = upstream.CircuitBreaker(failure_threshold=3, failure_ratio=0.5, window=10,
+                                               open_seconds=5, clock=self.clock)
+
+    def test_opens_on_error_burst_only(self):
+        # 成功居多时零星失败不会熔断
+        for _ in range(6):
+            self.breaker.record_success()
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'closed')
+
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_after(), 5)
+
+    def test_half_open_allows_single_probe(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 5
+        self.assertEqual(self.breaker.state, 'half_open')
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        # 探测失败重新打开
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'open')
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertEqual(self.breaker.opened, 2)
+
+
+class TestUpstreamGateway(unittest.TestCase):
+    def test_open_circuit_fails_fast(self):
+        clock = FakeClock()
+        gateway = upstream.UpstreamGateway(rate=100, burst=100, max_concurrency=2, failure_threshold=2,
+                                           open_seconds=30, clock=clock)
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                gateway.call('history', fail)
+
+        calls = []
+        with self.assertRaises(upstream.UpstreamUnavailable) as ctx:
+            gateway.call('history', calls.append, 1)
+        self.assertEqual(calls, [])
+        self.assertEqual(ctx.exception.reason, 'circuit_open')
+        self.assertEqual(ctx.exception.retry_after, 30)
+
+        stats = gateway.stats()
+        self.assertEqual((stats['circuit'], stats['failures'], stats['calls']), ('open', 2, {'history': 2}))
+        self.assertEqual(stats['rejected']['circuit_open'], 1)
+
+        clock.now = 30
+        self.assertEqual(gateway.call('history', lambda: 'ok'), 'ok')
+        self.assertEqual(gateway.stats()['circuit'], 'closed')
+
+    def test_rate_limit_and_concurrency_cap(self):
+        gateway = upstream.UpstreamGateway(rate=0.01, burst=1, max_concurrency=1, max_wait=0.05)
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait()
+
+        worker = threading.Thread(target=gateway.call, args=('history', slow))
+        worker.start()
+        started.wait()
+        with self.assertRaises(upstream.UpstreamUnavailable) as ctx:
+            gateway.call('history', lambda: None)
+        self.assertEqual(ctx.exception.reason, 'concurrency')
+        release.set()
+        worker.join()
+
+        # 令牌已用完，等待上限内补充不了
+        with self.assertRaises(upstream.UpstreamUnavailable) as ctx:
+            gateway.call('history', lambda: None)
+        self.assertEqual(ctx.exception.reason, 'rate_limited')
+        # 限流不计入熔断失败
+        self.assertEqual(gateway.stats()['circuit'], 'closed')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+import unittest
+import os
+import sys
+import queue
+import threading
+import time
+
+# Add parent directory to path to import ws_pool
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ws_pool
+
+
+class FakeWebSocket:
+    """模拟 yf.WebSocket：listen 阻塞到 close，期间转发 feed 中的消息"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.subscriptions = set()
+        self.subscribe_calls = 0
+        self.messages = queue.Queue()
+        self.closed = threading.Event()
+
+    def subscribe(self, symbols):
+        if self.fail:
+            raise ConnectionError('connect failed')
+        self.subscribe_calls += 1
+        self.subscriptions.update(symbols)
+
+    def unsubscribe(self, symbols):
+        self.subscriptions.difference_update(symbols)
+
+    def listen(self, message_handler):
+        while not self.closed.is_set():
+            try:
+                message_handler(self.messages.get(timeout=0.01))
+            except queue.Empty:
+                pass
+
+    def close(self):
+        self.closed.set()
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestPlacement(unittest.TestCase):
+    def setUp(self):
+        self.pool = ws_pool.WebSocketPool(FakeWebSocket, lambda m: None, max_symbols=3, max_connections=3)
+
+    def test_new_connection_when_full_and_rebalanced(self):
+        self.assertEqual(self.pool.add(['A', 'B', 'C', 'A']), ['A', 'B', 'C'])
+        self.assertEqual(self.pool.stats()['connections'], 1)
+
+        self.pool.add(['D'])
+        counts = [s['symbols'] for s in self.pool.stats()['shards']]
+        self.assertEqual(sorted(counts), [2, 2])
+        self.assertEqual(self.pool.moves, 1)
+        self.assertEqual(len(self.pool), 4)
+        self.assertEqual(self.pool.add(['D']), [])
+
+    def test_overflow_when_connections_exhausted(self):
+        self.pool.add([f'S{i}' for i in range(10)])
+        counts = [s['symbols'] for s in self.pool.stats()['shards']]
+        self.assertEqual(len(counts), 3)
+        self.assertEqual(sum(counts), 10)
+        self.assertLessEqual(max(counts) - min(counts), 1)
+
+
+class TestShards(unittest.TestCase):
+    def test_independent_reconnect_and_rates(self):
+        sockets = []
+        received = []
+        fail_next = threading.Event()
+
+        def factory():
+            ws = FakeWebSocket(fail=fail_next.is_set())
+            fail_next.clear()
+            sockets.append(ws)
+            return ws
+
+        pool = ws_pool.WebSocketPool(factory, received.append, max_symbols=1, max_connections=2,
+                                     backoff_base=0.05, rate_window=0.01)
+        pool.add(['QQQ', 'SPY'])
+        pool.start()
+        self.assertTrue(wait_until(lambda: len(sockets) == 2 and all(ws.subscriptions for ws in sockets)))
+
+        first, second = sockets
+        first.messages.put({'id': 'QQQ'})
+        second.messages.put({'id': 'SPY'})
+        self.assertTrue(wait_until(lambda: len(received) == 2))
+        self.assertEqual(pool.status(), 'connected')
+
+        # 断开一条连接并让第一次重连失败，另一条连接不受影响
+        shard = pool.shard_of(first.subscriptions.copy().pop())
+        fail_next.set()
+        first.close()
+        self.assertTrue(wait_until(lambda: len(sockets) == 4))
+        stats = pool.stats()['shards']
+        self.assertEqual(stats[shard]['errors'], 1)
+        self.assertEqual(stats[shard]['connects'], 2)
+        self.assertEqual(stats[1 - shard]['connects'], 1)
+        self.assertEqual(sockets[-1].subscriptions, first.subscriptions)
+
+        time.sleep(0.02)
+        second.messages.put({'id': 'SPY'})
+        self.assertTrue(wait_until(lambda: len(received) == 3))
+        self.assertGreater(pool.stats()['shards'][1 - shard]['message_rate'], 0)
+        pool.close()
+
+    def test_stale_connection_reconnects_immediately(self):
+        sockets = []
+
+        def factory():
+            sockets.append(FakeWebSocket())
+            return sockets[-1]
+
+        pool = ws_pool.WebSocketPool(factory, lambda m: None, max_symbols=10, max_connections=1,
+                                     stale_timeout=60, is_active=lambda: True)
+        pool.add(['A', 'B', 'C'])
+        pool.start()
+        self.assertTrue(wait_until(lambda: pool.status() == 'connected'))
+        self.assertEqual(pool.check_stale(), [])
+
+        # 已连接时新增的符号直接在该连接上订阅
+        pool.add(['D'])
+        self.assertEqual(sockets[0].subscriptions, {'A', 'B', 'C', 'D'})
+
+        self.assertEqual(pool.check_stale(now=time.monotonic() + 61), [0])
+        self.assertTrue(wait_until(lambda: len(sockets) == 2 and pool.status() == 'connected'))
+        self.assertEqual(sockets[1].subscriptions, {'A', 'B', 'C', 'D'})
+        # 重连后一次订阅全部符号 (yf.WebSocket 每次都重发累计的订阅)
+        self.assertEqual(sockets[1].subscribe_calls, 1)
+        stats = pool.stats()['shards'][0]
+        self.assertEqual((stats['forced_reconnects'], stats['errors']), (1, 0))
+        pool.close()
+
+    def test_silent_shard_backs_off_stale_reconnects(self):
+        sockets = []
+        connects = []
+
+        def factory():
+            sockets.append(FakeWebSocket())
+            return sockets[-1]
+
+        pool = ws_pool.WebSocketPool(factory, lambda m: None, max_symbols=10, max_connections=1,
+                                     stale_timeout=60, is_active=lambda: True, on_connect=connects.append)
+        pool.add(['ILLIQ'])
+        pool.start()
+        self.assertTrue(wait_until(lambda: pool.status() == 'connected'))
+
+        # 重连后仍没有消息：每次静默判定时间翻倍，不会每 60 秒重连一次
+        for reconnects, limit in enumerate([60, 120, 240, 480, 960, 960], start=1):
+            base = time.monotonic()
+            self.assertEqual(pool.check_stale(now=base + limit - 1), [])
+            self.assertEqual(pool.check_stale(now=base + limit + 1), [0])
+            self.assertTrue(wait_until(lambda: len(sockets) == reconnects + 1 and pool.status() == 'connected'))
+        self.assertEqual(len(connects), 7)
+        self.assertEqual(pool.stats()['shards'][0]['stale_streak'], 6)
+
+        # 收到消息后恢复正常的静默判定时间
+        sockets[-1].messages.put({'id': 'ILLIQ'})
+        self.assertTrue(wait_until(lambda: pool.stats()['shards'][0]['stale_streak'] == 0))
+        self.assertEqual(pool.check_stale(now=time.monotonic() + 61), [0])
+        pool.close()
+
+    def test_backoff_grows_with_jitter(self):
+        pool = ws_pool.WebSocketPool(FakeWebSocket, lambda m: None, max_symbols=1, max_connections=1,
+                                     backoff_base=1, backoff_max=8)
+        shard = ws_pool.Shard(pool, 0)
+        delays = []
+        for failures in range(6):
+            shard._failures = failures
+            delays.append(shard._backoff())
+        self.assertEqual(delays[0], 0)
+        for delay, limit in zip(delays[1:], [1, 2, 4, 8, 8]):
+            self.assertTrue(limit / 2 <= delay <= limit)
+
+
+if __name__ == '__main__':
+    unittest.main()